@@ -0,0 +1,681 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for update_application_status.py, against a fake Gmail service.
+
+Usage:
+    python benchmark_application_status.py fetch [--threads N] [--latency SECONDS] [--batch-size N]
+    python benchmark_application_status.py sync [--threads N] [--days N] [--new-messages N]
+    python benchmark_application_status.py classify [--messages N] [--companies N]
+    python benchmark_application_status.py rules [--companies N]
+    python benchmark_application_status.py startup [--threads N] [--runs N]
+
+The fake service answers threads.list / threads.get and batch HTTP requests
+from a synthetic mailbox. Network time is simulated on a virtual clock (each
+HTTP round trip costs --latency, each sub-request a little server time), and
+Gmail's per-user quota is modelled as a token bucket, so sub-requests over
+quota fail with 429 like the real API. Runs take milliseconds and are
+deterministic for a given --seed.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from email.utils import formatdate
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent))
+import update_application_status as tracker  # noqa: E402
+
+# Gmail: 15,000 quota units per user per minute; threads.get costs 10
+QUOTA_UNITS_PER_SECOND = 250
+THREAD_GET_UNITS = 10
+
+SENDERS = [
+    "Workday <no-reply@myworkday.com>",
+    "Greenhouse <no-reply@greenhouse.io>",
+    "Microsoft Careers <careers@microsoft.com>",
+    "Uber Recruiting <recruiting@uber.com>",
+    "Bloomberg <noreply@bloomberg.net>",
+    "Lever <no-reply@hire.lever.co>",
+    "Glassdoor <info@glassdoor.com>",
+]
+SUBJECTS = [
+    "Thank you for applying to {company}!",
+    "Your application for {role} at {company}",
+    "Interview invitation: {company}",
+    "{company} Interview Confirmation",
+    "Update on your application to {company}",
+    "Congratulations! Offer letter from {company}",
+]
+SNIPPETS = [
+    "We have received your application for the {role} position.",
+    "Unfortunately, we have decided not to move forward with your application.",
+    "We'd like to schedule an interview with you next week.",
+    "We are pleased to offer you the {role} role.",
+    "Thanks for your interest in {company}.",
+]
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Enterprises"]
+ROLES = ["Software Engineer", "Data Engineer", "Backend Engineer", "Platform Engineer", "SRE"]
+
+
+class FakeClock:
+    """Virtual time; sleeping advances it instantly."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class FakeHttpError(Exception):
+    """Stands in for googleapiclient.errors.HttpError (carries .resp.status)."""
+
+    def __init__(self, status: int, reason: str):
+        super().__init__(f"<HttpError {status}: {reason}>")
+        self.resp = type("Response", (), {"status": status})()
+
+
+def synthetic_message(rng: random.Random, message_id: str, timestamp: float) -> dict:
+    """Build one metadata-format message sent at timestamp (epoch seconds)."""
+    company, role = rng.choice(COMPANIES), rng.choice(ROLES)
+    return {
+        "id": message_id,
+        "internalDate": str(int(timestamp * 1000)),
+        "snippet": rng.choice(SNIPPETS).format(company=company, role=role),
+        "payload": {"headers": [
+            {"name": "Subject", "value": rng.choice(SUBJECTS).format(company=company, role=role)},
+            {"name": "From", "value": rng.choice(SENDERS)},
+            {"name": "To", "value": "me@example.com"},
+            {"name": "Date", "value": formatdate(timestamp)},
+        ]},
+    }
+
+
+def synthetic_mailbox(num_threads: int, seed: int = 0, days: int = 180) -> dict[str, dict]:
+    """Build {thread_id: thread} with 1-4 messages per thread, spread over the last days."""
+    rng = random.Random(seed)
+    now = time.time()
+    threads = {}
+    for t in range(num_threads):
+        thread_id = f"{t:016x}"
+        started = now - rng.uniform(0, days * 86400)
+        messages = [synthetic_message(rng, f"{thread_id}-{m}", min(now, started + m * 86400))
+                    for m in range(rng.randint(1, 4))]
+        threads[thread_id] = {"id": thread_id, "historyId": str(1000 + t), "messages": messages}
+    return threads
+
+
+class FakeRequest:
+    def __init__(self, service, method: str, **kwargs):
+        self.service = service
+        self.method = method
+        self.kwargs = kwargs
+
+    def respond(self) -> dict:
+        """Serve the request without any simulated network time."""
+        service = self.service
+        service.calls[self.method] = service.calls.get(self.method, 0) + 1
+        if self.method == "threads.get":
+            if not service.take_quota(THREAD_GET_UNITS):
+                raise FakeHttpError(429, "Too many concurrent requests for user")
+            thread = service.mailbox.get(self.kwargs["threadId"])
+            if thread is None:
+                raise FakeHttpError(404, "Requested entity was not found.")
+            return thread
+        if self.method == "threads.list":
+            return service.list_page(self.kwargs.get("q", ""), self.kwargs.get("pageToken"),
+                                     self.kwargs.get("maxResults", 100))
+        if self.method == "history.list":
+            return service.history_page(self.kwargs["startHistoryId"], self.kwargs.get("pageToken"),
+                                        self.kwargs.get("maxResults", 100))
+        return {"emailAddress": "me@example.com", "historyId": str(service.history_id)}
+
+    def execute(self) -> dict:
+        self.service.http_round_trips += 1
+        self.service.clock.sleep(self.service.latency + self.service.server_time)
+        return self.respond()
+
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request: FakeRequest, request_id: str = None):
+        self.requests.append((request_id or str(len(self.requests)), request))
+
+    def execute(self):
+        service = self.service
+        if len(self.requests) > tracker.MAX_BATCH_SIZE:
+            raise FakeHttpError(400, "Too many requests in batch")
+        service.http_round_trips += 1
+        service.clock.sleep(service.latency + service.server_time * len(self.requests))
+        for request_id, request in self.requests:
+            try:
+                response, exception = request.respond(), None
+            except FakeHttpError as e:
+                response, exception = None, e
+            self.callback(request_id, response, exception)
+
+
+class FakeResource:
+    """A paged collection (threads or history): list / list_next, plus get for threads."""
+
+    def __init__(self, service, name: str):
+        self.service = service
+        self.name = name
+
+    def get(self, **kwargs) -> FakeRequest:
+        return FakeRequest(self.service, f"{self.name}.get", **kwargs)
+
+    def list(self, **kwargs) -> FakeRequest:
+        return FakeRequest(self.service, f"{self.name}.list", **kwargs)
+
+    def list_next(self, request: FakeRequest, response: dict) -> FakeRequest | None:
+        token = response.get("nextPageToken")
+        if not token:
+            return None
+        return FakeRequest(self.service, request.method, **{**request.kwargs, "pageToken": token})
+
+
+class FakeGmailService:
+    """Just enough of googleapiclient's Gmail v1 resource for the tracker."""
+
+    def __init__(self, mailbox: dict[str, dict], clock: FakeClock, latency: float = 0.1,
+                 server_time: float = 0.005, quota_units_per_second: float = QUOTA_UNITS_PER_SECOND):
+        self.mailbox = mailbox
+        self.clock = clock
+        self.latency = latency
+        self.server_time = server_time
+        self.quota_rate = quota_units_per_second
+        self.quota = quota_units_per_second      # bucket holds one second of quota
+        self.quota_updated = 0.0
+        self.history_id = 1000 + len(mailbox)
+        self.history_records: list[dict] = []
+        self.delivered_at = 0.0
+        self.http_round_trips = 0
+        self.calls: dict[str, int] = {}
+
+    def reset_counters(self):
+        self.http_round_trips = 0
+        self.calls = {}
+
+    def take_quota(self, units: float) -> bool:
+        elapsed = self.clock.now - self.quota_updated
+        self.quota = min(self.quota_rate, self.quota + elapsed * self.quota_rate)
+        self.quota_updated = self.clock.now
+        if self.quota < units:
+            return False
+        self.quota -= units
+        return True
+
+    def add_message(self, rng: random.Random, thread_id: str = None) -> str:
+        """Deliver a new message (to an existing thread, or a new one); returns the thread id."""
+        self.history_id += 1
+        if thread_id is None:
+            thread_id = f"new{self.history_id:013x}"
+            self.mailbox[thread_id] = {"id": thread_id, "messages": []}
+        thread = self.mailbox[thread_id]
+        # One second apart, so "most recent first" is unambiguous
+        self.delivered_at = max(time.time(), self.delivered_at + 1)
+        message = synthetic_message(rng, f"{thread_id}-{len(thread['messages'])}", self.delivered_at)
+        thread["messages"].append(message)
+        thread["historyId"] = str(self.history_id)
+        self.history_records.append({"id": str(self.history_id), "messagesAdded": [
+            {"message": {"id": message["id"], "threadId": thread_id}}]})
+        return thread_id
+
+    def list_page(self, query: str, page_token: str | None, max_results: int) -> dict:
+        """threads.list: newest first; honours newer_than:Nd, ignores the rest of the query."""
+        newer_than = re.search(r"newer_than:(\d+)d", query)
+        cutoff = (time.time() - int(newer_than.group(1)) * 86400) * 1000 if newer_than else 0
+        latest = {t: max(int(m["internalDate"]) for m in thread["messages"])
+                  for t, thread in self.mailbox.items()}
+        thread_ids = sorted((t for t in latest if latest[t] >= cutoff), key=latest.get, reverse=True)
+        start = int(page_token or 0)
+        response = {"threads": [{"id": t, "historyId": self.mailbox[t]["historyId"]}
+                                for t in thread_ids[start:start + max_results]]}
+        if start + max_results < len(thread_ids):
+            response["nextPageToken"] = str(start + max_results)
+        return response
+
+    def history_page(self, start_history_id: str, page_token: str | None, max_results: int) -> dict:
+        records = [r for r in self.history_records if int(r["id"]) > int(start_history_id)]
+        start = int(page_token or 0)
+        response = {"history": records[start:start + max_results], "historyId": str(self.history_id)}
+        if start + max_results < len(records):
+            response["nextPageToken"] = str(start + max_results)
+        return response
+
+    # googleapiclient resource chain: service.users().threads().get(...)
+    def users(self):
+        return self
+
+    def threads(self) -> FakeResource:
+        return FakeResource(self, "threads")
+
+    def history(self) -> FakeResource:
+        return FakeResource(self, "history")
+
+    def getProfile(self, **kwargs) -> FakeRequest:
+        return FakeRequest(self, "getProfile", **kwargs)
+
+    def new_batch_http_request(self, callback=None) -> FakeBatch:
+        return FakeBatch(self, callback)
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+def run_fetch(mailbox: dict[str, dict], args, batch_size: int | None) -> dict:
+    """Fetch every thread sequentially (batch_size=None) or batched; returns timings."""
+    clock = FakeClock()
+    service = FakeGmailService(mailbox, clock, args.latency, args.server_time, args.quota)
+    thread_ids = list(mailbox)
+
+    started = time.perf_counter()
+    if batch_size is None:
+        # The previous behaviour: one blocking threads.get per thread
+        fetched = {}
+        for thread_id in thread_ids:
+            fetched[thread_id] = tracker.get_thread_messages(service, thread_id)
+    else:
+        fetched = tracker.fetch_thread_messages(service, thread_ids, batch_size, sleep=clock.sleep)
+    cpu = time.perf_counter() - started
+
+    assert all(fetched[t] == mailbox[t]["messages"] for t in fetched)
+    return {
+        "threads": len(fetched),
+        "simulated_seconds": clock.now,
+        "round_trips": service.http_round_trips,
+        "sub_requests": service.calls.get("threads.get", 0),
+        "cpu_seconds": cpu,
+    }
+
+
+def benchmark_fetch(args):
+    mailbox = synthetic_mailbox(args.threads, args.seed)
+    print(f"Fetching {args.threads} threads: {args.latency * 1000:.0f} ms per round trip, "
+          f"{args.quota:.0f} quota units/s")
+    print(f"  {'mode':18s} {'threads':>7s} {'sim time':>9s} {'threads/s':>9s} {'trips':>6s} "
+          f"{'requests':>8s} {'cpu':>7s}")
+    for batch_size in [None] + args.batch_size:
+        result = run_fetch(mailbox, args, batch_size)
+        mode = "sequential" if batch_size is None else f"batch of {batch_size}"
+        throughput = result["threads"] / result["simulated_seconds"] if result["simulated_seconds"] else 0
+        print(f"  {mode:18s} {result['threads']:7d} {result['simulated_seconds']:8.1f}s "
+              f"{throughput:9.1f} {result['round_trips']:6d} {result['sub_requests']:8d} "
+              f"{result['cpu_seconds'] * 1000:6.0f}ms")
+
+
+def comparable(state: dict, days: int) -> dict:
+    """The tracker output for a sync state, minus its timestamp."""
+    tracker.prune_threads(state, days)
+    output = tracker.build_output(tracker.build_applications(state["threads"]))
+    output.pop("generated_at")
+    return output
+
+
+def benchmark_sync(args):
+    rng = random.Random(args.seed)
+    mailbox = synthetic_mailbox(args.threads, args.seed, args.days)
+    clock = FakeClock()
+    service = FakeGmailService(mailbox, clock, args.latency, args.server_time, args.quota)
+    rows = []
+
+    def measure(label, sync):
+        service.reset_counters()
+        started_sim, started = clock.now, time.perf_counter()
+        with mock.patch.object(tracker.time, "sleep", clock.sleep), \
+                contextlib.redirect_stdout(io.StringIO()):
+            result = sync()
+        rows.append((label, service.calls.get("threads.get", 0), service.http_round_trips,
+                     clock.now - started_sim, time.perf_counter() - started))
+        return result
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = tracker.ThreadCache(Path(tmp) / "threads.sqlite")
+        state = measure(f"full, {args.days} days", lambda: tracker.full_sync(service, args.days, cache=cache))
+
+        existing = list(mailbox)
+        for i in range(args.new_messages):
+            service.add_message(rng, rng.choice(existing) if i % 2 else None)
+
+        measure("incremental", lambda: tracker.incremental_sync(service, state))
+        fresh = measure(f"full, {args.days} days", lambda: tracker.full_sync(service, args.days))
+        cached = measure("full, cached", lambda: tracker.full_sync(service, args.days, cache=cache))
+        measure("full, 1 day", lambda: tracker.full_sync(service, 1))
+        cache.close()
+
+    assert comparable(state, args.days) == comparable(fresh, args.days), "incremental result differs from a full re-sync"
+    assert comparable(cached, args.days) == comparable(fresh, args.days), "cached result differs from a full re-sync"
+
+    print(f"{args.threads} threads over {args.days} days, then {args.new_messages} new messages "
+          f"({args.latency * 1000:.0f} ms per round trip, {args.quota:.0f} quota units/s)")
+    print(f"  {'sync':18s} {'threads':>7s} {'trips':>6s} {'sim time':>9s} {'cpu':>7s}")
+    for label, fetched, trips, simulated, cpu in rows:
+        print(f"  {label:18s} {fetched:7d} {trips:6d} {simulated:8.1f}s {cpu * 1000:6.0f}ms")
+    print("  incremental and cached results match a full re-sync")
+
+
+# The tracker's rules, compiled but without the cache
+RULES = {key: value for key, value in tracker.load_rules(tracker.RULES_PATH).items() if key != "sources"}
+
+FILLER = ["Hi there,", "Best regards", "Please find attached", "See details below", "Reminder:",
+          "Re:", "Fwd:", "Team update", "Weekly digest", "Your receipt", "Meeting notes"]
+
+
+def synthetic_corpus(num_messages: int, seed: int = 0) -> list[tuple[str, str, str]]:
+    """(subject, snippet, sender) triples: mostly job mail, some noise and unrelated mail."""
+    rng = random.Random(seed)
+    noise = sorted(RULES["noise_senders"])
+    fragments = list(RULES["known_companies"])
+    corpus = []
+    for _ in range(num_messages):
+        company, role = rng.choice(COMPANIES), rng.choice(ROLES)
+        kind = rng.random()
+        if kind < 0.1:
+            sender = f"Alerts <{rng.choice(noise)}>"
+        elif kind < 0.4:
+            sender = f"Recruiting <jobs@{rng.choice(fragments)}.com>"
+        else:
+            sender = rng.choice(SENDERS)
+        if rng.random() < 0.3:
+            subject = f"{rng.choice(FILLER)} {company} {rng.randint(1, 999)}"
+            snippet = " ".join(rng.choice(FILLER) for _ in range(8))
+        else:
+            subject = rng.choice(SUBJECTS).format(company=company, role=role)
+            snippet = rng.choice(SNIPPETS).format(company=company, role=role)
+        corpus.append((subject, snippet, sender))
+    return corpus
+
+
+def legacy_classify(subject: str, snippet: str, sender: str, known_companies: dict[str, str]):
+    """The per-rule implementation the compiled classifier replaced."""
+    sender_email = re.search(r"<(.+?)>", sender)
+    sender_email = sender_email.group(1).lower() if sender_email else sender.lower()
+    if sender_email in RULES["noise_senders"]:
+        return None
+    text = f"{subject} {snippet}"
+    status = None
+    for rule_status, pattern in RULES["status_rules"]:
+        if pattern.search(text):
+            status = rule_status
+            break
+    if status is None:
+        return None
+    company = None
+    sender_lower = sender.lower()
+    for fragment, name in known_companies.items():
+        if fragment in sender_lower:
+            company = name
+            break
+    company = company or tracker.extract_company_from_subject(subject)
+    company = tracker.canonical_company(company) if company else "Unknown"
+    role = tracker.extract_role_from_text(subject, snippet) or "Software Engineer"
+    return status, company, role
+
+
+def synthetic_companies(count: int, seed: int = 0) -> dict[str, str]:
+    """KNOWN_COMPANIES extended with count made-up employer fragments."""
+    rng = random.Random(seed)
+    syllables = ["ac", "bel", "cor", "dyn", "ex", "fin", "gen", "hal", "ion", "jet", "kor", "lum",
+                 "mar", "nov", "orb", "pix", "qua", "ros", "syn", "tek", "uni", "vox", "wex", "zen"]
+    companies = dict(RULES["known_companies"])
+    while len(companies) < len(RULES["known_companies"]) + count:
+        fragment = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+        companies.setdefault(fragment, fragment.title())
+    return companies
+
+
+def per_message_us(function, corpus) -> float:
+    started = time.perf_counter()
+    for subject, snippet, sender in corpus:
+        function(subject, snippet, sender)
+    return (time.perf_counter() - started) / len(corpus) * 1e6
+
+
+def benchmark_classify(args):
+    corpus = synthetic_corpus(args.messages, args.seed)
+    print(f"Classifying {len(corpus)} synthetic messages")
+    print(f"  {'companies':>9s} {'legacy':>10s} {'compiled':>10s} {'speedup':>8s}   "
+          f"{'sender legacy':>13s} {'compiled':>10s}")
+    for extra in args.companies:
+        companies = synthetic_companies(extra, args.seed)
+        classifier = tracker.EmailClassifier(**{**RULES, "known_companies": companies})
+
+        mismatches = sum(1 for message in corpus
+                         if classifier.classify(*message) != legacy_classify(*message, companies))
+        assert mismatches == 0, f"{mismatches} messages classified differently"
+
+        legacy = per_message_us(lambda subject, snippet, sender: legacy_classify(subject, snippet, sender, companies),
+                                corpus)
+        compiled = per_message_us(classifier.classify, corpus)
+
+        senders = [(None, None, sender) for _, _, sender in corpus]
+
+        def legacy_sender(_, __, sender):
+            sender_lower = sender.lower()
+            for fragment, name in companies.items():
+                if fragment in sender_lower:
+                    return name
+            return None
+
+        sender_legacy = per_message_us(legacy_sender, senders)
+        sender_compiled = per_message_us(lambda _, __, sender: classifier.company_from_sender(sender), senders)
+        print(f"  {len(companies):9d} {legacy:8.1f}us {compiled:8.1f}us {legacy / compiled:7.1f}x   "
+              f"{sender_legacy:11.2f}us {sender_compiled:8.2f}us")
+    print("  compiled results match the per-rule implementation")
+
+
+def write_rules(directory: Path, extra_companies: int, seed: int = 0) -> Path:
+    """A copy of application_rules.json with extra employers, and an alias file to match."""
+    config = json.loads(tracker.RULES_PATH.read_text())
+    config["known_companies"] = synthetic_companies(extra_companies, seed)
+    aliases = json.loads((tracker.RULES_PATH.parent / config["employer_aliases"][0]).read_text())
+    for fragment, name in config["known_companies"].items():
+        aliases.setdefault(f"{name} Technologies, Inc.", name)
+    (directory / "company.json").write_text(json.dumps(aliases))
+    config["employer_aliases"] = ["company.json"]
+    path = directory / "application_rules.json"
+    path.write_text(json.dumps(config))
+    return path
+
+
+def benchmark_rules(args):
+    corpus = synthetic_corpus(2000, args.seed)
+    print("Loading classification rules (best of 5)")
+    print(f"  {'companies':>9s} {'compile':>9s} {'cache write':>11s} {'cached':>8s} {'cache size':>10s}")
+    for extra in args.companies:
+        with tempfile.TemporaryDirectory() as tmp:
+            rules_path = write_rules(Path(tmp), extra, args.seed)
+            cache_path = Path(tmp) / "rules.json"
+
+            def best(function):
+                timings = []
+                for _ in range(5):
+                    started = time.perf_counter()
+                    result = function()
+                    timings.append(time.perf_counter() - started)
+                return min(timings), result
+
+            compile_time, compiled = best(lambda: tracker.load_classifier(rules_path, None))
+            write_time, _ = best(lambda: (cache_path.unlink(missing_ok=True),
+                                          tracker.load_classifier(rules_path, cache_path)))
+            cached_time, cached = best(lambda: tracker.load_classifier(rules_path, cache_path))
+
+            assert cached.digest == compiled.digest
+            assert all(cached.classify(*message) == compiled.classify(*message) for message in corpus)
+            companies = len(compiled.company_fragments)
+            print(f"  {companies:9d} {compile_time * 1000:7.1f}ms {write_time * 1000:9.1f}ms "
+                  f"{cached_time * 1000:6.1f}ms {cache_path.stat().st_size // 1024:8d}KB")
+
+            # Editing the rules file invalidates the cache
+            config = json.loads(rules_path.read_text())
+            config["noise_senders"].append("digest@example.com")
+            rules_path.write_text(json.dumps(config))
+            assert tracker.load_classifier(rules_path, cache_path).digest != compiled.digest
+    print("  cached matchers classify like freshly compiled ones; edited rules recompile")
+
+
+# What the online path does before its first request: import the tracker and
+# the Google client stack, then build the Gmail service from its discovery document
+ONLINE_STARTUP = """
+import sys
+sys.path.insert(0, {directory!r})
+import update_application_status
+from google.auth.credentials import AnonymousCredentials
+from googleapiclient.discovery import build
+build("gmail", "v1", credentials=AnonymousCredentials())
+"""
+
+
+def write_dumps(directory: Path, threads: dict[str, dict]) -> tuple[Path, Path]:
+    """The mailbox as a JSONL dump (one message per line) and as an mbox file."""
+    import mailbox
+    from email.message import EmailMessage
+
+    jsonl_path, mbox_path = directory / "messages.jsonl", directory / "mail.mbox"
+    mbox = mailbox.mbox(mbox_path)
+    with jsonl_path.open("w") as jsonl:
+        for thread_id, thread in threads.items():
+            for msg in thread["messages"]:
+                jsonl.write(json.dumps({"threadId": thread_id, **msg}) + "\n")
+                message = EmailMessage()
+                for header in msg["payload"]["headers"]:
+                    message[header["name"]] = header["value"]
+                message["Message-ID"] = f"<{msg['id']}@example.com>"
+                message["X-GM-THRID"] = thread_id
+                message.set_content(msg["snippet"])
+                mbox.add(message)
+    mbox.close()
+    return jsonl_path, mbox_path
+
+
+def best_wall_time(command: list[str], runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, check=True, capture_output=True)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def benchmark_startup(args):
+    threads = synthetic_mailbox(args.threads, args.seed)
+    expected = {}
+    for thread_id, thread in threads.items():
+        events = tracker.classify_thread(thread["messages"])
+        if events:
+            expected[thread_id] = {"latest": max(map(tracker.message_date, thread["messages"])), "events": events}
+    expected = tracker.build_applications(dict(sorted(expected.items(), key=lambda item: item[1]["latest"],
+                                                      reverse=True)))
+
+    def summary(applications):
+        return {key: (a["status"], a["applied_date"], a["last_update"]) for key, a in applications.items()}
+
+    script = str(Path(tracker.__file__).resolve())
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl_path, mbox_path = write_dumps(Path(tmp), threads)
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert tracker.build_applications(tracker.classify_dump(jsonl_path)) == expected
+            assert summary(tracker.build_applications(tracker.classify_dump(mbox_path))) == summary(expected)
+
+        output = str(Path(tmp) / "out.json")
+        rows = [("python -c pass", best_wall_time([sys.executable, "-c", "pass"], args.runs))]
+        for label, path in (("--from-dump jsonl", jsonl_path), ("--from-dump mbox", mbox_path)):
+            command = [sys.executable, script, "--from-dump", str(path), "--output", output]
+            rows.append((label, best_wall_time(command, args.runs)))
+
+        imported = subprocess.run([sys.executable, "-X", "importtime", *command[1:]],
+                                  check=True, capture_output=True, text=True).stderr
+        google = [line for line in imported.splitlines() if "| google" in line]
+        assert not google, f"offline mode imported {google[0].split('|')[-1].strip()}"
+
+        if importlib.util.find_spec("googleapiclient"):
+            online = [sys.executable, "-c", ONLINE_STARTUP.format(directory=str(Path(script).parent))]
+            rows.append(("online startup", best_wall_time(online, args.runs)))
+        else:
+            print("  (google-api-python-client not installed; skipping the online path)")
+
+    messages = sum(len(thread["messages"]) for thread in threads.values())
+    print(f"{messages} messages in {len(threads)} threads (wall time, best of {args.runs})")
+    for label, seconds in rows:
+        print(f"  {label:20s} {seconds * 1000:7.0f}ms")
+    print("  offline results match the online classifier; no Google modules imported")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the application tracker.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    fetch = subparsers.add_parser("fetch", help="Thread fetching: sequential vs batch HTTP")
+    fetch.add_argument("--threads", type=int, default=500, help="Threads in the fake mailbox (default: 500)")
+    fetch.add_argument("--latency", type=float, default=0.1, help="Seconds per HTTP round trip (default: 0.1)")
+    fetch.add_argument("--server-time", type=float, default=0.005,
+                       help="Server seconds per sub-request (default: 0.005)")
+    fetch.add_argument("--quota", type=float, default=QUOTA_UNITS_PER_SECOND,
+                       help=f"Quota units per second (default: {QUOTA_UNITS_PER_SECOND}, Gmail's per-user limit)")
+    fetch.add_argument("--batch-size", type=int, action="append",
+                       help="Batch sizes to compare (repeatable, default: 10, 25, 50, 100)")
+    fetch.add_argument("--seed", type=int, default=0)
+    fetch.set_defaults(run=benchmark_fetch)
+
+    sync = subparsers.add_parser("sync", help="Full re-scan vs incremental historyId sync")
+    sync.add_argument("--threads", type=int, default=400, help="Threads in the fake mailbox (default: 400)")
+    sync.add_argument("--days", type=int, default=180, help="Look-back window (default: 180)")
+    sync.add_argument("--new-messages", type=int, default=10,
+                      help="Messages delivered between the two syncs (default: 10)")
+    sync.add_argument("--latency", type=float, default=0.1, help="Seconds per HTTP round trip (default: 0.1)")
+    sync.add_argument("--server-time", type=float, default=0.005,
+                      help="Server seconds per sub-request (default: 0.005)")
+    sync.add_argument("--quota", type=float, default=QUOTA_UNITS_PER_SECOND,
+                      help=f"Quota units per second (default: {QUOTA_UNITS_PER_SECOND})")
+    sync.add_argument("--seed", type=int, default=0)
+    sync.set_defaults(run=benchmark_sync)
+
+    classify = subparsers.add_parser("classify", help="Per-rule vs compiled email classification")
+    classify.add_argument("--messages", type=int, default=100_000,
+                          help="Synthetic messages to classify (default: 100000)")
+    classify.add_argument("--companies", type=int, action="append",
+                          help="Extra company fragments to add to KNOWN_COMPANIES (repeatable, "
+                               "default: 0, 1000, 5000)")
+    classify.add_argument("--seed", type=int, default=0)
+    classify.set_defaults(run=benchmark_classify)
+
+    rules = subparsers.add_parser("rules", help="Rules file: compile vs cached matcher")
+    rules.add_argument("--companies", type=int, action="append",
+                       help="Extra company fragments in the rules file (repeatable, default: 0, 1000, 5000, 20000)")
+    rules.add_argument("--seed", type=int, default=0)
+    rules.set_defaults(run=benchmark_rules)
+
+    startup = subparsers.add_parser("startup", help="Offline --from-dump run vs online startup")
+    startup.add_argument("--threads", type=int, default=1000, help="Threads in the dump (default: 1000)")
+    startup.add_argument("--runs", type=int, default=5, help="Runs per command (default: 5)")
+    startup.add_argument("--seed", type=int, default=0)
+    startup.set_defaults(run=benchmark_startup)
+
+    args = parser.parse_args()
+    if args.benchmark == "fetch" and not args.batch_size:
+        args.batch_size = [10, 25, 50, 100]
+    if args.benchmark == "classify" and not args.companies:
+        args.companies = [0, 1000, 5000]
+    if args.benchmark == "rules" and not args.companies:
+        args.companies = [0, 1000, 5000, 20000]
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
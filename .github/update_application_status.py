@@ -3,7 +3,30 @@
 Job application tracker that reads Gmail and produces application_status.json.
 
 Usage:
-    python update_application_status.py [--output PATH] [--days N]
+    python update_application_status.py [--output PATH] [--days N] [--batch-size N] [--full]
+    python update_application_status.py --from-dump messages.jsonl|mail.mbox [--output PATH]
+
+The first run searches the whole look-back window. It saves the mailbox
+historyId and each thread's classified events next to the output
+(application_status.state.json). Later runs ask history.list for threads that
+changed since then, re-fetch only those and merge them into the saved
+threads. --full forces a re-scan.
+
+Thread metadata is fetched with Gmail batch HTTP requests (--batch-size
+sub-requests per round trip); rate-limited sub-requests are retried with
+exponential backoff. Fetched threads are cached in .cache/gmail_threads.sqlite
+and served from there while their historyId is unchanged (--no-cache to skip).
+
+Classification rules (status keywords, company/role patterns, known sender
+domains, noise senders) are read from application_rules.json (--rules), with
+employer names canonicalized through h1b/data/company.json. The compiled
+matcher is cached in .cache/application_rules.json until either file
+changes; changed rules trigger a full sync so saved events are reclassified.
+
+--from-dump re-classifies a local export offline: a JSONL file with one Gmail
+message or thread resource per line, or an mbox file (e.g. Google Takeout).
+Messages are streamed through the classifier; Google libraries are never
+imported, and the sync state and thread cache are left alone.
 
 Requirements:
     pip install google-auth google-auth-httplib2 google-api-python-client
@@ -16,13 +39,27 @@ Auth (choose one):
 """
 
 import argparse
+import hashlib
+import html
+import http.client
 import json
 import os
+import random
 import re
+import sqlite3
 import sys
-from datetime import datetime, timezone
+import time
+import zlib
+from collections import deque
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
 # ---------------------------------------------------------------------------
 # Gmail API setup
 # ---------------------------------------------------------------------------
@@ -51,62 +88,14 @@ def get_gmail_service():
 
 
 # ---------------------------------------------------------------------------
-# Email classification
+# Classification rules
 # ---------------------------------------------------------------------------
 
-# Sender domains / patterns that indicate job-board noise (skip these)
-NOISE_SENDERS = {
-    "info@glassdoor.com",
-    "support@builtin.com",
-    "talent@selbyjennings.com",  # newsletter
-    "niko@nrscollective.com",
-    "opportunities@careeralerts.wexinc.com",
-    "inmail-hit-reply@linkedin.com",
-    "noreply@jobright.ai",
-}
-
-# Keywords that classify an email as a particular status
-STATUS_RULES = [
-    # Offer
-    ("offer", re.compile(
-        r"\b(offer letter|we(?:'re| are) pleased to offer|"
-        r"congratulations.*offer|job offer|offer of employment)\b",
-        re.IGNORECASE,
-    )),
-    # Rejection
-    ("rejected", re.compile(
-        r"\b(not moving forward|decided not to move forward|"
-        r"not selected|chosen not to proceed|"
-        r"regret to inform|unfortunately|"
-        r"we will not be|won't be moving|"
-        r"other candidates|not a match)\b",
-        re.IGNORECASE,
-    )),
-    # Interview scheduled / confirmed
-    ("interview_scheduled", re.compile(
-        r"\b(interview (?:confirmation|confirmed|scheduled|reminder)|"
-        r"your (?:upcoming )?interview|"
-        r"coderpad interview|hiring manager (?:screen|interview)|"
-        r"technical (?:screen|interview))\b",
-        re.IGNORECASE,
-    )),
-    # Interview invite / request
-    ("interviewing", re.compile(
-        r"\b(invitation.*interview|interview.*invitation|"
-        r"we(?:'d| would) like to (?:schedule|invite)|"
-        r"schedule.*interview|interview.*schedule|"
-        r"availability for.*interview)\b",
-        re.IGNORECASE,
-    )),
-    # Applied / received confirmation
-    ("applied", re.compile(
-        r"\b(thank you for (?:your application|applying)|"
-        r"we(?:'ve| have) received your application|"
-        r"application (?:received|submitted|confirmed)|"
-        r"received your (?:resume|cv|application))\b",
-        re.IGNORECASE,
-    )),
-]
+# Noise senders, status keywords, company/role patterns and sender-domain
+# fragments live in application_rules.json. Its "version" is the file format;
+# loaders refuse versions they don't know.
+RULES_PATH = Path(__file__).parent / "application_rules.json"
+RULES_VERSION = 1
 
 # Priority order for status resolution (higher index = higher priority)
 STATUS_PRIORITY = {
@@ -118,98 +107,355 @@ STATUS_PRIORITY = {
 }
 
 
+def normalize_employer(name: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation, for alias lookups."""
+    return " ".join(name.lower().split()).rstrip("!.,|")
+
+
+def load_rules(path: Path) -> dict:
+    """
+    Read and compile a rules file. All patterns are case-insensitive; each status
+    rule's phrases become one \\b(...|...)\\b alternation, tried in file order.
+    employer_aliases lists JSON files (relative to the rules file) mapping legal
+    employer names to the names applications are filed under, e.g. h1b/data/company.json.
+    Returns the compiled rules plus "sources", the files they were built from.
+    """
+    config = json.loads(path.read_text())
+    if config.get("version") != RULES_VERSION:
+        raise ValueError(f"{path}: unsupported rules version {config.get('version')!r} "
+                         f"(expected {RULES_VERSION})")
+
+    sources = [path]
+    employer_aliases = {}
+    for alias_file in config.get("employer_aliases", []):
+        alias_path = path.parent / alias_file
+        sources.append(alias_path)
+        for legal_name, name in json.loads(alias_path.read_text()).items():
+            employer_aliases[normalize_employer(legal_name)] = name.strip()
+
+    return {
+        "status_rules": [
+            (rule["status"], re.compile(r"\b(" + "|".join(rule["phrases"]) + r")\b", re.IGNORECASE))
+            for rule in config["status_rules"]
+        ],
+        "company_patterns": [re.compile(rule["pattern"], re.IGNORECASE) for rule in config["company_patterns"]],
+        "role_patterns": [re.compile(rule["pattern"], re.IGNORECASE) for rule in config["role_patterns"]],
+        "known_companies": {fragment.lower(): name for fragment, name in config["known_companies"].items()},
+        "noise_senders": {sender.lower() for sender in config["noise_senders"]},
+        "employer_aliases": employer_aliases,
+        "sources": sources,
+    }
+
+
 def classify_email(subject: str, snippet: str) -> str | None:
     """Return the best status label for an email, or None if unclassifiable."""
-    text = f"{subject} {snippet}"
-    for status, pattern in STATUS_RULES:
-        if pattern.search(text):
-            return status
-    return None
+    return CLASSIFIER.classify_text(f"{subject} {snippet}")
+
+
+def extract_company_from_sender(sender: str) -> str | None:
+    return CLASSIFIER.company_from_sender(sender)
+
+
+def extract_company_from_subject(subject: str) -> str | None:
+    return CLASSIFIER.company_from_subject(subject)
+
+
+def extract_role_from_text(subject: str, snippet: str) -> str | None:
+    return CLASSIFIER.role_from_text(f"{subject} {snippet}")
+
+
+def extract_role(text: str) -> str | None:
+    return CLASSIFIER.role_from_text(text)
+
+
+def canonical_company(name: str) -> str:
+    """The name an employer's applications are filed under (see employer_aliases)."""
+    return CLASSIFIER.canonical_company(name)
 
 
 # ---------------------------------------------------------------------------
-# Company / role extraction
+# Compiled classifier
 # ---------------------------------------------------------------------------
 
-COMPANY_PATTERNS = [
-    # "your application to <Company>"
-    re.compile(r"application to (.+?)(?:\s*[!\|,\.]|$)", re.IGNORECASE),
-    # "Thank you for applying to <Company>"
-    re.compile(r"applying to (.+?)(?:\s*[!\|,\.]|$)", re.IGNORECASE),
-    # "<Company> Interview"
-    re.compile(r"^(.+?)\s+(?:interview|coderpad)", re.IGNORECASE),
-    # "Interview with <Company>"
-    re.compile(r"interview with (.+?)(?:\s*[!\|,\|]|$)", re.IGNORECASE),
-    # "Interview - <Company>"
-    re.compile(r"interview\s*[-–]\s*(.+?)(?:\s*[!\|,\.]|$)", re.IGNORECASE),
-    # "<Company> Careers:"
-    re.compile(r"^(.+?) careers:", re.IGNORECASE),
-    # "Thank you for your application! <Company>" (sender domain)
-]
-
-ROLE_PATTERNS = [
-    # "for the <Role> position"
-    re.compile(r"for (?:the )?(.+?) (?:position|role|job|opening)\b", re.IGNORECASE),
-    # "application for <Role>"
-    re.compile(r"application for (.+?)(?:\s*[!\|,\.]|$)", re.IGNORECASE),
-    # Subject line: "Thank you for your application for <Role>"
-    re.compile(r"your application for (.+?)(?:\s*[!\|,\.]|$)", re.IGNORECASE),
-]
-
-KNOWN_COMPANIES = {
-    # sender domain fragment -> company name
-    "microsoft": "Microsoft",
-    "akamai": "Akamai Technologies",
-    "oracle": "Oracle",
-    "tesla": "Tesla",
-    "uber": "Uber",
-    "bloomberg": "Bloomberg",
-    "asana": "Asana",
-    "mastercard": "Mastercard",
-    "chewy": "Chewy",
-    "whoop": "WHOOP",
-    "goldman": "Goldman Sachs",
-    "gs.com": "Goldman Sachs",
-    "walleye": "Walleye Capital",
-    "capsule": "Capsule",
-    "kepler": "Kepler",
-    "salient": "Salient AI",
-    "zscaler": "Zscaler",
-    "chartahealth": "Charta Health",
-    "neonhealth": "Neon Health",
-    "github": "GitHub",
-    "ascendhire": "Ascend Hire",
-}
+NO_MATCH = sys.maxsize
 
 
-def extract_company_from_sender(sender: str) -> str | None:
-    sender_lower = sender.lower()
-    for fragment, name in KNOWN_COMPANIES.items():
-        if fragment in sender_lower:
-            return name
-    return None
+class AhoCorasick:
+    """
+    Multi-pattern substring matcher. One pass over the text finds the
+    lowest-index pattern it contains, however many patterns there are.
+    """
 
+    def __init__(self, patterns: list[str]):
+        goto: list[dict[str, int]] = [{}]
+        best = [NO_MATCH]          # lowest pattern index ending at each state
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    goto.append({})
+                    best.append(NO_MATCH)
+                    nxt = goto[state][ch] = len(goto) - 1
+                state = nxt
+            best[state] = min(best[state], index)
+
+        # Failure links, breadth first so a state's fallback is final before its children
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                fallback = fail[state]
+                while fallback and ch not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[nxt] = goto[fallback].get(ch, 0)
+                best[nxt] = min(best[nxt], best[fail[nxt]])
+
+        self.goto = goto
+        self.fail = fail
+        self.best = best
+
+    def tables(self) -> tuple[list, list, list]:
+        """The automaton as plain lists, for serializing."""
+        return self.goto, self.fail, self.best
+
+    @classmethod
+    def from_tables(cls, tables: tuple[list, list, list]) -> "AhoCorasick":
+        matcher = cls.__new__(cls)
+        matcher.goto, matcher.fail, matcher.best = tables
+        return matcher
+
+    def first(self, text: str) -> int:
+        """Index of the lowest-index pattern found in text, or NO_MATCH."""
+        goto, fail, best = self.goto, self.fail, self.best
+        state = 0
+        found = NO_MATCH
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if best[state] < found:
+                found = best[state]
+                if found == 0:
+                    break
+        return found
+
+
+# Below this many fragments a plain substring scan beats walking the automaton
+# in Python; above it the automaton's cost stays flat while the scan's grows
+AUTOMATON_MIN_PATTERNS = 100
+MIN_ANCHOR_LENGTH = 3
+
+
+def _top_level_branches(parsed) -> list:
+    """Alternatives of a parsed \\b(a|b|...)\\b style rule; the whole rule if it has another shape."""
+    core = [item for item in parsed if item[0] is not sre_constants.AT]
+    if len(core) == 1 and core[0][0] is sre_constants.SUBPATTERN:
+        core = list(core[0][1][-1])
+    if len(core) == 1 and core[0][0] is sre_constants.BRANCH:
+        return [list(branch) for branch in core[0][1][1]]
+    return [list(parsed)]
+
+
+def _longest_literal(items) -> str:
+    """Longest run of consecutive literal characters in a parsed pattern sequence."""
+    runs, current = [], []
+    for op, value in items:
+        if op is sre_constants.LITERAL:
+            current.append(chr(value))
+        elif current:
+            runs.append("".join(current))
+            current = []
+    runs.append("".join(current))
+    return max(runs, key=len)
+
+
+def required_literals(pattern: re.Pattern) -> tuple[str, ...] | None:
+    """
+    Literals one of which must occur in any text the pattern matches (lowercased
+    for IGNORECASE patterns), or None if some alternative has no usable literal.
+    """
+    literals = set()
+    for branch in _top_level_branches(sre_parse.parse(pattern.pattern, pattern.flags)):
+        literal = _longest_literal(branch)
+        if len(literal) < MIN_ANCHOR_LENGTH:
+            return None
+        literals.add(literal.lower() if pattern.flags & re.IGNORECASE else literal)
+    return tuple(sorted(literals))
 
-def extract_company_from_subject(subject: str) -> str | None:
-    for pattern in COMPANY_PATTERNS:
-        m = pattern.search(subject)
-        if m:
-            candidate = m.group(1).strip().rstrip("!.,|")
-            # reject long strings (probably the whole subject matched)
-            if len(candidate) < 60:
-                return candidate
-    return None
 
+class EmailClassifier:
+    """
+    Rules compiled once for single-pass classification:
+
+    - status: each status rule is paired with the literals it cannot match
+      without. Rules are still tried in priority order, but a rule's regex only
+      runs when one of its literals occurs in the lowercased text, so mail that
+      mentions none of them costs a few substring checks instead of a regex
+      scan per rule.
+    - company: an Aho-Corasick automaton over the known_companies fragments,
+      earliest fragment winning as in the dict's order.
+    - noise: noise_senders is an exact-address set lookup.
+
+    Company and role patterns are tried in order; company names are mapped
+    through employer_aliases. to_data()/from_data() round-trip the compiled
+    state through plain JSON values (see load_classifier).
+    """
+
+    def __init__(self, status_rules, known_companies: dict[str, str], noise_senders,
+                 company_patterns=(), role_patterns=(), employer_aliases: dict[str, str] | None = None,
+                 digest: str = ""):
+        self.status_rules = [
+            (status, pattern, required_literals(pattern)) for status, pattern in status_rules
+        ]
+        self.company_fragments = tuple(known_companies.items())
+        self.company_matcher = (
+            AhoCorasick(list(known_companies)) if len(known_companies) >= AUTOMATON_MIN_PATTERNS else None
+        )
+        self.noise_senders = frozenset(noise_senders)
+        self.company_patterns = list(company_patterns)
+        self.role_patterns = list(role_patterns)
+        self.employer_aliases = dict(employer_aliases or {})
+        self.digest = digest    # identifies the rule files this was compiled from
+
+    def to_data(self) -> dict:
+        data = dict(vars(self))
+        data["status_rules"] = [
+            [status, pattern.pattern, pattern.flags, literals] for status, pattern, literals in self.status_rules
+        ]
+        data["company_patterns"] = [[pattern.pattern, pattern.flags] for pattern in self.company_patterns]
+        data["role_patterns"] = [[pattern.pattern, pattern.flags] for pattern in self.role_patterns]
+        data["noise_senders"] = sorted(self.noise_senders)
+        if self.company_matcher is not None:
+            data["company_matcher"] = self.company_matcher.tables()
+        return data
+
+    @classmethod
+    def from_data(cls, data: dict) -> "EmailClassifier":
+        classifier = cls.__new__(cls)
+        vars(classifier).update(data)
+        classifier.status_rules = [
+            (status, re.compile(pattern, flags), tuple(literals) if literals is not None else None)
+            for status, pattern, flags, literals in data["status_rules"]
+        ]
+        classifier.company_fragments = tuple(tuple(fragment) for fragment in data["company_fragments"])
+        classifier.company_patterns = [re.compile(pattern, flags) for pattern, flags in data["company_patterns"]]
+        classifier.role_patterns = [re.compile(pattern, flags) for pattern, flags in data["role_patterns"]]
+        classifier.noise_senders = frozenset(data["noise_senders"])
+        if data["company_matcher"] is not None:
+            classifier.company_matcher = AhoCorasick.from_tables(data["company_matcher"])
+        return classifier
+
+    def classify_text(self, text: str) -> str | None:
+        lower = text.lower()
+        for status, pattern, literals in self.status_rules:
+            if literals is not None and not any(literal in lower for literal in literals):
+                continue
+            if pattern.search(text):
+                return status
+        return None
+
+    def company_from_sender(self, sender: str) -> str | None:
+        sender = sender.lower()
+        if self.company_matcher is None:
+            for fragment, name in self.company_fragments:
+                if fragment in sender:
+                    return name
+            return None
+        index = self.company_matcher.first(sender)
+        return self.company_fragments[index][1] if index != NO_MATCH else None
+
+    def company_from_subject(self, subject: str) -> str | None:
+        for pattern in self.company_patterns:
+            m = pattern.search(subject)
+            if m:
+                candidate = m.group(1).strip().rstrip("!.,|")
+                # reject long strings (probably the whole subject matched)
+                if len(candidate) < 60:
+                    return candidate
+        return None
+
+    def role_from_text(self, text: str) -> str | None:
+        for pattern in self.role_patterns:
+            m = pattern.search(text)
+            if m:
+                role = m.group(1).strip().rstrip("!.,|")
+                if 3 < len(role) < 80:
+                    return role
+        return None
+
+    def canonical_company(self, name: str) -> str:
+        return self.employer_aliases.get(normalize_employer(name), name)
+
+    def is_noise(self, sender: str) -> bool:
+        # Same as re.search(r"<(.+?)>", sender), without the regex
+        start = sender.find("<")
+        end = sender.find(">", start + 2) if start != -1 else -1
+        address = sender[start + 1:end] if end != -1 else sender
+        return address.lower() in self.noise_senders
+
+    def classify(self, subject: str, snippet: str, sender: str) -> tuple[str, str, str] | None:
+        """(status, company, role) for one message, or None for noise and unclassifiable mail."""
+        if self.is_noise(sender):
+            return None
+        text = f"{subject} {snippet}"
+        status = self.classify_text(text)
+        if status is None:
+            return None
+        company = self.company_from_sender(sender) or self.company_from_subject(subject)
+        company = self.canonical_company(company) if company else "Unknown"
+        role = self.role_from_text(text) or "Software Engineer"
+        return status, company, role
+
+
+# Bump when EmailClassifier's compiled state changes shape, to retire old caches
+MATCHER_FORMAT = 2
+RULES_CACHE_PATH = Path(__file__).parent.parent / ".cache" / "application_rules.json"
+
+
+def file_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def load_classifier(rules_path: Path = RULES_PATH, cache_path: Path | None = RULES_CACHE_PATH) -> EmailClassifier:
+    """
+    Compile the rules file into an EmailClassifier, reusing the serialized matcher
+    in cache_path while the rules file and the alias files it lists hash the same.
+    The cache is rebuilt (or skipped, if it can't be written) otherwise. Sources are
+    recorded relative to the rules file, and the classifier's digest covers file
+    contents only, so it is the same in every checkout.
+    """
+    if cache_path is not None:
+        try:
+            cached = json.loads(cache_path.read_text())
+            if (cached["format"] == MATCHER_FORMAT
+                    and cached["rules"] == rules_path.name
+                    and all(file_digest(rules_path.parent / p) == d for p, d in cached["sources"].items())):
+                return EmailClassifier.from_data(cached["classifier"])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError, re.error):
+            pass
+
+    rules = load_rules(rules_path)
+    sources = {os.path.relpath(p, rules_path.parent): file_digest(p) for p in rules.pop("sources")}
+    digest = hashlib.sha256(json.dumps(list(sources.values())).encode()).hexdigest()[:16]
+    classifier = EmailClassifier(**rules, digest=digest)
+
+    if cache_path is not None:
+        payload = {"format": MATCHER_FORMAT, "rules": rules_path.name, "sources": sources,
+                   "classifier": classifier.to_data()}
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(payload))
+            tmp.replace(cache_path)
+        except OSError as e:
+            print(f"Warning: could not write rules cache {cache_path}: {e}")
+    return classifier
 
-def extract_role_from_text(subject: str, snippet: str) -> str | None:
-    text = f"{subject} {snippet}"
-    for pattern in ROLE_PATTERNS:
-        m = pattern.search(text)
-        if m:
-            role = m.group(1).strip().rstrip("!.,|")
-            if 3 < len(role) < 80:
-                return role
-    return None
+
+CLASSIFIER = load_classifier()
 
 
 # ---------------------------------------------------------------------------
@@ -230,15 +476,210 @@ def fetch_threads(service, query: str, max_results: int = 200) -> list[dict]:
     return threads
 
 
-def get_thread_messages(service, thread_id: str) -> list[dict]:
-    """Return minimal message metadata for a thread."""
-    thread = service.users().threads().get(
+# Gmail allows 100 sub-requests per batch, but bigger batches than ~50 mostly
+# trade round trips for rate-limit errors (threads.get costs 10 quota units)
+BATCH_SIZE = 50
+MAX_BATCH_SIZE = 100
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 32.0
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def thread_request(service, thread_id: str):
+    """Build the threads.get request for a thread's message metadata."""
+    return service.users().threads().get(
         userId="me", threadId=thread_id, format="metadata",
         metadataHeaders=["Subject", "From", "To", "Date"],
-    ).execute()
+    )
+
+
+def get_thread_messages(service, thread_id: str) -> list[dict]:
+    """Return minimal message metadata for a thread."""
+    thread = thread_request(service, thread_id).execute()
     return thread.get("messages", [])
 
 
+def is_retryable(error: Exception) -> bool:
+    """True for rate-limit and transient server errors (HttpError or anything with .resp.status)."""
+    status = getattr(getattr(error, "resp", None), "status", None)
+    if status in RETRYABLE_STATUSES:
+        return True
+    return status == 403 and ("rateLimitExceeded" in str(error) or "userRateLimitExceeded" in str(error))
+
+
+def is_transport_error(error: Exception) -> bool:
+    """True for network failures with no HTTP response (socket timeouts, connection resets)."""
+    return getattr(error, "resp", None) is None and isinstance(error, (OSError, http.client.HTTPException))
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter for the given retry attempt (1-based)."""
+    return min(RETRY_BASE_DELAY * 2 ** (attempt - 1), RETRY_MAX_DELAY) * (0.5 + random.random() / 2)
+
+
+def fetch_thread_metadata(service, thread_ids: list[str], batch_size: int = BATCH_SIZE,
+                          max_retries: int = MAX_RETRIES, sleep=None) -> dict[str, dict]:
+    """
+    Fetch metadata for many threads, up to batch_size threads per HTTP round trip.
+    When sub-requests are rate-limited the fetcher backs off, shrinks the next batch to
+    what got through and requeues them; clean batches grow it back. A batch that fails
+    in transport (timeout, dropped connection) is retried the same way. Threads that
+    fail max_retries times, or with a non-retryable error, are reported and left out.
+    Returns: { thread_id: thread } (each with "historyId" and "messages")
+    """
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    sleep = sleep or time.sleep
+    results: dict[str, dict] = {}
+    queue = deque(dict.fromkeys(thread_ids))
+    failures: dict[str, int] = {}
+    current_size = batch_size
+    backoff = 0
+
+    while queue:
+        chunk = [queue.popleft() for _ in range(min(current_size, len(queue)))]
+        limited: list[str] = []
+
+        def callback(request_id, response, exception):
+            if exception is None:
+                results[request_id] = response
+            elif is_retryable(exception):
+                limited.append(request_id)
+            else:
+                print(f"  Warning: could not fetch thread {request_id}: {exception}", file=sys.stderr)
+
+        batch = service.new_batch_http_request(callback=callback)
+        for thread_id in chunk:
+            batch.add(thread_request(service, thread_id), request_id=thread_id)
+        try:
+            batch.execute()
+        except Exception as e:
+            if is_transport_error(e):
+                print(f"  Warning: batch request failed: {e!r}", file=sys.stderr)
+            elif not is_retryable(e):
+                raise
+            # The whole batch was throttled or lost; retry whatever didn't get a response
+            answered = set(limited) | results.keys()
+            limited.extend(thread_id for thread_id in chunk if thread_id not in answered)
+
+        if not limited:
+            backoff = 0
+            current_size = min(batch_size, current_size * 2)
+            continue
+
+        for thread_id in limited:
+            failures[thread_id] = failures.get(thread_id, 0) + 1
+            if failures[thread_id] > max_retries:
+                print(f"  Warning: giving up on thread {thread_id} after {max_retries} retries",
+                      file=sys.stderr)
+            else:
+                queue.append(thread_id)
+        backoff += 1
+        current_size = max(1, len(chunk) - len(limited))
+        sleep(retry_delay(backoff))
+
+    return results
+
+
+def fetch_thread_messages(service, thread_ids: list[str], batch_size: int = BATCH_SIZE,
+                          max_retries: int = MAX_RETRIES, sleep=None) -> dict[str, list[dict]]:
+    """
+    Fetch message metadata for many threads (see fetch_thread_metadata).
+    Returns: { thread_id: [message, ...] }
+    """
+    threads = fetch_thread_metadata(service, thread_ids, batch_size, max_retries, sleep)
+    return {thread_id: thread.get("messages", []) for thread_id, thread in threads.items()}
+
+
+# ---------------------------------------------------------------------------
+# Thread metadata cache
+# ---------------------------------------------------------------------------
+
+CACHE_PATH = Path(__file__).parent.parent / ".cache" / "gmail_threads.sqlite"
+DEFAULT_CACHE_MB = 64
+
+
+class ThreadCache:
+    """
+    SQLite cache of threads.get metadata payloads, keyed by thread id.
+
+    A cached thread is only served while its historyId still matches the one
+    threads.list reports (any new, deleted or relabelled message changes it).
+    Payloads are stored as zlib-compressed JSON; when the total exceeds
+    max_bytes the least recently used threads are evicted.
+    """
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_CACHE_MB * 1024 * 1024):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS threads (
+                thread_id TEXT PRIMARY KEY,
+                history_id TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get_many(self, history_ids: dict[str, str]) -> dict[str, dict]:
+        """Return cached threads whose historyId matches; marks them as used."""
+        found = {}
+        ids = list(history_ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT thread_id, history_id, payload FROM threads "
+                f"WHERE thread_id IN ({','.join('?' * len(chunk))})", chunk)
+            for thread_id, history_id, payload in rows:
+                if history_id == str(history_ids[thread_id]):
+                    found[thread_id] = json.loads(zlib.decompress(payload))
+        if found:
+            now = time.time()
+            self.conn.executemany("UPDATE threads SET last_used = ? WHERE thread_id = ?",
+                                  [(now, thread_id) for thread_id in found])
+            self.conn.commit()
+        self.hits += len(found)
+        self.misses += len(ids) - len(found)
+        return found
+
+    def put_many(self, threads: list[dict]):
+        """Store thread payloads (as returned by threads.get), then evict down to max_bytes."""
+        now = time.time()
+        rows = []
+        for thread in threads:
+            if not thread.get("historyId"):
+                continue
+            payload = zlib.compress(json.dumps(thread, separators=(",", ":")).encode())
+            rows.append((thread["id"], str(thread["historyId"]), payload, len(payload), now))
+        self.conn.executemany("INSERT OR REPLACE INTO threads VALUES (?, ?, ?, ?, ?)", rows)
+        self.evict()
+        self.conn.commit()
+
+    def evict(self):
+        """Drop least recently used threads until the cache fits in max_bytes."""
+        self.conn.execute("""
+            DELETE FROM threads WHERE thread_id IN (
+                SELECT thread_id FROM (
+                    SELECT thread_id,
+                           SUM(size) OVER (ORDER BY last_used DESC, thread_id) AS running
+                    FROM threads
+                ) WHERE running > ?
+            )
+        """, (self.max_bytes,))
+
+    def size(self) -> int:
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM threads").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
 def parse_header(headers: list[dict], name: str) -> str:
     for h in headers:
         if h["name"].lower() == name.lower():
@@ -256,57 +697,93 @@ def parse_date(date_str: str) -> str:
         return date_str
 
 
-def process_threads(service, threads: list[dict]) -> dict[str, dict]:
+def message_date(msg: dict) -> str:
+    """ISO 8601 date of a message: Gmail's internalDate, else its Date header."""
+    if msg.get("internalDate"):
+        dt = datetime.fromtimestamp(int(msg["internalDate"]) / 1000, tz=timezone.utc)
+        return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    date_str = parse_header(msg.get("payload", {}).get("headers", []), "Date")
+    return parse_date(date_str) if date_str else ""
+
+
+def classify_message(msg: dict) -> dict | None:
+    """Status event for one message, or None for noise and unclassifiable mail."""
+    headers = msg.get("payload", {}).get("headers", [])
+    subject = parse_header(headers, "Subject")
+    sender = parse_header(headers, "From")
+    date_str = parse_header(headers, "Date")
+
+    classified = CLASSIFIER.classify(subject, msg.get("snippet", ""), sender)
+    if classified is None:
+        return None
+    status, company, role = classified
+
+    return {
+        "message_id": msg.get("id"),
+        "date": parse_date(date_str) if date_str else "",
+        "subject": subject,
+        "sender": sender,
+        "status": status,
+        "company": company,
+        "role": role,
+    }
+
+
+def classify_thread(messages: list[dict]) -> list[dict]:
+    """Turn a thread's messages into status events (one per classifiable, non-noise message)."""
+    return [event for event in map(classify_message, messages) if event is not None]
+
+
+def sync_threads(service, thread_ids: list[str], batch_size: int = BATCH_SIZE,
+                 cache: ThreadCache | None = None, history_ids: dict[str, str] | None = None) -> dict[str, dict]:
     """
-    Build a dict keyed by (company, role) with the best-known status.
-    Returns: { "Company | Role": { ...record... } }
+    Fetch and classify threads. With a cache, threads whose historyId (from the
+    list response, in history_ids) is unchanged are read locally instead.
+    Returns: { thread_id: {"latest": iso_date, "events": [...]} } in thread_ids order,
+    without the threads that couldn't be fetched.
     """
-    applications: dict[str, dict] = {}
-
-    for thread_meta in threads:
-        thread_id = thread_meta["id"]
-        try:
-            messages = get_thread_messages(service, thread_id)
-        except Exception as e:
-            print(f"  Warning: could not fetch thread {thread_id}: {e}", file=sys.stderr)
+    fetched = {}
+    if cache is not None and history_ids:
+        fetched = cache.get_many({t: history_ids[t] for t in thread_ids if history_ids.get(t)})
+    missing = [t for t in thread_ids if t not in fetched]
+    if missing:
+        downloaded = fetch_thread_metadata(service, missing, batch_size)
+        if cache is not None:
+            cache.put_many(list(downloaded.values()))
+        fetched.update(downloaded)
+
+    threads = {}
+    for thread_id in thread_ids:
+        if thread_id not in fetched:
             continue
+        messages = fetched[thread_id].get("messages", [])
+        threads[thread_id] = {
+            "latest": max((message_date(msg) for msg in messages), default=""),
+            "events": classify_thread(messages),
+        }
+    return threads
 
-        for msg in messages:
-            headers = msg.get("payload", {}).get("headers", [])
-            subject = parse_header(headers, "Subject")
-            sender = parse_header(headers, "From")
-            date_str = parse_header(headers, "Date")
-            snippet = msg.get("snippet", "")
-
-            # Skip noise senders
-            sender_email = re.search(r"<(.+?)>", sender)
-            sender_email = sender_email.group(1).lower() if sender_email else sender.lower()
-            if sender_email in NOISE_SENDERS:
-                continue
-
-            status = classify_email(subject, snippet)
-            if status is None:
-                continue
 
-            # Extract company
-            company = (
-                extract_company_from_sender(sender)
-                or extract_company_from_subject(subject)
-                or "Unknown"
-            )
+def build_applications(threads: dict[str, dict]) -> dict[str, dict]:
+    """
+    Merge per-thread events into a dict keyed by (company, role) with the best-known status.
+    Threads are visited in order (most recently active first, like Gmail lists them).
+    Returns: { "Company | Role": { ...record... } }
+    """
+    applications: dict[str, dict] = {}
 
-            # Extract role
-            role = extract_role_from_text(subject, snippet) or "Software Engineer"
+    for thread_id, thread in threads.items():
+        for event in thread["events"]:
+            status = event["status"]
+            iso_date = event["date"]
 
             # Build key: prefer exact company name match to deduplicate
-            key = f"{company} | {role}"
-
-            iso_date = parse_date(date_str) if date_str else ""
+            key = f"{event['company']} | {event['role']}"
 
             if key not in applications:
                 applications[key] = {
-                    "company": company,
-                    "role": role,
+                    "company": event["company"],
+                    "role": event["role"],
                     "status": status,
                     "applied_date": iso_date if status == "applied" else "",
                     "last_update": iso_date,
@@ -331,16 +808,170 @@ def process_threads(service, threads: list[dict]) -> dict[str, dict]:
 
             # Append email summary
             record["emails"].append({
-                "message_id": msg.get("id"),
+                "message_id": event["message_id"],
                 "date": iso_date,
-                "subject": subject,
-                "sender": sender,
+                "subject": event["subject"],
+                "sender": event["sender"],
                 "status_signal": status,
             })
 
     return applications
 
 
+def process_threads(service, threads: list[dict], batch_size: int = BATCH_SIZE,
+                    cache: ThreadCache | None = None) -> dict[str, dict]:
+    """
+    Build a dict keyed by (company, role) with the best-known status.
+    Returns: { "Company | Role": { ...record... } }
+    """
+    history_ids = {t["id"]: t.get("historyId") for t in threads}
+    return build_applications(sync_threads(service, list(history_ids), batch_size, cache, history_ids))
+
+
+# ---------------------------------------------------------------------------
+# Incremental sync state
+# ---------------------------------------------------------------------------
+
+STATE_VERSION = 1
+MAX_THREADS = 500
+
+SEARCH_FILTER = (
+    "(subject:(\"thank you for your application\" OR \"thank you for applying\" OR "
+    "\"we received your application\" OR \"interview\" OR \"offer letter\" OR "
+    "\"not moving forward\" OR \"rejection\" OR \"congratulations\") "
+    "OR from:(myworkday.com OR greenhouse.io OR lever.co OR ashbyhq.com OR "
+    "icims.com OR taleo.net OR workday.com OR smartrecruiters.com OR "
+    "careers.microsoft.com OR modernloop.io))"
+)
+
+
+class HistoryExpired(Exception):
+    """The saved historyId is older than Gmail keeps history for; a full sync is needed."""
+
+
+def search_query(days: int) -> str:
+    return f"newer_than:{days}d {SEARCH_FILTER}"
+
+
+def state_path_for(output_path: Path) -> Path:
+    """Sync state lives next to the output: application_status.json -> application_status.state.json"""
+    return output_path.with_name(f"{output_path.stem}.state.json")
+
+
+def load_state(path: Path) -> dict | None:
+    """Load saved sync state, or None if it is missing or from another version."""
+    try:
+        state = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    if state.get("version") != STATE_VERSION or not state.get("history_id"):
+        return None
+    return state
+
+
+def save_state(path: Path, state: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(state, indent=1, ensure_ascii=False))
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def get_history_id(service) -> str:
+    """Current mailbox historyId."""
+    return service.users().getProfile(userId="me").execute()["historyId"]
+
+
+def list_history_changes(service, start_history_id: str) -> tuple[set[str], set[str], str]:
+    """
+    Page through history.list since start_history_id.
+    Returns: (thread ids with added or deleted messages, thread ids with deletions, latest historyId)
+    """
+    changed: set[str] = set()
+    deleted: set[str] = set()
+    latest = start_history_id
+    history = service.users().history()
+    request = history.list(userId="me", startHistoryId=start_history_id,
+                           historyTypes=["messageAdded", "messageDeleted"], maxResults=500)
+    while request is not None:
+        try:
+            response = request.execute()
+        except Exception as e:
+            if getattr(getattr(e, "resp", None), "status", None) == 404:
+                raise HistoryExpired(str(e)) from e
+            raise
+        for record in response.get("history", []):
+            for added in record.get("messagesAdded", []):
+                changed.add(added["message"]["threadId"])
+            for removed in record.get("messagesDeleted", []):
+                changed.add(removed["message"]["threadId"])
+                deleted.add(removed["message"]["threadId"])
+        latest = response.get("historyId", latest)
+        request = history.list_next(request, response)
+    return changed, deleted, latest
+
+
+def full_sync(service, days: int, batch_size: int = BATCH_SIZE, cache: ThreadCache | None = None) -> dict:
+    """Search the whole look-back window and classify every matching thread."""
+    # Taken before searching, so nothing that arrives meanwhile is missed next time
+    history_id = get_history_id(service)
+
+    print(f"Fetching email threads from the last {days} days…")
+    threads = fetch_threads(service, search_query(days), max_results=MAX_THREADS)
+    print(f"Found {len(threads)} matching threads. Processing…")
+
+    return {
+        "version": STATE_VERSION,
+        "history_id": history_id,
+        "search_filter": SEARCH_FILTER,
+        "days": days,
+        "synced_at": now_iso(),
+        "threads": sync_threads(service, [t["id"] for t in threads], batch_size, cache,
+                                {t["id"]: t.get("historyId") for t in threads}),
+    }
+
+
+def incremental_sync(service, state: dict, batch_size: int = BATCH_SIZE,
+                     cache: ThreadCache | None = None) -> int:
+    """
+    Bring state up to date from Gmail history: only threads with new or deleted
+    messages are re-fetched. Returns the number of threads re-fetched.
+    """
+    changed, deleted, history_id = list_history_changes(service, state["history_id"])
+    print(f"{len(changed)} threads changed since the last sync.")
+    relevant = []
+    history_ids = {}
+    if changed:
+        # history.list ignores the search filter; keep changed threads that match it
+        # (searching only the days since the last sync) or that are tracked already
+        synced_at = datetime.strptime(state["synced_at"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+        since_days = min((datetime.now(timezone.utc) - synced_at).days + 2, state["days"])
+        matching = fetch_threads(service, search_query(since_days), max_results=MAX_THREADS)
+        history_ids = {t["id"]: t.get("historyId") for t in matching}
+        relevant = [t for t in changed if t in history_ids or t in state["threads"]]
+
+    refreshed = sync_threads(service, relevant, batch_size, cache, history_ids)
+    for thread_id in relevant:
+        if thread_id not in refreshed and thread_id in deleted:
+            state["threads"].pop(thread_id, None)
+
+    # Re-fetched threads have the newest activity, so they go first
+    fresh = dict(sorted(refreshed.items(), key=lambda item: item[1]["latest"], reverse=True))
+    state["threads"] = {**fresh, **{t: v for t, v in state["threads"].items() if t not in fresh}}
+    state["history_id"] = history_id
+    state["synced_at"] = now_iso()
+    return len(refreshed)
+
+
+def prune_threads(state: dict, days: int, now: datetime = None):
+    """Forget threads with no activity inside the look-back window, or beyond MAX_THREADS."""
+    now = now or datetime.now(timezone.utc)
+    cutoff = (now - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    recent = [(t, v) for t, v in state["threads"].items() if not v["latest"] or v["latest"] >= cutoff]
+    state["threads"] = dict(recent[:MAX_THREADS])
+
+
 def build_output(applications: dict[str, dict]) -> dict:
     """Structure the final JSON output."""
     entries = sorted(
@@ -363,37 +994,129 @@ def build_output(applications: dict[str, dict]) -> dict:
 
 
 # ---------------------------------------------------------------------------
-# CLI
+# Offline dumps
 # ---------------------------------------------------------------------------
 
-def main():
-    parser = argparse.ArgumentParser(description="Sync job applications from Gmail to JSON.")
-    parser.add_argument("--output", default=str(OUTPUT_PATH), help="Output JSON path")
-    parser.add_argument("--days", type=int, default=180, help="Look back this many days (default: 180)")
-    args = parser.parse_args()
+DUMP_HEADERS = ("Subject", "From", "To", "Date")
+SNIPPET_LENGTH = 200     # about what Gmail returns as a message snippet
+HTML_TAG = re.compile(r"<[^>]+>")
+FOLDING = re.compile(r"\r?\n(?=[ \t])")
 
-    print("Authenticating with Gmail…")
-    service = get_gmail_service()
 
-    query = (
-        f"newer_than:{args.days}d "
-        "(subject:(\"thank you for your application\" OR \"thank you for applying\" OR "
-        "\"we received your application\" OR \"interview\" OR \"offer letter\" OR "
-        "\"not moving forward\" OR \"rejection\" OR \"congratulations\") "
-        "OR from:(myworkday.com OR greenhouse.io OR lever.co OR ashbyhq.com OR "
-        "icims.com OR taleo.net OR workday.com OR smartrecruiters.com OR "
-        "careers.microsoft.com OR modernloop.io))"
-    )
+def dump_format(path: Path) -> str:
+    """'jsonl' or 'mbox', from the file extension, else from the first line."""
+    suffix = path.suffix.lower()
+    if suffix in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    if suffix == ".mbox":
+        return "mbox"
+    with path.open("rb") as f:
+        return "mbox" if f.readline().startswith(b"From ") else "jsonl"
 
-    print(f"Fetching email threads from the last {args.days} days…")
-    threads = fetch_threads(service, query, max_results=500)
-    print(f"Found {len(threads)} matching threads. Processing…")
 
-    applications = process_threads(service, threads)
+def iter_jsonl_messages(path: Path):
+    """Messages from a JSONL dump with one Gmail message or thread resource per line."""
+    with path.open(encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: {e}") from None
+            if "messages" in record:
+                for msg in record["messages"]:
+                    yield {"threadId": record.get("id"), **msg}
+            else:
+                yield record
+
+
+def mbox_header(message, name: str) -> str | None:
+    """A header unfolded, with RFC 2047 encoded words decoded."""
+    value = message[name]
+    if value is None:
+        return None
+    value = FOLDING.sub("", str(value))
+    if "=?" in value:
+        from email.header import decode_header, make_header
+        try:
+            value = str(make_header(decode_header(value)))
+        except (LookupError, ValueError):  # unknown charset or broken encoding
+            pass
+    return value
+
+
+def mbox_snippet(message) -> str:
+    """A Gmail-like snippet: the start of the text body, whitespace collapsed."""
+    bodies = {}
+    for part in message.walk():
+        content_type = part.get_content_type()
+        if content_type in ("text/plain", "text/html") and part.get_content_disposition() != "attachment":
+            bodies.setdefault(content_type, part)
+    body = bodies.get("text/plain") or bodies.get("text/html")
+    if body is None:
+        return ""
+    payload = body.get_payload(decode=True) or b""
+    try:
+        text = payload.decode(body.get_content_charset() or "utf-8", errors="replace")
+    except LookupError:
+        text = payload.decode("utf-8", errors="replace")
+    if body.get_content_type() == "text/html":
+        text = html.unescape(HTML_TAG.sub(" ", text))
+    return " ".join(text.split())[:SNIPPET_LENGTH]
+
+
+def mbox_thread_id(message) -> str | None:
+    """Gmail's X-GM-THRID (Takeout exports), else the first message the reply chain references."""
+    if message["X-GM-THRID"]:
+        return str(message["X-GM-THRID"]).strip()
+    chain = str(message["References"] or message["In-Reply-To"] or message["Message-ID"] or "").split()
+    return chain[0] if chain else None
+
+
+def iter_mbox_messages(path: Path):
+    """Messages from an mbox export, in the shape of Gmail's metadata format."""
+    import mailbox
+
+    for index, message in enumerate(mailbox.mbox(path, create=False)):
+        message_id = str(message["Message-ID"] or f"mbox-{index}").strip()
+        headers = [(name, mbox_header(message, name)) for name in DUMP_HEADERS]
+        yield {
+            "id": message_id,
+            "threadId": mbox_thread_id(message) or message_id,
+            "snippet": mbox_snippet(message),
+            "payload": {"headers": [{"name": name, "value": value} for name, value in headers if value is not None]},
+        }
+
+
+def classify_dump(path: Path) -> dict[str, dict]:
+    """
+    Stream a local JSONL or mbox export through the classifier, one message at a
+    time. Returns threads shaped like sync_threads() output, most recently active
+    first, leaving out threads without events.
+    """
+    messages = iter_mbox_messages(path) if dump_format(path) == "mbox" else iter_jsonl_messages(path)
+    threads: dict[str, dict] = {}
+    count = 0
+    for count, msg in enumerate(messages, 1):
+        thread = threads.setdefault(msg.get("threadId") or msg.get("id"), {"latest": "", "events": []})
+        thread["latest"] = max(thread["latest"], message_date(msg))
+        event = classify_message(msg)
+        if event is not None:
+            thread["events"].append(event)
+    print(f"Read {count} messages in {len(threads)} threads.")
+
+    classified = {t: v for t, v in threads.items() if v["events"]}
+    for thread in classified.values():
+        thread["events"].sort(key=lambda event: event["date"])
+    return dict(sorted(classified.items(), key=lambda item: item[1]["latest"], reverse=True))
+
 
-    output = build_output(applications)
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
 
-    out_path = Path(args.output)
+def write_output(out_path: Path, output: dict):
     out_path.parent.mkdir(parents=True, exist_ok=True)
     out_path.write_text(json.dumps(output, indent=2, ensure_ascii=False))
 
@@ -403,5 +1126,77 @@ def main():
         print(f"  {status:25s} {count}")
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Sync job applications from Gmail to JSON.")
+    parser.add_argument("--output", default=str(OUTPUT_PATH), help="Output JSON path")
+    parser.add_argument("--days", type=int, default=180, help="Look back this many days (default: 180)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"Threads fetched per batch HTTP request (default: {BATCH_SIZE}, max {MAX_BATCH_SIZE})")
+    parser.add_argument("--state", help="Sync state path (default: next to --output, *.state.json)")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore saved state and re-scan the whole look-back window")
+    parser.add_argument("--cache", default=str(CACHE_PATH),
+                        help="Thread metadata cache (default: .cache/gmail_threads.sqlite)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_MB,
+                        help=f"Cache size limit in MB (default: {DEFAULT_CACHE_MB})")
+    parser.add_argument("--no-cache", action="store_true", help="Always fetch threads from Gmail")
+    parser.add_argument("--rules", default=str(RULES_PATH),
+                        help="Classification rules (default: .github/application_rules.json)")
+    parser.add_argument("--from-dump", metavar="PATH",
+                        help="Classify a local JSONL or mbox export instead of reading Gmail "
+                             "(no Google libraries needed; state, cache and --days are not used)")
+    args = parser.parse_args()
+
+    global CLASSIFIER
+    if Path(args.rules).resolve() != RULES_PATH.resolve():
+        CLASSIFIER = load_classifier(Path(args.rules))
+
+    out_path = Path(args.output)
+    state_path = Path(args.state) if args.state else state_path_for(out_path)
+
+    if args.from_dump:
+        print(f"Classifying {args.from_dump}…")
+        write_output(out_path, build_output(build_applications(classify_dump(Path(args.from_dump)))))
+        return
+
+    print("Authenticating with Gmail…")
+    service = get_gmail_service()
+
+    state = None if args.full else load_state(state_path)
+    if state and (state.get("search_filter") != SEARCH_FILTER or args.days > state.get("days", 0)):
+        print("Search filter or look-back window changed; running a full sync.")
+        state = None
+    elif state and state.get("rules") != CLASSIFIER.digest:
+        # Saved events were classified with other rules; the thread cache keeps this cheap
+        print("Classification rules changed; running a full sync.")
+        state = None
+
+    cache = None if args.no_cache else ThreadCache(Path(args.cache), args.cache_size * 1024 * 1024)
+
+    if state:
+        print(f"Syncing changes since historyId {state['history_id']}…")
+        try:
+            refreshed = incremental_sync(service, state, args.batch_size, cache)
+            print(f"Re-fetched {refreshed} threads.")
+        except HistoryExpired:
+            print("Saved historyId has expired; running a full sync.")
+            state = None
+
+    if state is None:
+        state = full_sync(service, args.days, args.batch_size, cache)
+
+    if cache is not None:
+        print(f"Thread cache: {cache.hits} hits, {cache.misses} misses, {cache.size() // 1024} KB")
+        cache.close()
+
+    state["days"] = args.days
+    state["rules"] = CLASSIFIER.digest
+    prune_threads(state, args.days)
+    applications = build_applications(state["threads"])
+
+    write_output(out_path, build_output(applications))
+    save_state(state_path, state)
+
+
 if __name__ == "__main__":
     main()
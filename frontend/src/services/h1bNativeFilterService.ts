@@ -118,13 +118,13 @@ export class H1BNativeFilterService {
 
     // Salary range filters
     if (filters.minSalary !== null && filters.minSalary !== undefined && filters.minSalary > 0) {
-      // Check either wage_rate_of_pay_from or wage_rate_of_pay_to
-      query = query.or(`wage_rate_of_pay_from.gte.${filters.minSalary},wage_rate_of_pay_to.gte.${filters.minSalary}`);
+      // Check either annual_wage_from or annual_wage_to (yearly amounts, whatever the unit of pay)
+      query = query.or(`annual_wage_from.gte.${filters.minSalary},annual_wage_to.gte.${filters.minSalary}`);
     }
 
     if (filters.maxSalary !== null && filters.maxSalary !== undefined && filters.maxSalary > 0) {
-      // Check either wage_rate_of_pay_from or wage_rate_of_pay_to
-      query = query.or(`wage_rate_of_pay_from.lte.${filters.maxSalary},wage_rate_of_pay_to.lte.${filters.maxSalary}`);
+      // Check either annual_wage_from or annual_wage_to (yearly amounts, whatever the unit of pay)
+      query = query.or(`annual_wage_from.lte.${filters.maxSalary},annual_wage_to.lte.${filters.maxSalary}`);
     }
 
     // Text search across multiple fields
@@ -271,8 +271,8 @@ export class H1BNativeFilterService {
         .select(`
           case_status,
           employer_name,
-          wage_rate_of_pay_from,
-          wage_rate_of_pay_to
+          annual_wage_from,
+          annual_wage_to
         `);
 
       // Apply same filters as main query
@@ -291,7 +291,7 @@ export class H1BNativeFilterService {
 
       // Calculate salary statistics
       const salaries = records
-        .map(record => record.wage_rate_of_pay_from || record.wage_rate_of_pay_to)
+        .map(record => record.annual_wage_from || record.annual_wage_to)
         .filter((salary): salary is number => salary != null && salary > 0)
         .sort((a, b) => a - b);
 
@@ -144,11 +144,11 @@ export class H1BStatisticsService {
       }
 
       if (filters.minSalary !== null && filters.minSalary !== undefined) {
-        query = query.or(`wage_rate_of_pay_from.gte.${filters.minSalary},wage_rate_of_pay_to.gte.${filters.minSalary}`);
+        query = query.or(`annual_wage_from.gte.${filters.minSalary},annual_wage_to.gte.${filters.minSalary}`);
       }
 
       if (filters.maxSalary !== null && filters.maxSalary !== undefined) {
-        query = query.or(`wage_rate_of_pay_from.lte.${filters.maxSalary},wage_rate_of_pay_to.lte.${filters.maxSalary}`);
+        query = query.or(`annual_wage_from.lte.${filters.maxSalary},annual_wage_to.lte.${filters.maxSalary}`);
       }
 
       if (filters.searchTerm) {
@@ -23,6 +23,10 @@ export interface H1BRecord {
   wage_rate_of_pay_to?: number;
   wage_unit_of_pay?: string;
   prevailing_wage?: number;
+  pw_unit_of_pay?: string;
+  annual_wage_from?: number;
+  annual_wage_to?: number;
+  annual_prevailing_wage?: number;
   created_at?: string;
   updated_at?: string;
 }
@@ -0,0 +1,98 @@
+"""
+Benchmark delta fingerprinting and check that it doesn't depend on chunking.
+
+Usage:
+    python benchmark_delta.py [--rows N] [--repeat N]
+
+Builds synthetic workbook rows (whole and fractional wages, blanks, dates)
+and fingerprints them the way parser.py --delta does, chunk by chunk. Every
+chunk size must give the same fingerprint index, and diffing the same rows
+against that index with another chunk size must find nothing new or
+changed. Then reports rows/sec for fingerprinting at the default chunk size.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from delta import DeltaTracker, row_fingerprints
+from parser import DEFAULT_CHUNK_SIZE
+
+COLUMNS = ['CASE_NUMBER', 'CASE_STATUS', 'DECISION_DATE', 'EMPLOYER_NAME', 'EMPLOYER_POSTAL_CODE',
+           'WAGE_RATE_OF_PAY_FROM', 'WAGE_RATE_OF_PAY_TO', 'WAGE_UNIT_OF_PAY', 'PREVAILING_WAGE']
+CHECK_CHUNK_SIZES = [1, 3, 1000, DEFAULT_CHUNK_SIZE]
+
+
+def make_rows(count: int, seed: int = 42) -> list:
+    """Build count synthetic rows as openpyxl reads them (values_only tuples)"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    rows = []
+    for i in range(count):
+        wage = rng.choice([rng.randint(60000, 250000), float(rng.randint(60000, 250000)), None,
+                           round(rng.uniform(20, 90), 2), rng.randint(20000, 90000) / 1000])
+        rows.append((
+            f'I-200-{25000 + i // 1000}-{i:06d}',
+            rng.choice(['Certified', 'Denied', 'Withdrawn']),
+            rng.choice([None, start + timedelta(days=rng.randint(0, 364))]),
+            f'Employer {rng.randint(1, 5000)}',
+            rng.choice([10019, '07981', None]),
+            wage,
+            rng.choice([None, wage]),
+            rng.choice(['Year', 'Hour']),
+            rng.choice([104976, 111966.5, 48.27, None]),
+        ))
+    return rows
+
+
+def iter_chunks(rows: list, chunk_size: int):
+    """Yield DataFrames of chunk_size rows, like parser.iter_workbook_chunks"""
+    for start in range(0, len(rows), chunk_size):
+        yield pd.DataFrame.from_records(rows[start:start + chunk_size], columns=COLUMNS)
+
+
+def fingerprint_index(rows: list, chunk_size: int) -> pd.Series:
+    """Fingerprints of every row, chunked by chunk_size"""
+    return pd.concat([row_fingerprints(chunk) for chunk in iter_chunks(rows, chunk_size)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark delta fingerprinting.")
+    parser.add_argument("--rows", type=int, default=200000, help="Synthetic rows (default: 200000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs, best is reported")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+
+    # Correctness first: the chunk size must not change any fingerprint
+    sample = rows[:3000]
+    expected = fingerprint_index(sample, DEFAULT_CHUNK_SIZE)
+    for chunk_size in CHECK_CHUNK_SIZES:
+        actual = fingerprint_index(sample, chunk_size)
+        if not expected.equals(actual):
+            mismatches = int((expected.to_numpy() != actual.to_numpy()).sum())
+            raise SystemExit(f"❌ chunk size {chunk_size}: {mismatches} of {len(sample)} fingerprints differ")
+        tracker = DeltaTracker(expected)
+        for _ in tracker.filter_chunks(iter_chunks(sample, chunk_size)):
+            pass
+        if tracker.counts['insert'] or tracker.counts['update']:
+            raise SystemExit(f"❌ chunk size {chunk_size}: unchanged rows diffed as {tracker.counts}")
+    print(f"✅ Fingerprints match on {len(sample)} rows at chunk sizes "
+          f"{', '.join(str(size) for size in CHECK_CHUNK_SIZES)}")
+
+    chunks = list(iter_chunks(rows, DEFAULT_CHUNK_SIZE))
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        for chunk in chunks:
+            row_fingerprints(chunk)
+        timings.append(time.perf_counter() - started)
+
+    print(f"\n📊 Fingerprinting {args.rows} rows in chunks of {DEFAULT_CHUNK_SIZE} (best of {args.repeat}):")
+    print(f"  row_fingerprints : {args.rows / min(timings):12,.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Fingerprint index and delta extraction between quarterly LCA releases.
+
+Each quarterly disclosure file repeats most CASE_NUMBERs from the previous
+quarter. When parser.py runs with --delta, every parsed row is hashed and
+compared with the fingerprint index (case_number -> row hash) saved for the
+previous release, and only three kinds of cases are emitted:
+
+    insert  - case numbers not in the previous release
+    update  - case numbers whose row hash changed
+    missing - case numbers in the previous release but not listed in this one
+
+A missing case isn't necessarily withdrawn (that is a CASE_STATUS): a new
+fiscal year's first release doesn't repeat the previous year's cases at all.
+The uploader only deletes missing cases when asked to (--delete-missing).
+
+The fingerprint index for the current release is written next to the delta so
+it can be passed as --since on the next quarterly run. It only stores a 64-bit
+hash per case number, so it stays small even for full-year releases.
+"""
+import json
+
+import pandas as pd
+
+from parser import DATE_COLUMNS
+
+# Column added to delta rows so the uploader can tell inserts from updates
+DELTA_OP_COLUMN = 'DELTA_OP'
+
+
+def fingerprint_path(filename: str) -> str:
+    """Default location of the fingerprint index for a release"""
+    return f'data/output/{filename}.fingerprints.parquet'
+
+
+def whole_to_int(value):
+    """A whole float as an int (273000.0 -> 273000); any other value unchanged"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def normalize_for_hash(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Render every column as text so equal values hash equally across chunks
+
+    Dates are written as ISO strings and whole-number floats as integers, value
+    by value, so a wage hashes the same whether its chunk was read as integers,
+    as floats (a blank or a fractional wage elsewhere in the chunk) or as mixed
+    objects.
+    """
+    normalized = pd.DataFrame(index=chunk.index)
+    for name in chunk.columns:
+        column = chunk[name]
+        if name in DATE_COLUMNS:
+            column = pd.to_datetime(column, errors='coerce').dt.strftime('%Y-%m-%dT%H:%M:%S')
+        elif pd.api.types.is_float_dtype(column):
+            whole = (column % 1 == 0) & (column.abs() < 2 ** 63)
+            text = column.astype('string')
+            text[whole] = column[whole].astype('int64').astype('string')
+            column = text
+        elif column.dtype == object:
+            column = column.map(whole_to_int)
+        normalized[name] = column.astype('string').str.strip()
+    return normalized
+
+
+def row_fingerprints(chunk: pd.DataFrame) -> pd.Series:
+    """Hash each row to a uint64, indexed by case number"""
+    hashes = pd.util.hash_pandas_object(normalize_for_hash(chunk), index=False)
+    hashes.index = chunk['CASE_NUMBER'].astype('string')
+    return hashes
+
+
+def load_fingerprints(path: str) -> pd.Series:
+    """Load a fingerprint index as a Series of row hashes keyed by case number"""
+    index = pd.read_parquet(path)
+    return pd.Series(index['row_hash'].to_numpy(), index=index['case_number'].astype('string'))
+
+
+def write_fingerprints(path: str, fingerprints: list) -> int:
+    """Write the collected per-chunk fingerprints as the release's index"""
+    hashes = pd.concat(fingerprints) if fingerprints else pd.Series([], dtype='uint64')
+    hashes = hashes[~hashes.index.duplicated(keep='last')]
+    pd.DataFrame({'case_number': hashes.index, 'row_hash': hashes.to_numpy()}).to_parquet(
+        path, index=False)
+    return len(hashes)
+
+
+class DeltaTracker:
+    """Filter parsed chunks down to new and changed cases against a previous index"""
+
+    def __init__(self, previous: pd.Series = None):
+        self.previous = previous if previous is not None else pd.Series([], dtype='uint64')
+        self.fingerprints = []
+        self.counts = {'insert': 0, 'update': 0, 'unchanged': 0}
+
+    def filter_chunks(self, chunks):
+        """Yield only inserted/changed rows of each chunk, tagged with DELTA_OP"""
+        for chunk in chunks:
+            chunk = chunk[chunk['CASE_NUMBER'].notna()]
+            hashes = row_fingerprints(chunk)
+            self.fingerprints.append(hashes)
+
+            previous = self.previous.reindex(hashes.index)
+            is_new = previous.isna().to_numpy()
+            is_changed = ~is_new & (previous.to_numpy() != hashes.to_numpy())
+
+            self.counts['insert'] += int(is_new.sum())
+            self.counts['update'] += int(is_changed.sum())
+            self.counts['unchanged'] += int(len(chunk) - is_new.sum() - is_changed.sum())
+
+            delta = chunk[is_new | is_changed].copy()
+            delta[DELTA_OP_COLUMN] = ['insert' if new else 'update' for new in is_new[is_new | is_changed]]
+            yield delta
+
+    def missing(self) -> list:
+        """Case numbers in the previous release that this release no longer lists"""
+        if not self.fingerprints:
+            return sorted(self.previous.index)
+        seen = pd.Index(pd.concat([hashes.index.to_series() for hashes in self.fingerprints]))
+        return sorted(self.previous.index.difference(seen))
+
+
+def write_missing(path: str, case_numbers: list):
+    """Write missing case numbers as a JSON array for upload_to_supabase.py --delete-missing"""
+    with open(path, 'w') as file:
+        json.dump(list(case_numbers), file, indent=4)
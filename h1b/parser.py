@@ -1,21 +1,279 @@
-import pandas as pd
+"""
+Parse DOL LCA disclosure workbooks into records for the H1B uploaders.
+
+Usage:
+    python parser.py [FILENAME] [--format json|parquet] [--stream] [--chunk-size N]
+    python parser.py FILENAME --delta [--since PREVIOUS_FILENAME] [--format json|parquet]
+
+By default the whole workbook is loaded with pandas and written as one JSON
+array to data/output/{FILENAME}.json. With --stream the workbook is read row
+by row in chunks and written incrementally as NDJSON (one record per line) to
+data/output/{FILENAME}.ndjson, so memory stays bounded by the chunk size.
+
+With --format parquet the records are written to data/output/{FILENAME}.parquet
+with typed columns: dates as timestamps, wages as float64 and low-cardinality
+columns (status, visa class, states, pay units) dictionary-encoded. Combined
+with --stream, each chunk becomes one Parquet row group.
+
+With --delta only the cases that differ from the previous release are written
+(see delta.py): new and changed rows go to data/output/{FILENAME}.delta.ndjson
+(or .delta.parquet) tagged with a DELTA_OP column, case numbers the previous
+release listed but this one doesn't go to data/output/{FILENAME}.missing.json, and the
+release's fingerprint index is saved as data/output/{FILENAME}.fingerprints.parquet
+for the next run's --since. Without --since every row counts as new.
+
+Parquet output requires pyarrow.
+"""
+import argparse
 import json
 
+import pandas as pd
+
 # Set the option to display all columns
 pd.set_option('display.max_columns', None)
 
-filename = "LCA_Disclosure_Data_FY2025_Q3"
-# filename = "sample"
-# excel_file_path = 'data/sample.xlsx'  # Replace with your file path
-excel_file_path = f'data/raw/{filename}.xlsx'
-df = pd.read_excel(excel_file_path)
+DEFAULT_FILENAME = "LCA_Disclosure_Data_FY2025_Q3"
+COMPANY_MAPPING_PATH = "data/company.json"
+DEFAULT_CHUNK_SIZE = 10000
+
+# Column typing used for the Parquet output
+DATE_COLUMNS = {'RECEIVED_DATE', 'DECISION_DATE', 'ORIGINAL_CERT_DATE', 'BEGIN_DATE', 'END_DATE'}
+WAGE_COLUMNS = {'WAGE_RATE_OF_PAY_FROM', 'WAGE_RATE_OF_PAY_TO', 'PREVAILING_WAGE'}
+CATEGORY_COLUMNS = {
+    'CASE_STATUS', 'VISA_CLASS', 'FULL_TIME_POSITION', 'WAGE_UNIT_OF_PAY',
+    'PW_UNIT_OF_PAY', 'PW_WAGE_LEVEL', 'EMPLOYER_COUNTRY',
+}
+
+
+def load_company_mapping(path: str = COMPANY_MAPPING_PATH) -> dict:
+    """Load the employer name canonicalization mapping"""
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def parse_workbook(excel_file_path: str, output_path: str, company_mapping: dict):
+    """Load the whole workbook and write it as a single JSON array"""
+    df = pd.read_excel(excel_file_path)
+    df["EMPLOYER_NAME"] = df["EMPLOYER_NAME"].replace(company_mapping)
+
+    # Convert to JSON with ISO date format
+    df.to_json(output_path, orient='records', date_format='iso', indent=4)
+    return len(df)
+
+
+def iter_workbook_chunks(excel_file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Yield DataFrames of at most chunk_size rows, reading the sheet row by row"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(excel_file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        chunk = []
+        for row in rows:
+            # Read-only sheets can report trailing formatted-but-empty rows
+            if all(value is None for value in row):
+                continue
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame.from_records(chunk, columns=header)
+                chunk = []
+
+        if chunk:
+            yield pd.DataFrame.from_records(chunk, columns=header)
+    finally:
+        workbook.close()
+
+
+def apply_company_mapping(chunks, company_mapping: dict):
+    """Canonicalize EMPLOYER_NAME in each chunk"""
+    for chunk in chunks:
+        chunk["EMPLOYER_NAME"] = chunk["EMPLOYER_NAME"].replace(company_mapping)
+        yield chunk
+
+
+def write_ndjson_chunks(chunks, output_path: str, show_progress: bool = True) -> int:
+    """Append each DataFrame chunk to an NDJSON file; returns rows written"""
+    total_rows = 0
+    with open(output_path, 'w', encoding='utf-8') as out:
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            lines = chunk.to_json(orient='records', date_format='iso', lines=True)
+            out.write(lines)
+            if not lines.endswith('\n'):
+                out.write('\n')
+
+            total_rows += len(chunk)
+            if show_progress:
+                print(f"  ✓ {total_rows} rows written...")
+    return total_rows
+
+
+def parse_workbook_streaming(excel_file_path: str, output_path: str, company_mapping: dict,
+                             chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Stream the workbook in chunks and append each chunk to an NDJSON file"""
+    chunks = iter_workbook_chunks(excel_file_path, chunk_size)
+    return write_ndjson_chunks(apply_company_mapping(chunks, company_mapping), output_path)
+
+
+def is_category_column(name: str) -> bool:
+    """Return True for columns stored dictionary-encoded in Parquet"""
+    return name in CATEGORY_COLUMNS or name.endswith('_STATE')
+
+
+def arrow_schema(columns):
+    """Build the Parquet schema for the given workbook columns"""
+    import pyarrow as pa
+
+    fields = []
+    for name in columns:
+        if name in DATE_COLUMNS:
+            fields.append(pa.field(name, pa.timestamp('ms')))
+        elif name in WAGE_COLUMNS:
+            fields.append(pa.field(name, pa.float64()))
+        elif is_category_column(name):
+            fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+def frame_to_arrow(df: pd.DataFrame, schema):
+    """Convert a workbook DataFrame to an Arrow table matching schema"""
+    import pyarrow as pa
+
+    arrays = []
+    for field in schema:
+        series = df[field.name]
+        if field.name in DATE_COLUMNS:
+            series = pd.to_datetime(series, errors='coerce')
+            arrays.append(pa.array(series, type=pa.timestamp('ms'), from_pandas=True))
+        elif field.name in WAGE_COLUMNS:
+            series = pd.to_numeric(series, errors='coerce').astype('float64')
+            arrays.append(pa.array(series, type=pa.float64(), from_pandas=True))
+        else:
+            # Whole-number floats (ints with gaps, e.g. postal codes) keep their integer text
+            if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+                series = series.astype('Int64')
+            text = pa.array(series.astype('string'), type=pa.string(), from_pandas=True)
+            arrays.append(text.dictionary_encode() if is_category_column(field.name) else text)
+
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def write_parquet_chunks(chunks, output_path: str, show_progress: bool = True) -> int:
+    """Write DataFrame chunks as typed Parquet, one row group per chunk"""
+    import pyarrow.parquet as pq
+
+    total_rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = arrow_schema(chunk.columns)
+                writer = pq.ParquetWriter(output_path, schema, compression='zstd')
+            writer.write_table(frame_to_arrow(chunk, schema))
+
+            total_rows += len(chunk)
+            if show_progress:
+                print(f"  ✓ {total_rows} rows written...")
+    finally:
+        if writer is not None:
+            writer.close()
+    return total_rows
+
+
+def parse_workbook_parquet(excel_file_path: str, output_path: str, company_mapping: dict,
+                           stream: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Write the workbook as typed Parquet, one row group per chunk when streaming"""
+    if stream:
+        chunks = iter_workbook_chunks(excel_file_path, chunk_size)
+    else:
+        chunks = iter([pd.read_excel(excel_file_path)])
+    return write_parquet_chunks(apply_company_mapping(chunks, company_mapping), output_path,
+                                show_progress=stream)
+
+
+def parse_workbook_delta(excel_file_path: str, filename: str, company_mapping: dict,
+                         since: str = None, output_format: str = "json",
+                         chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Write only the cases that changed since a previous release, plus its fingerprint index"""
+    from delta import DeltaTracker, fingerprint_path, load_fingerprints, write_fingerprints, write_missing
+
+    previous = None
+    if since:
+        since_path = since if since.endswith('.parquet') else fingerprint_path(since)
+        previous = load_fingerprints(since_path)
+        print(f"📊 Previous release: {since_path} ({len(previous)} cases)")
+    else:
+        print("⚠️  No --since given, every case is treated as new")
+
+    tracker = DeltaTracker(previous)
+    chunks = apply_company_mapping(iter_workbook_chunks(excel_file_path, chunk_size), company_mapping)
+    if output_format == "parquet":
+        delta_path = f'data/output/{filename}.delta.parquet'
+        write_parquet_chunks(tracker.filter_chunks(chunks), delta_path, show_progress=False)
+    else:
+        delta_path = f'data/output/{filename}.delta.ndjson'
+        write_ndjson_chunks(tracker.filter_chunks(chunks), delta_path, show_progress=False)
+
+    missing = tracker.missing()
+    missing_path = f'data/output/{filename}.missing.json'
+    write_missing(missing_path, missing)
+    index_size = write_fingerprints(fingerprint_path(filename), tracker.fingerprints)
+
+    counts = tracker.counts
+    print(f"✅ Delta saved to {delta_path} "
+          f"({counts['insert']} new, {counts['update']} changed, {counts['unchanged']} unchanged)")
+    print(f"✅ {len(missing)} case numbers missing since the previous release saved to {missing_path}")
+    print(f"✅ Fingerprint index saved to {fingerprint_path(filename)} ({index_size} cases)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert an LCA disclosure workbook for upload.")
+    parser.add_argument("filename", nargs="?", default=DEFAULT_FILENAME,
+                        help="Workbook name in data/raw/ without the .xlsx extension")
+    parser.add_argument("--format", choices=["json", "parquet"], default="json",
+                        help="Output format (default: json)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Read the workbook in chunks and write incrementally "
+                             "(NDJSON for --format json)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Rows per chunk in streaming mode (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--delta", action="store_true",
+                        help="Write only new and changed cases, plus the case numbers missing "
+                             "since --since (always streams)")
+    parser.add_argument("--since", metavar="PREVIOUS_FILENAME",
+                        help="Previous release to diff against with --delta "
+                             "(its data/output/*.fingerprints.parquet, or a path to one)")
+    args = parser.parse_args()
+
+    excel_file_path = f'data/raw/{args.filename}.xlsx'
+    company_mapping = load_company_mapping()
+
+    if args.delta:
+        parse_workbook_delta(excel_file_path, args.filename, company_mapping, args.since,
+                             args.format, args.chunk_size)
+        return
+
+    if args.format == "parquet":
+        output_path = f'data/output/{args.filename}.parquet'
+        row_count = parse_workbook_parquet(excel_file_path, output_path, company_mapping,
+                                           stream=args.stream, chunk_size=args.chunk_size)
+    elif args.stream:
+        output_path = f'data/output/{args.filename}.ndjson'
+        row_count = parse_workbook_streaming(excel_file_path, output_path, company_mapping,
+                                             args.chunk_size)
+    else:
+        output_path = f'data/output/{args.filename}.json'
+        row_count = parse_workbook(excel_file_path, output_path, company_mapping)
 
-with open("data/company.json", 'r') as file:
-    company_mapping = json.load(file)
+    print(f"DataFrame saved to {output_path} ({row_count} rows)")
 
-df["EMPLOYER_NAME"] =  df["EMPLOYER_NAME"].replace(company_mapping)
 
-# Convert to JSON with epoch date format
-df.to_json(f'data/output/{filename}.json', orient='records',date_format='iso', indent=4)
-print(f"DataFrame saved to data/output/{filename}.json")
-# print(df.head())
\ No newline at end of file
+if __name__ == "__main__":
+    main()
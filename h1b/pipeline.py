@@ -0,0 +1,407 @@
+"""
+Parse, convert and upload an LCA disclosure workbook in one overlapped pipeline.
+
+Usage:
+    python pipeline.py [FILENAME] [--file PARSED_FILE] [--method rest|copy]
+                       [--convert-processes N] [--queue-size N] [--chunk-size N]
+                       [--merge-policy skip|overwrite|changed] [--delete-missing]
+
+Instead of parser.py writing a file that upload_to_supabase.py then loads and
+converts in full, three stages run at the same time, connected by bounded
+queues:
+
+    reader   - streams the workbook (or a parsed .parquet/.ndjson file) in chunks
+    convert  - turns each chunk into upload-ready columns (convert_table_for_db),
+               optionally in a process pool so it doesn't compete with the
+               upload threads for the GIL
+    upload   - cuts converted chunks into adaptive batches and sends them with
+               the concurrent upload engine (REST), or COPYs each chunk (copy)
+
+A stage blocks when the queue in front of it is full, so memory stays at
+roughly queue-size chunks per stage no matter how large the workbook is, and
+the slowest stage (usually the network) sets the pace.
+
+A parser.py --delta file passed with --file is merged with 'overwrite' by
+default and its missing cases are only deleted with --delete-missing, as in
+upload_to_supabase.py.
+
+The pipeline doesn't keep a checkpoint ledger; for resumable uploads parse to
+a file and use upload_to_supabase.py --resume.
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+from parser import (DEFAULT_CHUNK_SIZE, DEFAULT_FILENAME, apply_company_mapping, arrow_schema,
+                    frame_to_arrow, iter_workbook_chunks, load_company_mapping)
+
+# Reuse the converters and upload machinery from the main uploader in supabase/scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'supabase', 'scripts'))
+from upload_to_supabase import (FIELD_MAPPING, MERGE_POLICIES, UPSERT_COUNTS, convert_table_for_db,
+                                is_delta_file, load_case_numbers, missing_file_for,
+                                print_upsert_counts, records_to_table)
+
+DEFAULT_QUEUE_SIZE = 4
+
+# Marks the end of a stage's output
+END = object()
+
+
+class StageError:
+    """Carries an exception from a stage thread to the consumer"""
+
+    def __init__(self, stage: str, error: Exception):
+        self.stage = stage
+        self.error = error
+
+
+def iter_parsed_file_chunks(file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Yield chunks of a parsed .parquet (Arrow tables) or .ndjson (raw lines) file
+
+    NDJSON lines are decoded in the convert stage, so a process pool takes the
+    JSON parsing off the reader too.
+    """
+    if file_path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(file_path, memory_map=True)
+        columns = [name for name in FIELD_MAPPING if name in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield pa.Table.from_batches([batch])
+    elif file_path.endswith('.ndjson'):
+        with open(file_path, 'r', encoding='utf-8') as file:
+            chunk = []
+            for line in file:
+                if line.strip():
+                    chunk.append(line)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+    else:
+        raise ValueError(f"Pipeline input must be .parquet or .ndjson, got {file_path}")
+
+
+def convert_chunk(chunk):
+    """Convert one reader chunk (DataFrame, Arrow table or NDJSON lines) for the database
+
+    Workbook chunks go through the same typing as parser.py's Parquet output,
+    so the pipeline uploads exactly what parse-to-Parquet-then-upload would.
+    """
+    if isinstance(chunk, pd.DataFrame):
+        chunk = chunk[[name for name in FIELD_MAPPING if name in chunk.columns]]
+        chunk = frame_to_arrow(chunk, arrow_schema(chunk.columns))
+    elif isinstance(chunk, list):
+        chunk = records_to_table([json.loads(line) for line in chunk])
+    return convert_table_for_db(chunk)
+
+
+def timed_convert_chunk(chunk):
+    """convert_chunk, also returning how long the conversion took"""
+    started = time.perf_counter()
+    db_table = convert_chunk(chunk)
+    return db_table, time.perf_counter() - started
+
+
+def put(out_queue: queue.Queue, item, stop: threading.Event) -> bool:
+    """Block until item is queued; returns False if the pipeline is stopping"""
+    while not stop.is_set():
+        try:
+            out_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def iter_queue(in_queue: queue.Queue, stop: threading.Event):
+    """Yield items from a stage queue until END, re-raising stage errors; stops if the pipeline is stopping"""
+    while True:
+        try:
+            item = in_queue.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return
+            continue
+        if item is END:
+            return
+        if isinstance(item, StageError):
+            raise RuntimeError(f"{item.stage} stage failed: {item.error}") from item.error
+        yield item
+
+
+class Pipeline:
+    """Reader -> convert -> upload stages connected by bounded queues"""
+
+    def __init__(self, chunks, convert_processes: int = 0, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.chunks = chunks
+        self.convert_processes = convert_processes
+        self.raw_chunks = queue.Queue(maxsize=queue_size)
+        self.converted = queue.Queue(maxsize=queue_size)
+        self.queue_size = queue_size
+        self.stop = threading.Event()
+        self.stats = {'read': 0, 'converted': 0, 'read_seconds': 0.0, 'convert_seconds': 0.0,
+                      'max_raw_queue': 0, 'max_converted_queue': 0}
+
+    def read_stage(self):
+        chunks = iter(self.chunks)
+        try:
+            while True:
+                started = time.perf_counter()
+                chunk = next(chunks, END)
+                self.stats['read_seconds'] += time.perf_counter() - started
+                if chunk is END:
+                    break
+                self.stats['read'] += len(chunk)
+                if not put(self.raw_chunks, chunk, self.stop):
+                    return
+                self.stats['max_raw_queue'] = max(self.stats['max_raw_queue'], self.raw_chunks.qsize())
+        except Exception as e:
+            put(self.raw_chunks, StageError('reader', e), self.stop)
+        put(self.raw_chunks, END, self.stop)
+
+    def convert_stage(self):
+        try:
+            if self.convert_processes:
+                self._convert_in_processes()
+            else:
+                for chunk in iter_queue(self.raw_chunks, self.stop):
+                    if not self._emit(timed_convert_chunk(chunk)):
+                        return
+        except Exception as e:
+            put(self.converted, StageError('convert', e), self.stop)
+        put(self.converted, END, self.stop)
+
+    def _convert_in_processes(self):
+        """Convert chunks in a process pool, keeping chunk order and a bounded backlog"""
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        pending = deque()
+        # spawn: forking a process that is running reader/upload threads is unsafe
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.convert_processes, mp_context=context) as executor:
+            try:
+                for chunk in iter_queue(self.raw_chunks, self.stop):
+                    while len(pending) >= self.convert_processes + self.queue_size:
+                        if not self._emit(pending.popleft().result()):
+                            return
+                    pending.append(executor.submit(timed_convert_chunk, chunk))
+                while pending and not self.stop.is_set():
+                    if not self._emit(pending.popleft().result()):
+                        return
+            finally:
+                # Don't convert chunks nobody will upload
+                for future in pending:
+                    future.cancel()
+
+    def _emit(self, result) -> bool:
+        db_table, seconds = result
+        self.stats['convert_seconds'] += seconds
+        self.stats['converted'] += db_table.num_rows
+        queued = put(self.converted, db_table, self.stop)
+        self.stats['max_converted_queue'] = max(self.stats['max_converted_queue'],
+                                                self.converted.qsize())
+        return queued
+
+    def converted_tables(self):
+        """Start the reader and convert stages and yield converted Arrow tables in order"""
+        threads = [threading.Thread(target=self.read_stage, name='reader', daemon=True),
+                   threading.Thread(target=self.convert_stage, name='convert', daemon=True)]
+        for thread in threads:
+            thread.start()
+        try:
+            yield from iter_queue(self.converted, self.stop)
+        finally:
+            # Unblock the stages if the upload side stopped early
+            self.stop.set()
+            for thread in threads:
+                thread.join(timeout=5)
+
+
+def rest_upload_stage(pipeline: Pipeline, merge_policy: str = 'skip', workers: int = 4,
+                      max_in_flight: int = None, batch_size: int = None,
+                      max_batch_bytes: int = None, target_latency: float = None,
+                      stats_path: str = None, delete: list = None) -> dict:
+    """Upload converted tables through upsert_h1b_applications as they arrive
+
+    Case numbers in `delete` are deleted once every batch has been committed.
+    """
+    from adaptive_batcher import DEFAULT_MAX_BYTES, DEFAULT_TARGET_LATENCY, AdaptiveBatcher
+    from statistics_rollups import refresh_statistics
+    from upload_engine import upload_batches
+    from upload_to_supabase import delete_cases, get_supabase_client, upsert_batch
+    from upload_verification import rest_rpc
+
+    supabase = get_supabase_client()
+    print("✅ Connected to Supabase")
+
+    batcher = AdaptiveBatcher(max_bytes=max_batch_bytes or DEFAULT_MAX_BYTES,
+                              target_latency=target_latency or DEFAULT_TARGET_LATENCY,
+                              fixed_rows=batch_size)
+    timed_upsert = batcher.timed(lambda records: upsert_batch(supabase, records, merge_policy))
+    totals = dict.fromkeys(UPSERT_COUNTS + ('errors',), 0)
+
+    def batches():
+        for db_table in pipeline.converted_tables():
+            for start, end, nbytes in batcher.iter_ranges(db_table):
+                yield db_table.slice(start, end - start).to_pylist(), nbytes
+
+    outcomes = upload_batches(lambda item: timed_upsert(*item), batches(),
+                              workers=workers, max_in_flight=max_in_flight)
+    uploaded = 0
+    for batch_num, (batch, nbytes), counts, error, attempts in outcomes:
+        uploaded += len(batch)
+        if error is not None:
+            print(f"❌ Error uploading batch {batch_num} ({len(batch)} rows): {str(error)}")
+            totals['errors'] += len(batch)
+            continue
+        for key in UPSERT_COUNTS:
+            totals[key] += counts.get(key, 0)
+        print(f"✅ Batch {batch_num} ({uploaded}/{pipeline.stats['read']} read, {len(batch)} rows, "
+              f"{nbytes // 1024} KB): {counts.get('inserted', 0)} inserted, "
+              f"{counts.get('updated', 0)} updated")
+
+    if stats_path:
+        batcher.write_stats(stats_path)
+        print(f"Batch stats saved to {stats_path}")
+    if delete and totals['errors']:
+        print(f"⚠️  Not deleting {len(delete)} missing cases: {totals['errors']} rows failed to upload")
+    elif delete:
+        totals['deleted'] = delete_cases(supabase, delete, batch_size or 100)
+    refresh_statistics(rest_rpc(supabase))
+    return totals
+
+
+def copy_upload_stage(pipeline: Pipeline, dsn: str = None, merge_policy: str = 'skip',
+                      delete: list = None) -> dict:
+    """COPY each converted table into h1b_applications as it arrives, one transaction per chunk
+
+    Case numbers in `delete` are deleted in a last transaction after every chunk.
+    """
+    from copy_loader import copy_h1b_data, delete_case_numbers, get_db_connection
+    from statistics_rollups import refresh_statistics
+    from upload_verification import sql_rpc
+
+    print("🔌 Connecting to Postgres...")
+    conn = get_db_connection(dsn)
+    totals = dict.fromkeys(UPSERT_COUNTS + ('errors',), 0)
+    try:
+        for chunk_num, db_table in enumerate(pipeline.converted_tables(), start=1):
+            counts = copy_h1b_data(conn, db_table, merge_policy)
+            for key in UPSERT_COUNTS:
+                totals[key] += counts[key]
+            print(f"✅ Chunk {chunk_num} ({db_table.num_rows} rows): {counts['inserted']} inserted, "
+                  f"{counts['updated']} updated")
+        if delete:
+            with conn.cursor() as cursor:
+                totals['deleted'] = delete_case_numbers(cursor, delete)
+            conn.commit()
+        refresh_statistics(sql_rpc(conn))
+    finally:
+        conn.close()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse, convert and upload H1B data in one pipeline.")
+    parser.add_argument("filename", nargs="?", default=DEFAULT_FILENAME,
+                        help="Workbook name in data/raw/ without the .xlsx extension")
+    parser.add_argument("--file", help="Read an already parsed .parquet or .ndjson file instead")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Rows per reader chunk (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f"Chunks buffered between stages (default: {DEFAULT_QUEUE_SIZE})")
+    parser.add_argument("--convert-processes", type=int, default=0,
+                        help="Convert chunks in a pool of N processes (default: in a thread)")
+    parser.add_argument("--method", choices=["rest", "copy"], default="rest",
+                        help="rest: upsert RPC batches (default); copy: COPY each chunk over Postgres")
+    parser.add_argument("--dsn", help="Postgres connection string for --method copy "
+                                      "(default: POSTGRES_URL_NON_POOLING)")
+    parser.add_argument("--merge-policy", choices=MERGE_POLICIES,
+                        help="What to do with case numbers already in the table "
+                             "(default: overwrite for a parser.py --delta --file, otherwise skip)")
+    parser.add_argument("--delete-missing", action="store_true",
+                        help="Delete the case numbers the previous release listed but this one "
+                             "doesn't (off by default: a release needn't repeat earlier cases)")
+    parser.add_argument("--missing", help="JSON array of case numbers for --delete-missing "
+                                          "(default: the *.missing.json next to a delta --file)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Concurrent upload threads for --method rest (default: 4)")
+    parser.add_argument("--max-in-flight", type=int,
+                        help="Maximum batches sent but not yet confirmed (default: 2 x workers)")
+    parser.add_argument("--batch-size", type=int,
+                        help="Fixed records per request (default: adaptive)")
+    parser.add_argument("--max-batch-bytes", type=int,
+                        help="Upper bound on an adaptive batch's JSON size (default: 2 MiB)")
+    parser.add_argument("--target-latency", type=float,
+                        help="Request latency adaptive batches aim for, in seconds (default: 2)")
+    parser.add_argument("--batch-stats", help="Write per-batch size/latency stats to this JSON file")
+    args = parser.parse_args()
+
+    print("🚀 H1B Parse → Convert → Upload Pipeline")
+    print("=" * 40)
+
+    if args.file:
+        print(f"📁 Reading parsed file: {args.file}")
+        chunks = iter_parsed_file_chunks(args.file, args.chunk_size)
+    else:
+        excel_file_path = f'data/raw/{args.filename}.xlsx'
+        print(f"📁 Reading workbook: {excel_file_path}")
+        chunks = apply_company_mapping(iter_workbook_chunks(excel_file_path, args.chunk_size),
+                                       load_company_mapping())
+
+    # Delta files only hold new and changed cases, so changed rows must be rewritten
+    delta = bool(args.file) and is_delta_file(args.file)
+    merge_policy = args.merge_policy or ('overwrite' if delta else 'skip')
+    print(f"Merge policy: {merge_policy}")
+    missing_path = args.missing or (missing_file_for(args.file) if args.file else None)
+    delete = None
+    if args.delete_missing:
+        if not missing_path:
+            print("❌ --delete-missing needs a delta --file with its *.missing.json, or --missing PATH")
+            sys.exit(1)
+        delete = load_case_numbers(missing_path)
+        print(f"📁 Deleting missing cases: {missing_path} ({len(delete)} cases)")
+    elif missing_path:
+        print(f"ℹ️  {len(load_case_numbers(missing_path))} cases in {missing_path} are kept "
+              f"(pass --delete-missing to delete them)")
+
+    pipeline = Pipeline(chunks, convert_processes=args.convert_processes, queue_size=args.queue_size)
+    started = time.perf_counter()
+    try:
+        if args.method == "copy":
+            totals = copy_upload_stage(pipeline, args.dsn, merge_policy, delete)
+        else:
+            totals = rest_upload_stage(pipeline, merge_policy, args.workers, args.max_in_flight,
+                                       args.batch_size, args.max_batch_bytes, args.target_latency,
+                                       args.batch_stats, delete)
+    except Exception as e:
+        print(f"❌ Pipeline failed: {str(e)}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+
+    stats = pipeline.stats
+    print(f"\n📊 Pipeline Summary ({elapsed:.1f}s, {stats['read'] / elapsed:,.0f} rows/sec):")
+    print(f"Read: {stats['read']} rows (reader busy {stats['read_seconds']:.1f}s)")
+    print(f"Converted: {stats['converted']} rows (convert busy {stats['convert_seconds']:.1f}s "
+          f"across {max(args.convert_processes, 1)} worker(s))")
+    print_upsert_counts(totals)
+    if delete is not None:
+        print(f"Deleted (missing): {totals.get('deleted', 0)}")
+    print(f"Errors: {totals['errors']}")
+    print(f"Peak queue depth: {stats['max_raw_queue']} raw, {stats['max_converted_queue']} converted "
+          f"(limit {args.queue_size})")
+
+
+if __name__ == "__main__":
+    main()
@@ -40,6 +40,8 @@ def check_env_file():
 def check_data_files():
     """Check if data files exist"""
     data_files = [
+        'data/output/LCA_Disclosure_Data_FY2025_Q3.parquet',
+        'data/output/LCA_Disclosure_Data_FY2025_Q3.ndjson',
         'data/output/LCA_Disclosure_Data_FY2025_Q3.json',
         'data/output/sample.json'
     ]
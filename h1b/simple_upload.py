@@ -3,11 +3,18 @@ Simple H1B data upload script for Supabase.
 This script assumes the table already exists and focuses on data upload.
 """
 import os
-import json
 import sys
+import pyarrow.compute as pc
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
+# Reuse the record loaders and converters from the main uploader in supabase/scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'supabase', 'scripts'))
+from upload_to_supabase import load_table, convert_table_for_db
+from adaptive_batcher import AdaptiveBatcher
+from statistics_rollups import refresh_statistics
+from upload_verification import rest_rpc
+
 # Load environment variables
 load_dotenv()
 
@@ -53,6 +60,10 @@ CREATE TABLE IF NOT EXISTS h1b_applications (
     wage_rate_of_pay_to NUMERIC,
     wage_unit_of_pay TEXT,
     prevailing_wage NUMERIC,
+    pw_unit_of_pay TEXT,
+    annual_wage_from NUMERIC,
+    annual_wage_to NUMERIC,
+    annual_prevailing_wage NUMERIC,
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
@@ -63,6 +74,15 @@ CREATE INDEX IF NOT EXISTS idx_h1b_case_status ON h1b_applications(case_status);
 CREATE INDEX IF NOT EXISTS idx_h1b_job_title ON h1b_applications(job_title);
 CREATE INDEX IF NOT EXISTS idx_h1b_decision_date ON h1b_applications(decision_date);
 CREATE INDEX IF NOT EXISTS idx_h1b_wage_rate ON h1b_applications(wage_rate_of_pay_from);
+CREATE INDEX IF NOT EXISTS idx_h1b_applications_annual_salary_id ON h1b_applications
+    ((COALESCE(annual_wage_from, annual_wage_to, 0)), id);
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_h1b_applications_employer_name_trgm ON h1b_applications
+    USING GIN (employer_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_h1b_applications_job_title_trgm ON h1b_applications
+    USING GIN (job_title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_h1b_applications_case_number_trgm ON h1b_applications
+    USING GIN (case_number gin_trgm_ops);
 
 -- Enable Row Level Security (RLS)
 ALTER TABLE h1b_applications ENABLE ROW LEVEL SECURITY;
@@ -72,33 +92,6 @@ CREATE POLICY IF NOT EXISTS "Allow public read access" ON h1b_applications
     FOR SELECT USING (true);
 """
 
-def convert_record(record):
-    """Convert JSON record to database format"""
-    return {
-        'case_number': record.get('CASE_NUMBER'),
-        'case_status': record.get('CASE_STATUS'),
-        'received_date': record.get('RECEIVED_DATE'),
-        'decision_date': record.get('DECISION_DATE'),
-        'visa_class': record.get('VISA_CLASS'),
-        'job_title': record.get('JOB_TITLE'),
-        'soc_code': record.get('SOC_CODE'),
-        'soc_title': record.get('SOC_TITLE'),
-        'full_time_position': record.get('FULL_TIME_POSITION'),
-        'begin_date': record.get('BEGIN_DATE'),
-        'end_date': record.get('END_DATE'),
-        'employer_name': record.get('EMPLOYER_NAME'),
-        'employer_city': record.get('EMPLOYER_CITY'),
-        'employer_state': record.get('EMPLOYER_STATE'),
-        'employer_postal_code': str(record.get('EMPLOYER_POSTAL_CODE')) if record.get('EMPLOYER_POSTAL_CODE') else None,
-        'worksite_city': record.get('WORKSITE_CITY'),
-        'worksite_state': record.get('WORKSITE_STATE'),
-        'worksite_postal_code': str(record.get('WORKSITE_POSTAL_CODE')) if record.get('WORKSITE_POSTAL_CODE') else None,
-        'wage_rate_of_pay_from': float(record.get('WAGE_RATE_OF_PAY_FROM')) if record.get('WAGE_RATE_OF_PAY_FROM') else None,
-        'wage_rate_of_pay_to': float(record.get('WAGE_RATE_OF_PAY_TO')) if record.get('WAGE_RATE_OF_PAY_TO') else None,
-        'wage_unit_of_pay': record.get('WAGE_UNIT_OF_PAY'),
-        'prevailing_wage': float(record.get('PREVAILING_WAGE')) if record.get('PREVAILING_WAGE') else None
-    }
-
 def main():
     """Main upload function"""
     print("🚀 Simple H1B Data Upload to Supabase")
@@ -132,6 +125,8 @@ def main():
     
     # Step 4: Load and upload data
     json_files = [
+        'data/output/LCA_Disclosure_Data_FY2025_Q3.parquet',
+        'data/output/LCA_Disclosure_Data_FY2025_Q3.ndjson',
         'data/output/LCA_Disclosure_Data_FY2025_Q3.json',
         'data/output/sample.json'
     ]
@@ -143,79 +138,75 @@ def main():
             break
     
     if not json_file:
-        print("❌ No JSON data file found. Please run parser.py first.")
+        print("❌ No data file found. Please run parser.py first.")
         return
     
     print(f"📁 Loading data from: {json_file}")
     
     try:
-        with open(json_file, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        print(f"✅ Loaded {len(data)} records")
+        table = load_table(json_file)
+        print(f"✅ Loaded {table.num_rows} records")
     except Exception as e:
         print(f"❌ Error loading JSON file: {e}")
         return
     
-    # Step 5: Upload data in batches
-    batch_size = 50  # Smaller batches for reliability
+    # Step 5: Convert everything in one vectorized pass, then upload in batches
+    # sized by payload bytes and tuned from request latency (see adaptive_batcher.py)
+    batcher = AdaptiveBatcher()
     total_uploaded = 0
+    total_skipped = 0
     total_errors = 0
-    
-    for i in range(0, len(data), batch_size):
-        batch = data[i:i + batch_size]
-        batch_num = (i // batch_size) + 1
-        total_batches = (len(data) + batch_size - 1) // batch_size
-        
-        print(f"Uploading batch {batch_num}/{total_batches} ({len(batch)} records)...")
-        
-        # Convert batch
-        converted_batch = []
-        for record in batch:
-            try:
-                converted_record = convert_record(record)
-                converted_batch.append(converted_record)
-            except Exception as e:
-                print(f"Warning: Error converting record: {e}")
-                total_errors += 1
-        
-        # Upload batch
-        if converted_batch:
-            try:
-                result = supabase.table('h1b_applications').insert(converted_batch).execute()
-                
-                if result.data:
-                    uploaded_count = len(result.data)
-                    total_uploaded += uploaded_count
-                    print(f"✅ Successfully uploaded {uploaded_count} records")
-                else:
-                    print(f"⚠️ No data returned for batch {batch_num}")
-                    
-            except Exception as e:
-                error_msg = str(e)
-                print(f"❌ Error uploading batch {batch_num}: {error_msg}")
-                
-                # Try individual inserts for duplicates
-                if 'duplicate key' in error_msg.lower() or 'unique constraint' in error_msg.lower():
-                    print("Attempting individual inserts due to duplicates...")
-                    for record in converted_batch:
-                        try:
-                            result = supabase.table('h1b_applications').insert(record).execute()
-                            if result.data:
-                                total_uploaded += 1
-                        except Exception:
-                            total_errors += 1
-                            pass  # Skip duplicates silently
-                else:
-                    total_errors += len(converted_batch)
-    
+
+    db_table = convert_table_for_db(table)
+    # Rows without a case number can't be keyed for the upsert, so they are never sent
+    has_case_number = pc.is_valid(db_table.column('case_number'))
+    db_table = db_table.filter(has_case_number)
+    total_invalid = table.num_rows - db_table.num_rows
+    if total_invalid:
+        print(f"⚠️  Skipping {total_invalid} records without a case number")
+
+    def upsert(converted_batch):
+        # Upsert batch: existing case numbers are skipped server-side
+        return supabase.table('h1b_applications').upsert(
+            converted_batch, on_conflict='case_number', ignore_duplicates=True
+        ).execute()
+
+    send = batcher.timed(upsert)
+
+    for batch_num, (start, end, nbytes) in enumerate(batcher.iter_ranges(db_table), start=1):
+        converted_batch = db_table.slice(start, end - start).to_pylist()
+        print(f"Uploading batch {batch_num} (rows {start + 1}-{end} of {db_table.num_rows}, "
+              f"{nbytes // 1024} KB)...")
+
+        try:
+            result = send(converted_batch, nbytes)
+
+            uploaded_count = len(result.data) if result.data else 0
+            total_uploaded += uploaded_count
+            total_skipped += len(converted_batch) - uploaded_count
+            print(f"✅ Uploaded {uploaded_count} new records, "
+                  f"skipped {len(converted_batch) - uploaded_count} existing")
+
+        except Exception as e:
+            print(f"❌ Error uploading batch {batch_num}: {str(e)}")
+            total_errors += len(converted_batch)
+
     # Step 6: Summary
     print(f"\n📊 Upload Summary:")
-    print(f"Total records processed: {len(data)}")
+    print(f"Total records processed: {table.num_rows}")
     print(f"Successfully uploaded: {total_uploaded}")
-    print(f"Errors/Duplicates: {total_errors}")
-    print(f"Success rate: {(total_uploaded / len(data) * 100):.1f}%")
+    print(f"Already present: {total_skipped}")
+    print(f"Skipped (no case number): {total_invalid}")
+    print(f"Errors: {total_errors}")
+    summary = batcher.summary()
+    if 'mean_rows' in summary:
+        print(f"Average batch: {summary['mean_rows']:.0f} rows / {summary['mean_bytes'] // 1024} KB "
+              f"in {summary['mean_latency']:.2f}s")
     
     if total_uploaded > 0:
+        refresh_statistics(rest_rpc(supabase))
+
+    if total_uploaded + total_skipped > 0:
         print("\n🎉 Upload completed successfully!")
         print("You can now use the H1B Data Viewer with your Supabase data.")
     else:
@@ -1,8 +1,36 @@
 
 
 #!/usr/bin/env python3
-import psycopg2
+"""
+Restore a plain pg_dump / pg_dumpall SQL file into the Supabase database.
+
+    python import_db.py [SQL_FILE] [--batch-size N] [--jobs N]
+    python import_db.py [SQL_FILE] --exclude-legacy --exclude-platform-data --exclude-type role \
+        [--output FILTERED.sql]
+
+Include/exclude rules (--include-schema, --exclude-table 'public.django_*',
+--exclude-table-data 'auth.*', --exclude-type acl, ... see sql_dump.DumpFilter)
+are applied while the dump is streamed, so filtered statements are never
+sent. With --output the filtered dump is written instead of imported, e.g. to
+regenerate db_backup_filtered.sql, which is committed and so must never carry
+Supabase's user accounts, sessions, tokens, storage objects or secrets:
+
+    python import_db.py db_backup.sql --exclude-legacy --exclude-platform-data --exclude-type role \
+        --output db_backup_filtered.sql
+"""
+import argparse
+import os
+import re
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+import psycopg2.errors
+
+from sql_dump import (COPY, META, OBJECT_TYPES, CopyDataStream, DumpFilter, iter_range_statements,
+                      iter_statements, plan_restore, write_statement)
 
 # Supabase credentials (using Session pooler)
 DB_CONFIG = {
@@ -13,88 +41,424 @@ DB_CONFIG = {
     'database': 'postgres',
 }
 
-def import_sql_dump(sql_file):
-    """Import SQL dump to Supabase database"""
+# Statements Postgres refuses to run inside a transaction block
+NO_TRANSACTION = re.compile(
+    r"^\s*(?:CREATE\s+DATABASE|DROP\s+DATABASE|ALTER\s+SYSTEM|CREATE\s+TABLESPACE|"
+    r"DROP\s+TABLESPACE|VACUUM|CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY|"
+    r"DROP\s+INDEX\s+CONCURRENTLY|REINDEX\b.*\bCONCURRENTLY)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# Errors that are expected when restoring over an existing database
+EXPECTED_ERRORS = ['already exists', 'duplicate', 'constraint']
+
+DEFAULT_BATCH_SIZE = 500
+DEADLOCK_RETRIES = 3
+
+# Legacy Django tables dropped by the cleanup migrations
+# (20240622_remove_django_auth.sql, 20250509_cleanup_legacy_tables.sql)
+LEGACY_TABLES = [
+    'public.auth_*', 'public.django_*', 'public.social_auth_*',
+    'public.accounts_userprofile', 'public.tracks_*',
+]
+
+# Schemas Supabase manages itself; their rows are users, sessions, refresh
+# tokens, audit logs, storage objects, keys and secrets
+PLATFORM_SCHEMAS = ['auth', 'storage', 'realtime', 'pgsodium', 'vault']
+
+
+def run_statement(cursor, statement, in_transaction):
+    """Run one SQL or COPY statement, inside a savepoint when batching
+
+    Returns the number of COPY rows loaded (0 for plain SQL). The savepoint
+    is rolled back on error, so one bad statement doesn't abort the batch.
+    Deadlocks (possible when parallel restores add foreign keys) are retried.
+    """
+    if statement.kind == COPY:
+        if in_transaction:
+            cursor.execute("SAVEPOINT import_statement")
+        try:
+            data = CopyDataStream(statement.rows)
+            cursor.copy_expert(statement.sql, data)
+        except psycopg2.Error:
+            if in_transaction:
+                cursor.execute("ROLLBACK TO SAVEPOINT import_statement")
+            raise
+        if in_transaction:
+            cursor.execute("RELEASE SAVEPOINT import_statement")
+        return data.rows_read
+
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            if in_transaction:
+                # One round trip: the savepoint and its release travel with the statement
+                cursor.execute(f"SAVEPOINT import_statement; {statement.sql}; "
+                               "RELEASE SAVEPOINT import_statement")
+            else:
+                cursor.execute(statement.sql)
+            return 0
+        except psycopg2.Error as e:
+            if in_transaction:
+                cursor.execute("ROLLBACK TO SAVEPOINT import_statement")
+            if not isinstance(e, psycopg2.errors.DeadlockDetected) or attempt > DEADLOCK_RETRIES:
+                raise
+
+
+def commit_batch(conn):
+    """Commit the current batch; returns False (after rolling back) if COMMIT fails"""
     try:
-        # Read and clean the SQL file
-        with open(sql_file, 'r') as f:
-            content = f.read()
-
-        # Filter out psql metacommands and comment metadata
-        lines = content.split('\n')
-        cleaned_lines = []
-
-        for line in lines:
-            stripped = line.strip()
-            # Skip psql metacommands and comment metadata
-            if stripped.startswith('\\'):
-                continue
-            if stripped.startswith('--') and any(x in stripped.lower() for x in ['schema:', 'owner:', 'name:', 'definition:']):
-                continue
-            # Keep regular comments and SQL
-            cleaned_lines.append(line)
-
-        sql_content = '\n'.join(cleaned_lines)
+        conn.commit()
+        return True
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"  ⚠️  Batch commit failed, batch rolled back: {e}")
+        return False
+
+
+def new_counts():
+    """Counters reported by execute_statements"""
+    return {'statements': 0, 'success': 0, 'errors': 0, 'meta': 0, 'copy': 0, 'copy_rows': 0,
+            'failed_batches': 0}
+
+
+def merge_counts(total, counts):
+    for key, value in counts.items():
+        total[key] += value
+
+
+def execute_statements(conn, statements, batch_size, counts, progress=False):
+    """Execute dump statements on conn in transactions of batch_size statements
+
+    batch_size <= 0 runs every statement in autocommit mode (one commit per
+    statement). Failures are counted and reported, never raised.
+    """
+    cursor = conn.cursor()
+    conn.autocommit = batch_size <= 0
+    in_batch = 0
+
+    for statement in statements:
+        # psql metacommands (\connect, \restrict, ...) only mean something to psql
+        if statement.kind == META:
+            counts['meta'] += 1
+            continue
+
+        counts['statements'] += 1
+        outside_transaction = not conn.autocommit and NO_TRANSACTION.match(statement.sql)
+        if outside_transaction:
+            if not commit_batch(conn):
+                counts['failed_batches'] += 1
+            in_batch = 0
+            conn.autocommit = True
+        elif not conn.autocommit and in_batch == 0:
+            # Check deferred foreign keys per statement, where the savepoint can catch
+            # them, instead of at COMMIT where they would fail the whole batch
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+        try:
+            rows = run_statement(cursor, statement, not conn.autocommit)
+            counts['success'] += 1
+            if statement.kind == COPY:
+                counts['copy'] += 1
+                counts['copy_rows'] += rows
+
+            # Show progress every 100 statements
+            if progress and counts['statements'] % 100 == 0:
+                print(f"  ✓ {counts['statements']} statements processed...")
+
+        except psycopg2.Error as e:
+            counts['errors'] += 1
+            # Skip expected errors (role/schema already exists, etc.)
+            error_msg = str(e).lower()
+            if not any(x in error_msg for x in EXPECTED_ERRORS):
+                print(f"  ⚠️  Error at line {statement.line}: {e}")
+        finally:
+            if outside_transaction:
+                conn.autocommit = False
+
+        if not conn.autocommit and not outside_transaction:
+            in_batch += 1
+            if in_batch >= batch_size:
+                if not commit_batch(conn):
+                    counts['failed_batches'] += 1
+                in_batch = 0
+
+    if not conn.autocommit and not commit_batch(conn):
+        counts['failed_batches'] += 1
+    conn.autocommit = True
+    cursor.close()
+    return counts
+
+
+def print_summary(counts, started):
+    print(f"\n✅ Import completed in {time.perf_counter() - started:.1f}s!")
+    print(f"   ✓ Successful: {counts['success']}")
+    print(f"   ⚠️  Skipped/Failed: {counts['errors']}")
+    print(f"   📥 COPY sections loaded: {counts['copy']} ({counts['copy_rows']} rows)")
+    print(f"   ⏭️  psql metacommands skipped: {counts['meta']}")
+    if counts['failed_batches']:
+        print(f"   ❌ Batches rolled back at commit: {counts['failed_batches']}")
+
+
+def print_table_count(conn):
+    # Verify - count tables
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_schema = 'public'
+    """)
+    table_count = cursor.fetchone()[0]
+    print(f"📋 Tables imported: {table_count}")
+    cursor.close()
+
+
+def export_filtered_dump(sql_file, output_file, dump_filter):
+    """Write the statements dump_filter keeps to a new dump file, in one streaming pass"""
+    started = time.perf_counter()
+    print(f"📂 Filtering SQL dump: {sql_file}")
+    with open(sql_file, 'r', encoding='utf-8') as f, open(output_file, 'w', encoding='utf-8') as out:
+        for statement in dump_filter.filter(iter_statements(f)):
+            write_statement(out, statement)
+    print(f"✅ Filtered dump saved to {output_file} in {time.perf_counter() - started:.1f}s "
+          f"({os.path.getsize(output_file) / 1024 / 1024:.2f} MB)")
+    print(f"   🧹 {dump_filter.summary()}")
+
 
+def import_sql_dump(sql_file, batch_size=DEFAULT_BATCH_SIZE, dump_filter=None):
+    """Import SQL dump to Supabase database
+
+    Statements are committed in transactions of batch_size statements, each
+    behind a savepoint; batch_size=0 runs every statement in autocommit mode
+    (one commit per statement). COPY sections are streamed with copy_expert.
+    Statements dump_filter drops are skipped as they are read.
+    """
+    started = time.perf_counter()
+    try:
         print(f"📂 Reading SQL dump: {sql_file}")
-        print(f"📊 Original size: {sum(len(line) for line in lines) / 1024 / 1024:.2f} MB")
-        print(f"📊 Cleaned size: {len(sql_content) / 1024 / 1024:.2f} MB")
+        print(f"📊 Dump size: {os.path.getsize(sql_file) / 1024 / 1024:.2f} MB")
 
         # Connect to database
         print(f"🔌 Connecting to Supabase...")
         conn = psycopg2.connect(**DB_CONFIG)
-        conn.autocommit = True
-        cursor = conn.cursor()
 
         print("✅ Connected!")
 
-        # Execute SQL dump statement by statement
-        print("⏳ Importing database dump...")
-        statements = sql_content.split(';')
-
-        success_count = 0
-        error_count = 0
-
-        for i, statement in enumerate(statements):
-            statement = statement.strip()
-            if not statement:
-                continue
-
-            try:
-                cursor.execute(statement)
-                success_count += 1
-
-                # Show progress every 100 statements
-                if (i + 1) % 100 == 0:
-                    print(f"  ✓ {i + 1} statements processed...")
-
-            except psycopg2.Error as e:
-                error_count += 1
-                # Skip expected errors (role/schema already exists, etc.)
-                error_msg = str(e).lower()
-                if any(x in error_msg for x in ['already exists', 'duplicate', 'constraint']):
-                    continue
-                else:
-                    print(f"  ⚠️  Error at statement {i + 1}: {e}")
-
-        print(f"\n✅ Import completed!")
-        print(f"   ✓ Successful: {success_count}")
-        print(f"   ⚠️  Skipped/Failed: {error_count}")
-
-        # Verify - count tables
-        cursor.execute("""
-            SELECT COUNT(*) FROM information_schema.tables
-            WHERE table_schema = 'public'
-        """)
-        table_count = cursor.fetchone()[0]
-        print(f"📋 Tables imported: {table_count}")
-
-        cursor.close()
+        # Statements are tokenized and executed as the dump is read (see sql_dump.py),
+        # so semicolons in strings, function bodies and COPY data don't split them
+        mode = f"batches of {batch_size} statements" if batch_size > 0 else "autocommit"
+        print(f"⏳ Importing database dump ({mode})...")
+
+        with open(sql_file, 'r', encoding='utf-8') as f:
+            statements = iter_statements(f)
+            if dump_filter:
+                statements = dump_filter.filter(statements)
+            counts = execute_statements(conn, statements, batch_size, new_counts(), progress=True)
+
+        print_summary(counts, started)
+        if dump_filter:
+            print(f"   🧹 Filter: {dump_filter.summary()}")
+        print_table_count(conn)
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+def connect(database=None):
+    """Open a connection to database on the DB_CONFIG server (its default database if None)"""
+    return psycopg2.connect(**{**DB_CONFIG, 'database': database or DB_CONFIG['database']})
+
+
+def segment_database(segment):
+    """The database a segment restores into: its \\connect target if the server has one, else None
+
+    None means DB_CONFIG's database, where the sequential import puts everything.
+    """
+    if segment.database in (None, DB_CONFIG['database']):
+        return None
+    try:
+        connect(segment.database).close()
+        return segment.database
+    except psycopg2.OperationalError:
+        print(f"⚠️  [{segment.database}] database not reachable, restoring into "
+              f"{DB_CONFIG['database']} instead")
+        return None
+
+
+class ConnectionPool:
+    """One lazily opened connection per worker thread, all to one database
+
+    Connections are primed with the segment's session settings and reused by
+    every phase of the segment; close() ends them when the segment is done.
+    """
+
+    def __init__(self, database=None):
+        self.database = database
+        self.connections = {}          # worker thread id -> [conn, session it was primed with]
+        self.lock = threading.Lock()
+
+    def get(self, session):
+        worker = threading.get_ident()
+        with self.lock:
+            entry = self.connections.get(worker)
+        if entry is None:
+            conn = connect(self.database)
+            conn.autocommit = True
+            entry = [conn, None]
+            with self.lock:
+                self.connections[worker] = entry
+        conn = entry[0]
+        if entry[1] is not session:
+            cursor = conn.cursor()
+            for statement in session:
+                try:
+                    cursor.execute(statement.sql)
+                except psycopg2.Error:
+                    pass
+            cursor.close()
+            entry[1] = session
+        return conn
+
+    def close(self):
+        with self.lock:
+            for conn, _ in self.connections.values():
+                conn.close()
+            self.connections.clear()
+
+
+def run_parallel(executor, jobs, pool, segment, batch_size):
+    """Run (label, statements-factory) jobs on the executor's workers; returns merged counts"""
+    total = new_counts()
+
+    def run(job):
+        _, make_statements = job
+        conn = pool.get(segment.session)
+        return execute_statements(conn, make_statements(), batch_size, new_counts())
+
+    for counts in executor.map(run, jobs):
+        merge_counts(total, counts)
+    return total
+
+
+def restore_parallel(sql_file, jobs, batch_size=DEFAULT_BATCH_SIZE, dump_filter=None):
+    """Restore a dump in pg_restore -j style phases, database segment by segment
+
+    pre-data (schema) runs in dump order on one connection; table data loads
+    concurrently, one table per job; post-data runs in two concurrent waves
+    (indexes and primary/unique keys, then foreign keys, triggers, policies and
+    the rest), grouped by table so jobs don't queue on each other's locks.
+    Each segment goes to its \\connect database when the server has it.
+    """
+    started = time.perf_counter()
+    try:
+        print(f"📂 Planning parallel restore of: {sql_file}")
+        print(f"📊 Dump size: {os.path.getsize(sql_file) / 1024 / 1024:.2f} MB")
+        segments = plan_restore(sql_file, dump_filter or None)
+        print(f"📋 {len(segments)} database sections, "
+              f"{sum(len(s.data) for s in segments)} tables with data")
+
+        print(f"🔌 Connecting to Supabase...")
+        conn = connect()
+        print("✅ Connected!")
+
+        # One set of worker threads for the whole restore; each segment's connections
+        # are reused by all of its phases and closed before the next segment
+        total = new_counts()
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for segment in segments:
+                label = segment.database or 'globals'
+                database = segment_database(segment)
+                segment_conn = conn if database is None else connect(database)
+                pool = ConnectionPool(database)
+                try:
+                    print(f"⏳ [{label}] pre-data: {len(segment.pre_data)} statements")
+                    merge_counts(total, execute_statements(segment_conn, segment.pre_data, batch_size,
+                                                           new_counts()))
+
+                    data_jobs = [
+                        (table, lambda ranges=ranges: (statement for start, end in ranges
+                                                       for statement in iter_range_statements(sql_file, start, end)))
+                        for table, ranges in segment.data.items()
+                    ]
+                    if segment.sequences:
+                        data_jobs.append(('sequences', lambda: segment.sequences))
+                    if data_jobs:
+                        print(f"⏳ [{label}] data: {len(segment.data)} tables on {jobs} connections")
+                        merge_counts(total, run_parallel(executor, data_jobs, pool, segment, batch_size))
+
+                    for wave_num, wave in enumerate(segment.post_data, start=1):
+                        if not wave:
+                            continue
+                        print(f"⏳ [{label}] post-data wave {wave_num}: "
+                              f"{sum(len(statements) for statements in wave.values())} statements")
+                        wave_jobs = [(table, lambda statements=statements: statements)
+                                     for table, statements in wave.items()]
+                        merge_counts(total, run_parallel(executor, wave_jobs, pool, segment, batch_size))
+                finally:
+                    pool.close()
+                    if segment_conn is not conn:
+                        segment_conn.close()
+
+        print_summary(total, started)
+        if dump_filter:
+            print(f"   🧹 Filter: {dump_filter.summary()}")
+        print_table_count(conn)
         conn.close()
 
     except Exception as e:
         print(f"❌ Error: {e}")
         sys.exit(1)
 
+
 if __name__ == '__main__':
-    import_sql_dump('db_backup.sql')
+    parser = argparse.ArgumentParser(description="Import a plain SQL dump into Supabase.")
+    parser.add_argument("sql_file", nargs="?", default="db_backup.sql",
+                        help="Dump to import (default: db_backup.sql)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Statements per transaction (default: {DEFAULT_BATCH_SIZE}; "
+                             "0 = autocommit every statement)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Restore schema, per-table data and indexes/constraints in phases "
+                             "with N concurrent connections (default: 1, in dump order)")
+    parser.add_argument("--include-schema", action="append", default=[], metavar="PATTERN",
+                        help="Only restore objects in matching schemas (repeatable)")
+    parser.add_argument("--exclude-schema", action="append", default=[], metavar="PATTERN",
+                        help="Skip objects in matching schemas (repeatable)")
+    parser.add_argument("--include-table", action="append", default=[], metavar="PATTERN",
+                        help="Only restore matching tables, as schema.table or table (repeatable)")
+    parser.add_argument("--exclude-table", action="append", default=[], metavar="PATTERN",
+                        help="Skip matching tables with their data, indexes, constraints and grants "
+                             "(repeatable)")
+    parser.add_argument("--include-type", action="append", default=[], choices=OBJECT_TYPES,
+                        help="Only restore statements of these object types (repeatable)")
+    parser.add_argument("--exclude-type", action="append", default=[], choices=OBJECT_TYPES,
+                        help="Skip statements of these object types (repeatable)")
+    parser.add_argument("--exclude-legacy", action="store_true",
+                        help="Skip the legacy Django tables removed by the cleanup migrations: "
+                             + ", ".join(LEGACY_TABLES))
+    parser.add_argument("--exclude-table-data", action="append", default=[], metavar="PATTERN",
+                        help="Skip the rows of matching tables but keep their definitions "
+                             "(repeatable)")
+    parser.add_argument("--exclude-platform-data", action="store_true",
+                        help="Skip all rows of the Supabase-managed schemas: "
+                             + ", ".join(PLATFORM_SCHEMAS))
+    parser.add_argument("-o", "--output", metavar="FILTERED_SQL",
+                        help="Write the filtered dump to this file instead of importing it")
+    args = parser.parse_args()
+
+    dump_filter = DumpFilter(
+        include_schemas=args.include_schema, exclude_schemas=args.exclude_schema,
+        include_tables=args.include_table,
+        exclude_tables=args.exclude_table + (LEGACY_TABLES if args.exclude_legacy else []),
+        include_types=args.include_type, exclude_types=args.exclude_type,
+        exclude_table_data=args.exclude_table_data
+        + ([f'{schema}.*' for schema in PLATFORM_SCHEMAS] if args.exclude_platform_data else []),
+    )
+    if args.output:
+        export_filtered_dump(args.sql_file, args.output, dump_filter)
+    elif args.jobs > 1:
+        restore_parallel(args.sql_file, args.jobs, args.batch_size, dump_filter)
+    else:
+        import_sql_dump(args.sql_file, args.batch_size, dump_filter)
@@ -0,0 +1,719 @@
+"""
+Streaming reader for plain-text pg_dump / pg_dumpall SQL files.
+
+Statements are tokenized line by line as the file is read, so memory stays at
+one statement (plus one line of COPY data) however large the dump is. The
+tokenizer understands everything that can hide a semicolon in a dump:
+
+    - single-quoted strings ('it''s'), including E'...' backslash escapes
+    - double-quoted identifiers
+    - dollar-quoted bodies ($$ ... $$, $fn$ ... $fn$)
+    - -- line comments and nested /* block comments */
+    - COPY ... FROM stdin data sections, which run until a line with "\\."
+
+Comments outside of quotes are dropped. psql metacommands (\\connect,
+\\restrict, ...) are yielded separately so the caller can decide what to do
+with them.
+"""
+import fnmatch
+import re
+from collections import Counter
+
+SQL = 'sql'
+COPY = 'copy'
+META = 'meta'
+
+# Next character that can change the tokenizer state outside of quotes
+SPECIAL = re.compile(r"[;'\"$]|--|/\*")
+DOLLAR_TAG = re.compile(r"\$(?:[A-Za-z_\u0080-\uffff][\w\u0080-\uffff]*)?\$")
+IDENTIFIER_CHAR = re.compile(r"[\w$\u0080-\uffff]")
+BLOCK_COMMENT = re.compile(r"/\*|\*/")
+COPY_FROM_STDIN = re.compile(r"^\s*COPY\s.*\bFROM\s+stdin\b", re.IGNORECASE | re.DOTALL)
+CONFORMING_STRINGS = re.compile(r"^\s*SET\s+standard_conforming_strings\s*(?:=|TO)\s*'?(on|off)",
+                                re.IGNORECASE)
+END_OF_COPY = '\\.'
+
+
+class Statement:
+    """One statement from a dump
+
+    kind is SQL, COPY or META. For COPY statements, `rows` iterates the raw
+    data lines (newline included) and must be consumed before the next
+    statement is read; anything left over is skipped automatically.
+    """
+
+    def __init__(self, kind: str, sql: str, line: int, rows=None, offset: int = None):
+        self.kind = kind
+        self.sql = sql
+        self.line = line
+        self.rows = rows
+        # Byte offset a reader can seek to and find this statement next (see DumpFile)
+        self.offset = offset
+
+    def __repr__(self):
+        return f"Statement({self.kind!r}, line {self.line}: {self.sql[:60]!r})"
+
+
+def iter_copy_rows(lines, counter: list):
+    """Yield COPY data lines up to the terminating \\. line"""
+    for line in lines:
+        counter[0] += 1
+        if line.rstrip('\r\n') == END_OF_COPY:
+            return
+        yield line
+
+
+class DumpFile:
+    """Iterate a dump's lines while tracking byte offsets, so readers can seek to a statement
+
+    Opened at `offset`, which must be a statement boundary reported by
+    iter_statements (Statement.offset).
+    """
+
+    def __init__(self, path: str, offset: int = 0, encoding: str = 'utf-8'):
+        self.file = open(path, 'rb')
+        self.file.seek(offset)
+        self.encoding = encoding
+        self.next_offset = offset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = self.file.readline()
+        if not line:
+            raise StopIteration
+        self.next_offset += len(line)
+        return line.decode(self.encoding)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CopyDataStream:
+    """File-like view of a COPY statement's rows, for cursor.copy_expert"""
+
+    def __init__(self, rows, encoding: str = 'utf-8'):
+        self.rows = rows
+        self.encoding = encoding
+        self.pending = b''
+        self.rows_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = [self.pending]
+        available = len(self.pending)
+        while size < 0 or available < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            self.rows_read += 1
+            data = row.encode(self.encoding)
+            chunks.append(data)
+            available += len(data)
+
+        data = b''.join(chunks)
+        if size < 0:
+            self.pending = b''
+            return data
+        self.pending = data[size:]
+        return data[:size]
+
+
+def find_string_end(line: str, pos: int, backslash_escapes: bool) -> int:
+    """Index just past the closing quote of a '...' literal, or -1 if it continues"""
+    while True:
+        quote = line.find("'", pos)
+        if quote == -1:
+            return -1
+        if backslash_escapes:
+            # An odd run of backslashes before the quote escapes it
+            backslashes = 0
+            while quote - backslashes - 1 >= pos and line[quote - backslashes - 1] == '\\':
+                backslashes += 1
+            if backslashes % 2:
+                pos = quote + 1
+                continue
+        if quote + 1 < len(line) and line[quote + 1] == "'":
+            pos = quote + 2
+            continue
+        return quote + 1
+
+
+def iter_statements(lines):
+    """Yield Statement objects from an iterable of dump lines, as they complete
+
+    When lines is a DumpFile, statements that start on a fresh line carry the
+    byte offset to seek to for re-reading them.
+    """
+    source = lines
+    lines = iter(lines)
+    resume_offset = getattr(source, 'next_offset', None)
+    counter = [0]              # lines read so far, shared with iter_copy_rows
+    buffer = []                # pieces of the statement being built
+    start_line = None
+    state = None               # None, "'", 'E', '"', '$' or '/*'
+    dollar_tag = None
+    comment_depth = 0
+    conforming_strings = True
+
+    for line in lines:
+        counter[0] += 1
+
+        if state is None and line.lstrip().startswith('\\') \
+                and not any(piece.strip() for piece in buffer):
+            buffer = []
+            yield Statement(META, line.strip(), counter[0], offset=resume_offset)
+            resume_offset = getattr(source, 'next_offset', None)
+            continue
+
+        pos = 0
+        length = len(line)
+        while pos < length:
+            if state is None:
+                match = SPECIAL.search(line, pos)
+                if match is None:
+                    buffer.append(line[pos:])
+                    break
+
+                token = match.group()
+                index = match.start()
+                buffer.append(line[pos:index])
+                pos = match.end()
+
+                if token == ';':
+                    sql = ''.join(buffer).strip()
+                    buffer = []
+                    if not sql:
+                        continue
+
+                    conforming = CONFORMING_STRINGS.match(sql)
+                    if conforming:
+                        conforming_strings = conforming.group(1).lower() == 'on'
+
+                    if COPY_FROM_STDIN.match(sql):
+                        statement = Statement(COPY, sql, start_line or counter[0],
+                                              iter_copy_rows(lines, counter), resume_offset)
+                        yield statement
+                        # Skip whatever COPY data the caller didn't read
+                        for _ in statement.rows:
+                            pass
+                        start_line = None
+                        resume_offset = getattr(source, 'next_offset', None)
+                        break
+                    statement_offset = resume_offset
+                    # The next statement can only be re-read from the next line
+                    # if nothing else follows on this one
+                    resume_offset = getattr(source, 'next_offset', None) \
+                        if not line[pos:].strip() else None
+                    yield Statement(SQL, sql, start_line or counter[0], offset=statement_offset)
+                    start_line = None
+                elif token == '--':
+                    buffer.append('\n')
+                    break
+                elif token == '/*':
+                    state, comment_depth = '/*', 1
+                    buffer.append(' ')
+                else:
+                    if start_line is None:
+                        start_line = counter[0]
+                    if token == "'":
+                        escape = index > 0 and line[index - 1] in 'eE' and (
+                            index == 1 or not IDENTIFIER_CHAR.match(line[index - 2]))
+                        state = 'E' if escape or not conforming_strings else "'"
+                        buffer.append(token)
+                    elif token == '"':
+                        state = '"'
+                        buffer.append(token)
+                    else:  # '$'
+                        tag = DOLLAR_TAG.match(line, index)
+                        if tag and (index == 0 or not IDENTIFIER_CHAR.match(line[index - 1])):
+                            state, dollar_tag = '$', tag.group()
+                            buffer.append(dollar_tag)
+                            pos = tag.end()
+                        else:
+                            buffer.append(token)
+                continue
+
+            if start_line is None and state != '/*':
+                start_line = counter[0]
+
+            if state in ("'", 'E'):
+                end = find_string_end(line, pos, state == 'E')
+            elif state == '"':
+                end = line.find('"', pos)
+                while end != -1 and end + 1 < length and line[end + 1] == '"':
+                    end = line.find('"', end + 2)
+                end = end + 1 if end != -1 else -1
+            elif state == '$':
+                end = line.find(dollar_tag, pos)
+                end = end + len(dollar_tag) if end != -1 else -1
+            else:  # nested block comment
+                for match in BLOCK_COMMENT.finditer(line, pos):
+                    comment_depth += 1 if match.group() == '/*' else -1
+                    if comment_depth == 0:
+                        pos = match.end()
+                        state = None
+                        break
+                else:
+                    pos = length
+                continue
+
+            if end == -1:
+                buffer.append(line[pos:])
+                break
+            buffer.append(line[pos:end])
+            pos = end
+            state = None
+
+        # The statement starts on the first line that contributes non-blank text
+        if start_line is None and state is None and ''.join(buffer).strip():
+            start_line = counter[0]
+
+    sql = ''.join(buffer).strip()
+    if sql:
+        # Unterminated trailing statement (e.g. a dump cut short)
+        yield Statement(SQL, sql, start_line or counter[0])
+
+
+# --- Restore planning -------------------------------------------------------
+
+PRE_DATA = 'pre-data'
+DATA = 'data'
+POST_DATA = 'post-data'
+
+_NAME = r'(?:"(?:[^"]|"")*"|[^\s.("]+)'
+QUALIFIED_NAME = rf'{_NAME}(?:\.{_NAME})?'
+
+DATA_TABLE = re.compile(rf'^\s*(?:COPY|INSERT\s+INTO)\s+({QUALIFIED_NAME})', re.IGNORECASE)
+SEQUENCE_SET = re.compile(r'^\s*SELECT\s+(?:pg_catalog\.)?setval\s*\(', re.IGNORECASE)
+SESSION_SETTING = re.compile(r'^\s*(?:SET\s|SELECT\s+(?:pg_catalog\.)?set_config\s*\()', re.IGNORECASE)
+
+# Post-data statements, in two waves: wave 1 builds indexes and the keys that
+# foreign keys point at, wave 2 adds everything that depends on them
+INDEX = re.compile(rf'^\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s.*?\sON\s+(?:ONLY\s+)?({QUALIFIED_NAME})',
+                   re.IGNORECASE | re.DOTALL)
+ADD_CONSTRAINT = re.compile(rf'^\s*ALTER\s+TABLE\s+(?:ONLY\s+)?({QUALIFIED_NAME})\s+ADD\s+CONSTRAINT\s',
+                            re.IGNORECASE)
+FOREIGN_KEY = re.compile(r'\sFOREIGN\s+KEY\s', re.IGNORECASE)
+TABLE_POST_DATA = re.compile(
+    rf'^\s*(?:CREATE\s+(?:CONSTRAINT\s+)?TRIGGER\s.*?\sON\s+|CREATE\s+POLICY\s.*?\sON\s+|'
+    rf'CREATE\s+(?:OR\s+REPLACE\s+)?RULE\s.*?\sTO\s+|'
+    rf'ALTER\s+TABLE\s+(?:ONLY\s+)?(?=\S+\s+(?:ENABLE\s+ROW\s+LEVEL\s+SECURITY|'
+    rf'FORCE\s+ROW\s+LEVEL\s+SECURITY|CLUSTER\s+ON|REPLICA\s+IDENTITY)))'
+    rf'(?:ONLY\s+)?({QUALIFIED_NAME})',
+    re.IGNORECASE | re.DOTALL)
+OTHER_POST_DATA = re.compile(
+    r'^\s*(?:CREATE\s+EVENT\s+TRIGGER|ALTER\s+EVENT\s+TRIGGER|REFRESH\s+MATERIALIZED\s+VIEW|'
+    r'ALTER\s+INDEX\s.*\sATTACH\s+PARTITION|'
+    r'COMMENT\s+ON\s+(?:INDEX|CONSTRAINT|TRIGGER|POLICY|RULE|EVENT\s+TRIGGER)\s)',
+    re.IGNORECASE | re.DOTALL)
+
+
+class RestoreSegment:
+    """The statements of one database in a dump, split into restore sections
+
+    pre_data   - in-order schema statements (Statement objects)
+    session    - SET / set_config statements to replay on every connection
+    data       - table -> [(start_offset, end_offset)] ranges of COPY/INSERT statements
+    sequences  - setval() statements
+    post_data  - [wave1, wave2], each table -> [Statement]
+    """
+
+    def __init__(self, database: str = None):
+        self.database = database
+        self.pre_data = []
+        self.session = []
+        self.data = {}
+        self.sequences = []
+        self.post_data = [{}, {}]
+
+    def data_statement_count(self) -> int:
+        return sum(len(ranges) for ranges in self.data.values())
+
+    def post_data_count(self) -> int:
+        return sum(len(statements) for wave in self.post_data for statements in wave.values())
+
+
+def classify_statement(statement: Statement):
+    """Return (section, table, wave) for a statement from a plain dump"""
+    sql = statement.sql
+    if statement.kind == COPY or DATA_TABLE.match(sql):
+        return DATA, DATA_TABLE.match(sql).group(1), None
+    if SEQUENCE_SET.match(sql):
+        return DATA, None, None
+
+    match = INDEX.match(sql)
+    if match:
+        return POST_DATA, match.group(1), 0
+    match = ADD_CONSTRAINT.match(sql)
+    if match:
+        return POST_DATA, match.group(1), 1 if FOREIGN_KEY.search(sql) else 0
+    match = TABLE_POST_DATA.match(sql)
+    if match:
+        return POST_DATA, match.group(1), 1
+    if OTHER_POST_DATA.match(sql):
+        return POST_DATA, None, 1
+    return PRE_DATA, None, None
+
+
+def connect_target(meta: str) -> str:
+    """Database named by a \\connect metacommand, for labels"""
+    dbname = re.search(r"dbname='((?:[^']|'')*)'", meta)
+    if dbname:
+        return dbname.group(1)
+    return meta.split()[-1].strip('"')
+
+
+def plan_restore(path: str, dump_filter=None) -> list:
+    """Scan a dump once and split it into RestoreSegments (one per \\connect)
+
+    Only schema and post-data statement text is kept in memory; table data is
+    recorded as byte ranges that loaders re-read with DumpFile. Statements a
+    DumpFilter drops are left out of the plan, data ranges included.
+    """
+    segments = [RestoreSegment()]
+    open_range = None          # (table, start_offset) of the data run being scanned
+
+    def close_range(end_offset):
+        nonlocal open_range
+        if open_range is None:
+            return
+        table, start_offset = open_range
+        if end_offset is None:
+            raise ValueError(f"Can't find where the data for {table} ends")
+        segments[-1].data.setdefault(table, []).append((start_offset, end_offset))
+        open_range = None
+
+    with DumpFile(path) as dump:
+        for statement in iter_statements(dump):
+            segment = segments[-1]
+            if statement.kind == META:
+                close_range(statement.offset)
+                if statement.sql.startswith('\\connect'):
+                    segments.append(RestoreSegment(connect_target(statement.sql)))
+                continue
+            if dump_filter is not None and not dump_filter.keeps(statement):
+                close_range(statement.offset)
+                continue
+
+            section, table, wave = classify_statement(statement)
+            if section == DATA and table is not None:
+                # Consecutive data statements for one table share a range
+                if open_range is not None and open_range[0] == table:
+                    continue
+                close_range(statement.offset)
+                if statement.offset is None:
+                    raise ValueError(f"Can't seek to the data statement at line {statement.line}")
+                open_range = (table, statement.offset)
+                continue
+
+            close_range(statement.offset)
+            if section == DATA:
+                segment.sequences.append(statement)
+            elif section == POST_DATA:
+                segment.post_data[wave].setdefault(table, []).append(statement)
+            else:
+                if SESSION_SETTING.match(statement.sql):
+                    segment.session.append(statement)
+                segment.pre_data.append(statement)
+
+        close_range(dump.next_offset)
+
+    return [segment for segment in segments
+            if segment.pre_data or segment.data or segment.sequences or segment.post_data_count()]
+
+
+def iter_range_statements(path: str, start_offset: int, end_offset: int):
+    """Yield the statements stored in [start_offset, end_offset) of a dump"""
+    with DumpFile(path, start_offset) as dump:
+        for statement in iter_statements(dump):
+            if statement.offset is not None and statement.offset >= end_offset:
+                return
+            yield statement
+
+
+# --- Filtering --------------------------------------------------------------
+
+# Object types a statement can be filtered by. acl and comment also apply to
+# the GRANT/REVOKE and COMMENT statements of every other type.
+OBJECT_TYPES = (
+    'role', 'database', 'schema', 'extension', 'type', 'function', 'table', 'sequence', 'view',
+    'index', 'constraint', 'trigger', 'policy', 'rule', 'publication', 'data', 'acl', 'comment',
+    'setting', 'other',
+)
+# Types whose statements belong to a table (or sequence/view) and follow the table rules
+RELATION_TYPES = {'table', 'sequence', 'view', 'data', 'index', 'constraint', 'trigger', 'policy', 'rule'}
+
+_KEYWORD_TYPES = {
+    'table': 'table', 'foreign table': 'table', 'column': 'table', 'view': 'view',
+    'materialized view': 'view', 'sequence': 'sequence', 'type': 'type', 'domain': 'type',
+    'function': 'function', 'procedure': 'function', 'routine': 'function', 'aggregate': 'function',
+    'schema': 'schema', 'extension': 'extension', 'role': 'role', 'database': 'database',
+    'index': 'index', 'constraint': 'constraint', 'trigger': 'trigger', 'event trigger': 'trigger',
+    'policy': 'policy', 'rule': 'rule', 'publication': 'publication',
+}
+
+ROLE = re.compile(r'^\s*(?:CREATE|ALTER|DROP)\s+(?:ROLE|USER|GROUP)\s', re.IGNORECASE)
+ROLE_MEMBERSHIP = re.compile(r'^\s*(?:GRANT|REVOKE)\s(?:(?!\sON\s).)*$', re.IGNORECASE | re.DOTALL)
+DATABASE = re.compile(r'^\s*(?:CREATE|ALTER|DROP)\s+DATABASE\s', re.IGNORECASE)
+SCHEMA = re.compile(rf'^\s*(?:CREATE|ALTER|DROP)\s+SCHEMA\s+(?:IF\s+NOT\s+EXISTS\s+)?({_NAME})',
+                    re.IGNORECASE)
+EXTENSION = re.compile(rf'^\s*(?:CREATE|ALTER|DROP)\s+EXTENSION\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?'
+                       rf'({_NAME})(?:.*?\sSCHEMA\s+({_NAME}))?', re.IGNORECASE | re.DOTALL)
+DEFAULT_ACL = re.compile(rf'^\s*ALTER\s+DEFAULT\s+PRIVILEGES\s(?:.*?\sIN\s+SCHEMA\s+({_NAME}))?',
+                         re.IGNORECASE | re.DOTALL)
+ACL = re.compile(rf'^\s*(?:GRANT|REVOKE)\s.*?\sON\s+(?:(TABLE|SEQUENCE|FUNCTION|PROCEDURE|ROUTINE|'
+                 rf'SCHEMA|TYPE|DOMAIN|DATABASE|LANGUAGE|FOREIGN\s+\w+(?:\s+\w+)?|LARGE\s+OBJECT)\s+)?'
+                 rf'({QUALIFIED_NAME})', re.IGNORECASE | re.DOTALL)
+COMMENT = re.compile(rf'^\s*COMMENT\s+ON\s+((?:MATERIALIZED\s+|FOREIGN\s+|EVENT\s+)?\w+)\s+'
+                     rf'({QUALIFIED_NAME}(?:\.{_NAME})?)(?:\s+ON\s+(?:DOMAIN\s+)?({QUALIFIED_NAME}))?',
+                     re.IGNORECASE)
+TRIGGER = re.compile(rf'^\s*CREATE\s+(?:OR\s+REPLACE\s+)?(?:CONSTRAINT\s+)?TRIGGER\s.*?\sON\s+'
+                     rf'(?:ONLY\s+)?({QUALIFIED_NAME})', re.IGNORECASE | re.DOTALL)
+POLICY = re.compile(rf'^\s*(?:CREATE|ALTER)\s+POLICY\s.*?\sON\s+({QUALIFIED_NAME})',
+                    re.IGNORECASE | re.DOTALL)
+RULE = re.compile(rf'^\s*CREATE\s+(?:OR\s+REPLACE\s+)?RULE\s.*?\sTO\s+({QUALIFIED_NAME})',
+                  re.IGNORECASE | re.DOTALL)
+OWNED_BY = re.compile(rf'^\s*ALTER\s+SEQUENCE\s+({QUALIFIED_NAME})\s+OWNED\s+BY\s+({QUALIFIED_NAME})\.{_NAME}',
+                      re.IGNORECASE)
+IDENTITY_SEQUENCE = re.compile(rf'\sSEQUENCE\s+NAME\s+({QUALIFIED_NAME})', re.IGNORECASE)
+REFERENCES = re.compile(rf'\sREFERENCES\s+({QUALIFIED_NAME})', re.IGNORECASE)
+SETVAL_SEQUENCE = re.compile(r"setval\s*\(\s*'((?:[^']|'')*)'", re.IGNORECASE)
+OBJECT = re.compile(
+    rf'^\s*(?:CREATE(?:\s+OR\s+REPLACE)?|ALTER|DROP)\s+(?:(?:GLOBAL|LOCAL)\s+)?'
+    rf'(?:(?:TEMP|TEMPORARY|UNLOGGED)\s+)?(TABLE|FOREIGN\s+TABLE|MATERIALIZED\s+VIEW|VIEW|SEQUENCE|'
+    rf'TYPE|DOMAIN|FUNCTION|PROCEDURE|AGGREGATE|PUBLICATION|EVENT\s+TRIGGER)\s+'
+    rf'(?:IF\s+(?:NOT\s+)?EXISTS\s+)?(?:ONLY\s+)?({QUALIFIED_NAME})',
+    re.IGNORECASE)
+
+
+def split_name(qualified: str, default_schema: str = 'public'):
+    """Split a possibly quoted schema.name into unquoted (schema, name)"""
+    parts = re.findall(r'"((?:[^"]|"")*)"|([^."]+)', qualified)
+    names = [quoted.replace('""', '"') if quoted else plain for quoted, plain in parts]
+    if len(names) == 1:
+        return default_schema, names[0]
+    return names[-2], names[-1]
+
+
+class DumpObject:
+    """What a dump statement creates or changes, as far as filtering is concerned
+
+    relation objects are matched against the table rules by (schema, name);
+    references are other relations the statement needs (a foreign key's
+    target table, a sequence's owning table); detail is 'acl' or 'comment'
+    for GRANT/REVOKE and COMMENT statements about the object.
+    """
+
+    def __init__(self, object_type: str, schema: str = None, name: str = None,
+                 detail: str = None, references=()):
+        self.type = object_type
+        self.schema = schema
+        self.name = name
+        self.detail = detail
+        self.references = references
+
+    @property
+    def relation(self) -> bool:
+        return self.type in RELATION_TYPES and self.name is not None
+
+
+def keyword_type(keyword: str) -> str:
+    return _KEYWORD_TYPES.get(' '.join(keyword.lower().split()), 'other')
+
+
+def describe_statement(statement: Statement) -> DumpObject:
+    """Work out the object type, schema and name a dump statement is about"""
+    sql = statement.sql
+    if statement.kind == COPY or DATA_TABLE.match(sql):
+        return DumpObject('data', *split_name(DATA_TABLE.match(sql).group(1)))
+    if SEQUENCE_SET.match(sql):
+        sequence = SETVAL_SEQUENCE.search(sql)
+        return DumpObject('data', *split_name(sequence.group(1).replace("''", "'"))) if sequence \
+            else DumpObject('data')
+    if SESSION_SETTING.match(sql):
+        return DumpObject('setting')
+    if ROLE.match(sql) or ROLE_MEMBERSHIP.match(sql):
+        return DumpObject('role')
+    if DATABASE.match(sql):
+        return DumpObject('database')
+
+    match = SCHEMA.match(sql)
+    if match:
+        return DumpObject('schema', split_name(match.group(1))[1])
+    match = EXTENSION.match(sql)
+    if match:
+        schema = split_name(match.group(2))[1] if match.group(2) else None
+        return DumpObject('extension', schema, split_name(match.group(1))[1])
+    match = DEFAULT_ACL.match(sql)
+    if match:
+        return DumpObject('acl', split_name(match.group(1))[1] if match.group(1) else None)
+    match = ACL.match(sql)
+    if match:
+        object_type = keyword_type(match.group(1)) if match.group(1) else 'table'
+        if object_type == 'schema':
+            return DumpObject('schema', split_name(match.group(2))[1], detail='acl')
+        if object_type in ('database', 'other'):
+            return DumpObject(object_type, detail='acl')
+        return DumpObject(object_type, *split_name(match.group(2)), detail='acl')
+    match = COMMENT.match(sql)
+    if match:
+        object_type = keyword_type(match.group(1))
+        target = match.group(3) or match.group(2)
+        if object_type in ('schema', 'extension'):
+            return DumpObject(object_type, None if object_type == 'extension' else split_name(target)[1],
+                              detail='comment')
+        if object_type in ('role', 'database', 'other') or target is None:
+            return DumpObject(object_type, detail='comment')
+        if object_type == 'table' and match.group(1).upper() == 'COLUMN':
+            target = target.rsplit('.', 1)[0]
+        return DumpObject(object_type, *split_name(target), detail='comment')
+
+    match = INDEX.match(sql)
+    if match:
+        return DumpObject('index', *split_name(match.group(1)))
+    match = ADD_CONSTRAINT.match(sql)
+    if match:
+        references = tuple(split_name(target) for target in REFERENCES.findall(sql))
+        return DumpObject('constraint', *split_name(match.group(1)), references=references)
+    for object_type, pattern in (('trigger', TRIGGER), ('policy', POLICY), ('rule', RULE)):
+        match = pattern.match(sql)
+        if match:
+            return DumpObject(object_type, *split_name(match.group(1)))
+    match = OWNED_BY.match(sql)
+    if match:
+        return DumpObject('sequence', *split_name(match.group(1)),
+                          references=(split_name(match.group(2)),))
+    match = OBJECT.match(sql)
+    if match:
+        object_type = keyword_type(match.group(1))
+        if object_type == 'publication':
+            return DumpObject('publication')
+        if object_type == 'trigger':
+            return DumpObject('trigger')
+        return DumpObject(object_type, *split_name(match.group(2)))
+    return DumpObject('other')
+
+
+def matches_any(patterns, *names) -> bool:
+    """True if any name matches any shell-style pattern"""
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns for name in names)
+
+
+class DumpFilter:
+    """Include/exclude rules by schema, table and object type, applied statement by statement
+
+    Table patterns are shell-style and match "schema.table" or the bare table
+    name, e.g. "public.auth_*" or "django_*". They apply to everything that
+    belongs to a table: its data, sequences, indexes, constraints, triggers,
+    policies, grants and comments. Foreign keys pointing at a dropped table
+    are dropped with it, and so are sequences it owns once the dump has said
+    so (ALTER SEQUENCE ... OWNED BY, identity columns).
+
+    exclude_table_data patterns (like pg_dump --exclude-table-data) drop only
+    the rows and sequence values of matching tables and sequences; their
+    definitions, and foreign keys pointing at them, are kept.
+
+    Include lists, when given, keep only what they match; excludes always win.
+    Session settings and psql metacommands are always kept.
+    """
+
+    def __init__(self, include_schemas=(), exclude_schemas=(), include_tables=(), exclude_tables=(),
+                 include_types=(), exclude_types=(), exclude_table_data=()):
+        unknown = (set(include_types) | set(exclude_types)) - set(OBJECT_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown object type(s): {', '.join(sorted(unknown))} "
+                             f"(choose from {', '.join(OBJECT_TYPES)})")
+        self.include_schemas = tuple(include_schemas)
+        self.exclude_schemas = tuple(exclude_schemas)
+        self.include_tables = tuple(include_tables)
+        self.exclude_tables = tuple(exclude_tables)
+        self.include_types = set(include_types)
+        self.exclude_types = set(exclude_types)
+        self.exclude_table_data = tuple(exclude_table_data)
+        self.dropped_relations = set()
+        self.kept = 0
+        self.dropped = Counter()
+
+    def __bool__(self):
+        return bool(self.include_schemas or self.exclude_schemas or self.include_tables
+                    or self.exclude_tables or self.include_types or self.exclude_types
+                    or self.exclude_table_data)
+
+    def schema_allowed(self, schema: str) -> bool:
+        if self.include_schemas and not matches_any(self.include_schemas, schema):
+            return False
+        return not matches_any(self.exclude_schemas, schema)
+
+    def relation_allowed(self, schema: str, name: str) -> bool:
+        if not self.schema_allowed(schema) or (schema, name) in self.dropped_relations:
+            return False
+        names = (f"{schema}.{name}", name)
+        if self.include_tables and not matches_any(self.include_tables, *names):
+            return False
+        return not matches_any(self.exclude_tables, *names)
+
+    def allows(self, dump_object: DumpObject) -> bool:
+        if dump_object.type == 'setting':
+            return True
+        types = {dump_object.type, dump_object.detail} - {None}
+        if self.include_types and not types & self.include_types:
+            return False
+        if types & self.exclude_types:
+            return False
+        if dump_object.schema is not None and not self.schema_allowed(dump_object.schema):
+            return False
+        if dump_object.relation and not self.relation_allowed(dump_object.schema, dump_object.name):
+            return False
+        if dump_object.type == 'data' and dump_object.name is not None and matches_any(
+                self.exclude_table_data, f"{dump_object.schema}.{dump_object.name}", dump_object.name):
+            return False
+        return all(self.relation_allowed(*reference) for reference in dump_object.references)
+
+    def keeps(self, statement: Statement) -> bool:
+        """Decide whether statement stays in the dump (and count it)"""
+        if statement.kind == META:
+            return True
+        dump_object = describe_statement(statement)
+        keep = self.allows(dump_object)
+        if dump_object.relation and dump_object.detail is None:
+            if not keep and dump_object.type in ('table', 'sequence'):
+                # Sequences owned by a dropped table go with it
+                self.dropped_relations.add((dump_object.schema, dump_object.name))
+                self.dropped_relations.update(split_name(sequence)
+                                              for sequence in IDENTITY_SEQUENCE.findall(statement.sql))
+        if keep:
+            self.kept += 1
+        else:
+            self.dropped[dump_object.type] += 1
+        return keep
+
+    def filter(self, statements):
+        """Yield only the statements the rules keep; dropped COPY data is never buffered"""
+        for statement in statements:
+            if self.keeps(statement):
+                yield statement
+
+    def summary(self) -> str:
+        dropped = ', '.join(f"{count} {object_type}" for object_type, count in self.dropped.most_common())
+        return f"{self.kept} statements kept, {sum(self.dropped.values())} dropped" + \
+            (f" ({dropped})" if dropped else "")
+
+
+def write_statement(out, statement: Statement):
+    """Write a statement back out in dump syntax (comments are not preserved)"""
+    if statement.kind == META:
+        out.write(f"{statement.sql}\n\n")
+    elif statement.kind == COPY:
+        out.write(f"{statement.sql};\n")
+        for row in statement.rows:
+            out.write(row if row.endswith('\n') else row + '\n')
+        out.write(f"{END_OF_COPY}\n\n")
+    else:
+        out.write(f"{statement.sql};\n\n")
@@ -0,0 +1,131 @@
+-- Migration: Idempotent H1B batch upsert
+-- Date: 2026-10-17
+-- Description: Batch upsert keyed on case_number with a configurable merge policy,
+-- used by supabase/scripts/upload_to_supabase.py instead of per-row duplicate fallback
+
+-- ============================================================================
+-- UPSERT FUNCTION
+-- ============================================================================
+
+-- merge_policy:
+--   'skip'      - insert new case numbers, leave existing rows untouched
+--   'overwrite' - insert new case numbers, rewrite existing rows
+--   'changed'   - insert new case numbers, rewrite existing rows only when a value differs
+-- Returns the inserted, updated and unchanged counts, plus the rows it never writes:
+-- skipped_invalid (no case_number) and duplicates (earlier occurrences of a case
+-- number the batch repeats; the last one wins). unchanged only counts existing rows
+-- the merge policy left as they were.
+CREATE OR REPLACE FUNCTION upsert_h1b_applications(records JSONB, merge_policy TEXT DEFAULT 'skip')
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $function$
+DECLARE
+  inserted_count BIGINT := 0;
+  updated_count BIGINT := 0;
+  invalid_count BIGINT := 0;
+  duplicate_count BIGINT := 0;
+BEGIN
+  IF merge_policy IS NULL OR merge_policy NOT IN ('skip', 'overwrite', 'changed') THEN
+    RAISE EXCEPTION 'Unknown merge_policy: %', merge_policy;
+  END IF;
+
+  SELECT
+    COUNT(*) FILTER (WHERE r.case_number IS NULL),
+    COUNT(r.case_number) - COUNT(DISTINCT r.case_number)
+  INTO invalid_count, duplicate_count
+  FROM jsonb_to_recordset(records) AS r(case_number TEXT);
+
+  WITH incoming AS (
+    -- Last occurrence wins when a batch repeats a case number
+    SELECT DISTINCT ON (r.case_number) r.*
+    FROM jsonb_populate_recordset(NULL::h1b_applications, records) WITH ORDINALITY AS r
+    WHERE r.case_number IS NOT NULL
+    ORDER BY r.case_number, r.ordinality DESC
+  ),
+  merged AS (
+    INSERT INTO h1b_applications AS t (
+      case_number, case_status, received_date, decision_date, visa_class,
+      job_title, soc_code, soc_title, full_time_position, begin_date, end_date,
+      employer_name, employer_city, employer_state, employer_postal_code,
+      worksite_city, worksite_state, worksite_postal_code,
+      wage_rate_of_pay_from, wage_rate_of_pay_to, wage_unit_of_pay, prevailing_wage
+    )
+    SELECT
+      case_number, case_status, received_date, decision_date, visa_class,
+      job_title, soc_code, soc_title, full_time_position, begin_date, end_date,
+      employer_name, employer_city, employer_state, employer_postal_code,
+      worksite_city, worksite_state, worksite_postal_code,
+      wage_rate_of_pay_from, wage_rate_of_pay_to, wage_unit_of_pay, prevailing_wage
+    FROM incoming
+    ON CONFLICT (case_number) DO UPDATE SET
+      case_status = EXCLUDED.case_status,
+      received_date = EXCLUDED.received_date,
+      decision_date = EXCLUDED.decision_date,
+      visa_class = EXCLUDED.visa_class,
+      job_title = EXCLUDED.job_title,
+      soc_code = EXCLUDED.soc_code,
+      soc_title = EXCLUDED.soc_title,
+      full_time_position = EXCLUDED.full_time_position,
+      begin_date = EXCLUDED.begin_date,
+      end_date = EXCLUDED.end_date,
+      employer_name = EXCLUDED.employer_name,
+      employer_city = EXCLUDED.employer_city,
+      employer_state = EXCLUDED.employer_state,
+      employer_postal_code = EXCLUDED.employer_postal_code,
+      worksite_city = EXCLUDED.worksite_city,
+      worksite_state = EXCLUDED.worksite_state,
+      worksite_postal_code = EXCLUDED.worksite_postal_code,
+      wage_rate_of_pay_from = EXCLUDED.wage_rate_of_pay_from,
+      wage_rate_of_pay_to = EXCLUDED.wage_rate_of_pay_to,
+      wage_unit_of_pay = EXCLUDED.wage_unit_of_pay,
+      prevailing_wage = EXCLUDED.prevailing_wage,
+      updated_at = NOW()
+    WHERE merge_policy = 'overwrite'
+      OR (merge_policy = 'changed' AND (
+        t.case_status, t.received_date, t.decision_date, t.visa_class,
+        t.job_title, t.soc_code, t.soc_title, t.full_time_position, t.begin_date, t.end_date,
+        t.employer_name, t.employer_city, t.employer_state, t.employer_postal_code,
+        t.worksite_city, t.worksite_state, t.worksite_postal_code,
+        t.wage_rate_of_pay_from, t.wage_rate_of_pay_to, t.wage_unit_of_pay, t.prevailing_wage
+      ) IS DISTINCT FROM (
+        EXCLUDED.case_status, EXCLUDED.received_date, EXCLUDED.decision_date, EXCLUDED.visa_class,
+        EXCLUDED.job_title, EXCLUDED.soc_code, EXCLUDED.soc_title, EXCLUDED.full_time_position,
+        EXCLUDED.begin_date, EXCLUDED.end_date,
+        EXCLUDED.employer_name, EXCLUDED.employer_city, EXCLUDED.employer_state,
+        EXCLUDED.employer_postal_code,
+        EXCLUDED.worksite_city, EXCLUDED.worksite_state, EXCLUDED.worksite_postal_code,
+        EXCLUDED.wage_rate_of_pay_from, EXCLUDED.wage_rate_of_pay_to, EXCLUDED.wage_unit_of_pay,
+        EXCLUDED.prevailing_wage
+      ))
+    RETURNING (xmax = 0) AS inserted
+  )
+  SELECT
+    COUNT(*) FILTER (WHERE inserted),
+    COUNT(*) FILTER (WHERE NOT inserted)
+  INTO inserted_count, updated_count
+  FROM merged;
+
+  RETURN jsonb_build_object(
+    'inserted', inserted_count,
+    'updated', updated_count,
+    'unchanged', jsonb_array_length(records) - invalid_count - duplicate_count
+                 - inserted_count - updated_count,
+    'skipped_invalid', invalid_count,
+    'duplicates', duplicate_count
+  );
+END;
+$function$;
+
+-- ============================================================================
+-- PERMISSIONS
+-- ============================================================================
+
+-- Writes are for the ingest pipeline only
+REVOKE EXECUTE ON FUNCTION upsert_h1b_applications(JSONB, TEXT) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION upsert_h1b_applications(JSONB, TEXT) TO service_role;
+
+-- ============================================================================
+-- ROLLBACK STATEMENTS (for reference)
+-- ============================================================================
+
+-- DROP FUNCTION IF EXISTS upsert_h1b_applications(JSONB, TEXT);
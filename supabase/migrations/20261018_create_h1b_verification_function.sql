@@ -0,0 +1,60 @@
+-- Migration: Server-side H1B upload verification
+-- Date: 2026-10-18
+-- Description: Per-status counts, wage sums and case number checksums over the case numbers
+-- an upload sent, aggregated in the database so supabase/scripts/upload_verification.py can
+-- verify an upload with a few small queries instead of downloading every row. Scoping to the
+-- uploaded case numbers (rather than, say, a decision_date range) leaves out rows the upload
+-- never touched, which matters for parser --delta files holding only new and changed cases
+
+-- ============================================================================
+-- VERIFICATION FUNCTION
+-- ============================================================================
+
+-- One row per case_status (NULL reported as '') over the rows whose case_number is
+-- in case_numbers, found through the unique index on case_number. The client sends
+-- the case numbers in chunks and adds the results up: counts, sums and checksums
+-- are all additive.
+-- case_checksum is the sum of the first 60 bits of md5(case_number): it doesn't
+-- depend on row order and any missing, extra or renamed case number changes it.
+-- Sums are returned as text so no precision is lost on the way to the client.
+CREATE OR REPLACE FUNCTION get_h1b_verification_stats_for_cases(case_numbers TEXT[])
+RETURNS TABLE(
+  status TEXT,
+  count BIGINT,
+  wage_from_sum TEXT,
+  wage_to_sum TEXT,
+  prevailing_wage_sum TEXT,
+  case_checksum TEXT
+)
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+AS $function$
+BEGIN
+  RETURN QUERY
+  SELECT
+    COALESCE(a.case_status, '') AS status,
+    COUNT(*) AS count,
+    COALESCE(SUM(a.wage_rate_of_pay_from), 0)::TEXT,
+    COALESCE(SUM(a.wage_rate_of_pay_to), 0)::TEXT,
+    COALESCE(SUM(a.prevailing_wage), 0)::TEXT,
+    SUM(('x' || SUBSTR(MD5(a.case_number), 1, 15))::BIT(60)::BIGINT)::TEXT
+  FROM h1b_applications a
+  WHERE a.case_number = ANY(case_numbers)
+  GROUP BY COALESCE(a.case_status, '')
+  ORDER BY 1;
+END;
+$function$;
+
+-- ============================================================================
+-- PERMISSIONS
+-- ============================================================================
+
+REVOKE EXECUTE ON FUNCTION get_h1b_verification_stats_for_cases(TEXT[]) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION get_h1b_verification_stats_for_cases(TEXT[]) TO service_role;
+
+-- ============================================================================
+-- ROLLBACK STATEMENTS (for reference)
+-- ============================================================================
+
+-- DROP FUNCTION IF EXISTS get_h1b_verification_stats_for_cases(TEXT[]);
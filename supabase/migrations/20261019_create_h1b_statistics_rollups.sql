@@ -0,0 +1,705 @@
+-- Migration: Incrementally refreshed H1B statistics rollups
+-- Date: 2026-10-19
+-- Description: Pre-aggregated rollup tables behind the dashboard statistics RPCs, so
+-- get_h1b_statistics, get_top_h1b_employers, get_h1b_salary_by_job_title, get_h1b_trends and
+-- get_h1b_statistics_by_state no longer scan h1b_applications on every call. Triggers queue
+-- the keys a write touches; refresh_h1b_statistics(), called by the upload scripts after each
+-- load, recomputes only those keys.
+
+-- ============================================================================
+-- ROLLUP TABLES
+-- ============================================================================
+
+-- salary below is COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0), as in the
+-- original RPCs; "paid" rows are the ones with salary > 0.
+
+-- Per employer (non-blank names)
+CREATE TABLE IF NOT EXISTS h1b_stats_employers (
+  employer_name TEXT PRIMARY KEY,
+  applications BIGINT NOT NULL,
+  certified BIGINT NOT NULL,
+  salary_sum NUMERIC NOT NULL,
+  paid_applications BIGINT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_h1b_stats_employers_applications
+  ON h1b_stats_employers(applications DESC, employer_name);
+CREATE INDEX IF NOT EXISTS idx_h1b_stats_employers_paid
+  ON h1b_stats_employers(paid_applications DESC, employer_name);
+
+-- Per job title, over paid rows only. The median can't be summed, so it is
+-- recomputed from the title's rows whenever the title is refreshed.
+CREATE TABLE IF NOT EXISTS h1b_stats_job_titles (
+  job_title TEXT PRIMARY KEY,
+  applications BIGINT NOT NULL,
+  salary_sum NUMERIC NOT NULL,
+  median_salary NUMERIC NOT NULL,
+  min_salary NUMERIC NOT NULL,
+  max_salary NUMERIC NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_h1b_stats_job_titles_applications
+  ON h1b_stats_job_titles(applications DESC, job_title);
+
+-- Per state (COALESCE(worksite_state, employer_state)) and employer. Refreshed by
+-- employer, which keeps the refresh on the employer_name index, and summed per
+-- state into h1b_stats_states (with the state's top employer).
+CREATE TABLE IF NOT EXISTS h1b_stats_state_employers (
+  state TEXT NOT NULL,
+  employer_name TEXT,
+  applications BIGINT NOT NULL,
+  certified BIGINT NOT NULL,
+  salary_sum NUMERIC NOT NULL,
+  UNIQUE NULLS NOT DISTINCT (state, employer_name)
+);
+CREATE INDEX IF NOT EXISTS idx_h1b_stats_state_employers_employer
+  ON h1b_stats_state_employers(employer_name);
+
+CREATE TABLE IF NOT EXISTS h1b_stats_states (
+  state TEXT PRIMARY KEY,
+  applications BIGINT NOT NULL,
+  certified BIGINT NOT NULL,
+  salary_sum NUMERIC NOT NULL,
+  top_employer TEXT
+);
+
+-- Per received day (UTC); get_h1b_trends rolls days up into months, quarters or years
+CREATE TABLE IF NOT EXISTS h1b_stats_days (
+  day DATE PRIMARY KEY,
+  applications BIGINT NOT NULL,
+  certified BIGINT NOT NULL,
+  salary_sum NUMERIC NOT NULL
+);
+
+-- Paid rows per salary and status (NULL status as 'UNKNOWN'). The whole-table
+-- figures in h1b_stats_totals, the exact median included, are recomputed from
+-- this histogram, which grows with the number of distinct salaries rather than
+-- with the table, whenever a salary is refreshed.
+CREATE TABLE IF NOT EXISTS h1b_stats_salaries (
+  salary NUMERIC NOT NULL,
+  case_status TEXT NOT NULL,
+  applications BIGINT NOT NULL,
+  PRIMARY KEY (salary, case_status)
+);
+
+-- One row: totals over all paid rows, statuses as {status: applications}
+CREATE TABLE IF NOT EXISTS h1b_stats_totals (
+  singleton BOOLEAN PRIMARY KEY DEFAULT true CHECK (singleton),
+  applications BIGINT NOT NULL,
+  certified BIGINT NOT NULL,
+  salary_sum NUMERIC,
+  median_salary NUMERIC,
+  min_salary NUMERIC,
+  max_salary NUMERIC,
+  statuses JSONB NOT NULL
+);
+
+-- Keys written since the last refresh. dimension is 'employer' (a NULL key is the
+-- rows without an employer), 'job_title', 'day' or 'salary'.
+CREATE TABLE IF NOT EXISTS h1b_stats_dirty (
+  dimension TEXT NOT NULL,
+  key TEXT,
+  UNIQUE NULLS NOT DISTINCT (dimension, key)
+);
+
+-- Only reachable through the SECURITY DEFINER functions below
+ALTER TABLE h1b_stats_employers ENABLE ROW LEVEL SECURITY;
+ALTER TABLE h1b_stats_job_titles ENABLE ROW LEVEL SECURITY;
+ALTER TABLE h1b_stats_state_employers ENABLE ROW LEVEL SECURITY;
+ALTER TABLE h1b_stats_states ENABLE ROW LEVEL SECURITY;
+ALTER TABLE h1b_stats_days ENABLE ROW LEVEL SECURITY;
+ALTER TABLE h1b_stats_salaries ENABLE ROW LEVEL SECURITY;
+ALTER TABLE h1b_stats_totals ENABLE ROW LEVEL SECURITY;
+ALTER TABLE h1b_stats_dirty ENABLE ROW LEVEL SECURITY;
+
+-- ============================================================================
+-- CHANGE TRACKING
+-- ============================================================================
+
+-- The rollup keys one h1b_applications row contributes to
+CREATE OR REPLACE FUNCTION h1b_stats_keys(employer_name TEXT, job_title TEXT,
+                                          received_date TIMESTAMPTZ, salary NUMERIC)
+RETURNS TABLE(dimension TEXT, key TEXT)
+LANGUAGE sql
+IMMUTABLE
+AS $function$
+  SELECT k.dimension, k.key
+  FROM (VALUES
+    ('employer', employer_name),
+    ('job_title', NULLIF(job_title, '')),
+    ('day', (received_date AT TIME ZONE 'UTC')::DATE::TEXT),
+    ('salary', CASE WHEN salary > 0 THEN salary::TEXT END)
+  ) AS k(dimension, key)
+  WHERE k.key IS NOT NULL OR k.dimension = 'employer';
+$function$;
+
+-- Statement-level trigger: queues the keys of the inserted and deleted rows, and
+-- of both versions of updated rows whose statistics columns changed, so an
+-- 'overwrite' re-upload of unchanged rows queues nothing.
+CREATE OR REPLACE FUNCTION h1b_stats_track_changes()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $function$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO h1b_stats_dirty (dimension, key)
+    SELECT DISTINCT k.dimension, k.key
+    FROM new_rows r,
+      h1b_stats_keys(r.employer_name, r.job_title, r.received_date,
+                     COALESCE(r.wage_rate_of_pay_from, r.wage_rate_of_pay_to, 0)) k
+    ON CONFLICT DO NOTHING;
+  ELSIF TG_OP = 'DELETE' THEN
+    INSERT INTO h1b_stats_dirty (dimension, key)
+    SELECT DISTINCT k.dimension, k.key
+    FROM old_rows r,
+      h1b_stats_keys(r.employer_name, r.job_title, r.received_date,
+                     COALESCE(r.wage_rate_of_pay_from, r.wage_rate_of_pay_to, 0)) k
+    ON CONFLICT DO NOTHING;
+  ELSE
+    INSERT INTO h1b_stats_dirty (dimension, key)
+    SELECT DISTINCT k.dimension, k.key
+    FROM old_rows o
+    JOIN new_rows n ON n.id = o.id
+    CROSS JOIN LATERAL (VALUES
+      (o.employer_name, o.job_title, o.received_date,
+       COALESCE(o.wage_rate_of_pay_from, o.wage_rate_of_pay_to, 0)),
+      (n.employer_name, n.job_title, n.received_date,
+       COALESCE(n.wage_rate_of_pay_from, n.wage_rate_of_pay_to, 0))
+    ) AS r(employer_name, job_title, received_date, salary),
+      h1b_stats_keys(r.employer_name, r.job_title, r.received_date, r.salary) k
+    WHERE (o.case_status, o.employer_name, o.job_title, o.worksite_state, o.employer_state,
+           o.received_date, o.wage_rate_of_pay_from, o.wage_rate_of_pay_to)
+      IS DISTINCT FROM
+          (n.case_status, n.employer_name, n.job_title, n.worksite_state, n.employer_state,
+           n.received_date, n.wage_rate_of_pay_from, n.wage_rate_of_pay_to)
+    ON CONFLICT DO NOTHING;
+  END IF;
+  RETURN NULL;
+END;
+$function$;
+
+-- Installs the triggers, plus the indexes the key-scoped refresh reads through
+-- (employer_name and job_title are indexed when the table is created). Called by
+-- refresh_h1b_statistics() when the triggers are missing, e.g. because
+-- h1b_applications was created after this migration ran.
+CREATE OR REPLACE FUNCTION install_h1b_statistics_tracking()
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $function$
+BEGIN
+  CREATE INDEX IF NOT EXISTS idx_h1b_applications_received_date
+    ON h1b_applications(received_date);
+  CREATE INDEX IF NOT EXISTS idx_h1b_applications_salary_amount
+    ON h1b_applications((COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0)));
+
+  -- Transition tables need one trigger per event
+  DROP TRIGGER IF EXISTS h1b_stats_track_insert ON h1b_applications;
+  DROP TRIGGER IF EXISTS h1b_stats_track_update ON h1b_applications;
+  DROP TRIGGER IF EXISTS h1b_stats_track_delete ON h1b_applications;
+  CREATE TRIGGER h1b_stats_track_insert AFTER INSERT ON h1b_applications
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION h1b_stats_track_changes();
+  CREATE TRIGGER h1b_stats_track_update AFTER UPDATE ON h1b_applications
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION h1b_stats_track_changes();
+  CREATE TRIGGER h1b_stats_track_delete AFTER DELETE ON h1b_applications
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION h1b_stats_track_changes();
+END;
+$function$;
+
+-- ============================================================================
+-- REFRESH FUNCTION
+-- ============================================================================
+
+-- Recomputes the rollup rows of every queued key from h1b_applications and
+-- empties the queue; with rebuild => true (or when the triggers aren't installed
+-- yet) every key is queued first, i.e. the rollups are rebuilt. Returns how many
+-- keys of each kind were refreshed. Runs one at a time; keys queued by loads
+-- still in flight stay queued for the next call.
+CREATE OR REPLACE FUNCTION refresh_h1b_statistics(rebuild BOOLEAN DEFAULT false)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $function$
+DECLARE
+  employers TEXT[];
+  null_employer BOOLEAN;
+  job_titles TEXT[];
+  days DATE[];
+  salaries NUMERIC[];
+  states TEXT[];
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('refresh_h1b_statistics'));
+
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_trigger
+    WHERE tgrelid = 'h1b_applications'::REGCLASS AND tgname = 'h1b_stats_track_insert'
+  ) THEN
+    PERFORM install_h1b_statistics_tracking();
+    rebuild := true;
+  END IF;
+
+  IF rebuild THEN
+    DELETE FROM h1b_stats_employers;
+    DELETE FROM h1b_stats_job_titles;
+    DELETE FROM h1b_stats_state_employers;
+    DELETE FROM h1b_stats_states;
+    DELETE FROM h1b_stats_days;
+    DELETE FROM h1b_stats_salaries;
+    DELETE FROM h1b_stats_totals;
+    INSERT INTO h1b_stats_dirty (dimension, key)
+    SELECT DISTINCT k.dimension, k.key
+    FROM h1b_applications a,
+      h1b_stats_keys(a.employer_name, a.job_title, a.received_date,
+                     COALESCE(a.wage_rate_of_pay_from, a.wage_rate_of_pay_to, 0)) k
+    ON CONFLICT DO NOTHING;
+  END IF;
+
+  WITH claimed AS (
+    DELETE FROM h1b_stats_dirty RETURNING dimension, key
+  )
+  SELECT
+    COALESCE(ARRAY_AGG(key) FILTER (WHERE dimension = 'employer' AND key IS NOT NULL), '{}'),
+    COALESCE(BOOL_OR(dimension = 'employer' AND key IS NULL), false),
+    COALESCE(ARRAY_AGG(key) FILTER (WHERE dimension = 'job_title'), '{}'),
+    COALESCE(ARRAY_AGG(key::DATE) FILTER (WHERE dimension = 'day'), '{}'),
+    COALESCE(ARRAY_AGG(key::NUMERIC) FILTER (WHERE dimension = 'salary'), '{}')
+  INTO employers, null_employer, job_titles, days, salaries
+  FROM claimed;
+
+  -- Employers
+  DELETE FROM h1b_stats_employers WHERE employer_name = ANY(employers);
+  INSERT INTO h1b_stats_employers
+  SELECT
+    employer_name,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE case_status IN ('CERTIFIED', 'CERTIFIED-WITHDRAWN')),
+    SUM(COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0)),
+    COUNT(*) FILTER (WHERE COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0) > 0)
+  FROM h1b_applications
+  WHERE employer_name = ANY(employers) AND employer_name != ''
+  GROUP BY employer_name;
+
+  -- States: the refreshed employers' states, before and after the refresh
+  states := ARRAY(
+    SELECT state FROM h1b_stats_state_employers
+    WHERE employer_name = ANY(employers) OR (null_employer AND employer_name IS NULL)
+  );
+  DELETE FROM h1b_stats_state_employers
+  WHERE employer_name = ANY(employers) OR (null_employer AND employer_name IS NULL);
+  INSERT INTO h1b_stats_state_employers
+  SELECT
+    COALESCE(worksite_state, employer_state),
+    employer_name,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE case_status IN ('CERTIFIED', 'CERTIFIED-WITHDRAWN')),
+    SUM(COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0))
+  FROM h1b_applications
+  WHERE (employer_name = ANY(employers) OR (null_employer AND employer_name IS NULL))
+    AND COALESCE(worksite_state, employer_state) IS NOT NULL
+  GROUP BY COALESCE(worksite_state, employer_state), employer_name;
+  states := ARRAY(
+    SELECT state FROM h1b_stats_state_employers
+    WHERE employer_name = ANY(employers) OR (null_employer AND employer_name IS NULL)
+    UNION
+    SELECT UNNEST(states)
+  );
+
+  DELETE FROM h1b_stats_states WHERE state = ANY(states);
+  INSERT INTO h1b_stats_states
+  SELECT
+    state,
+    SUM(applications),
+    SUM(certified),
+    SUM(salary_sum),
+    (ARRAY_AGG(employer_name ORDER BY applications DESC, employer_name))[1]
+  FROM h1b_stats_state_employers
+  WHERE state = ANY(states)
+  GROUP BY state;
+
+  -- Job titles
+  DELETE FROM h1b_stats_job_titles WHERE job_title = ANY(job_titles);
+  INSERT INTO h1b_stats_job_titles
+  SELECT
+    job_title,
+    COUNT(*),
+    SUM(salary),
+    PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY salary)::NUMERIC,
+    MIN(salary),
+    MAX(salary)
+  FROM (
+    SELECT job_title, COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0) AS salary
+    FROM h1b_applications
+    WHERE job_title = ANY(job_titles)
+  ) salary_data
+  WHERE salary > 0
+  GROUP BY job_title;
+
+  -- Days, each a range scan on idx_h1b_applications_received_date
+  DELETE FROM h1b_stats_days WHERE day = ANY(days);
+  INSERT INTO h1b_stats_days
+  SELECT
+    d.day,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE a.case_status IN ('CERTIFIED', 'CERTIFIED-WITHDRAWN')),
+    SUM(COALESCE(a.wage_rate_of_pay_from, a.wage_rate_of_pay_to, 0))
+  FROM UNNEST(days) AS d(day)
+  JOIN h1b_applications a
+    ON a.received_date >= d.day::TIMESTAMP AT TIME ZONE 'UTC'
+   AND a.received_date < (d.day + 1)::TIMESTAMP AT TIME ZONE 'UTC'
+  GROUP BY d.day;
+
+  -- Salaries, through idx_h1b_applications_salary_amount
+  DELETE FROM h1b_stats_salaries WHERE salary = ANY(salaries);
+  INSERT INTO h1b_stats_salaries
+  SELECT
+    COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0),
+    COALESCE(case_status, 'UNKNOWN'),
+    COUNT(*)
+  FROM h1b_applications
+  WHERE COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0) = ANY(salaries)
+  GROUP BY 1, 2;
+
+  -- Whole-table totals. PERCENTILE_CONT(0.5) averages the values at 0-based
+  -- positions (n - 1) / 2 and n / 2, found from the histogram's running counts.
+  IF CARDINALITY(salaries) > 0 OR rebuild THEN
+    DELETE FROM h1b_stats_totals;
+    WITH histogram AS (
+      SELECT salary, SUM(applications) AS applications
+      FROM h1b_stats_salaries
+      GROUP BY salary
+    ),
+    running AS (
+      SELECT salary, applications,
+        SUM(applications) OVER (ORDER BY salary) AS reached,
+        SUM(applications) OVER () AS total
+      FROM histogram
+    )
+    INSERT INTO h1b_stats_totals
+      (applications, certified, salary_sum, median_salary, min_salary, max_salary, statuses)
+    SELECT
+      COALESCE(MAX(total), 0),
+      (SELECT COALESCE(SUM(applications), 0) FROM h1b_stats_salaries
+       WHERE case_status IN ('CERTIFIED', 'CERTIFIED-WITHDRAWN')),
+      SUM(salary * applications),
+      (MIN(salary) FILTER (WHERE reached > FLOOR((total - 1) / 2))
+       + MIN(salary) FILTER (WHERE reached > FLOOR(total / 2))) / 2,
+      MIN(salary),
+      MAX(salary),
+      (SELECT COALESCE(JSONB_OBJECT_AGG(case_status, applications), '{}')
+       FROM (SELECT case_status, SUM(applications) AS applications
+             FROM h1b_stats_salaries GROUP BY case_status) statuses)
+    FROM running;
+  END IF;
+
+  RETURN jsonb_build_object(
+    'rebuild', rebuild,
+    'employers', CARDINALITY(employers) + null_employer::INT,
+    'jobTitles', CARDINALITY(job_titles),
+    'states', CARDINALITY(states),
+    'days', CARDINALITY(days),
+    'salaries', CARDINALITY(salaries)
+  );
+END;
+$function$;
+
+-- ============================================================================
+-- STATISTICS FUNCTIONS
+-- ============================================================================
+
+-- Same signatures and JSON as migration 20240125, read from the rollups. Results
+-- reflect h1b_applications as of the last refresh_h1b_statistics() call.
+
+-- Unfiltered calls come from the rollups. Filters (substring matches and
+-- salary bounds) can't be answered from them and scan the table, in one
+-- statement: the original ran every aggregate as its own statement against a
+-- CTE that only the first of them could see.
+CREATE OR REPLACE FUNCTION get_h1b_statistics(
+  p_employer_filter TEXT DEFAULT NULL,
+  p_status_filter TEXT DEFAULT NULL,
+  p_job_title_filter TEXT DEFAULT NULL,
+  p_min_salary NUMERIC DEFAULT NULL,
+  p_max_salary NUMERIC DEFAULT NULL,
+  p_search_term TEXT DEFAULT NULL
+)
+RETURNS JSON
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $function$
+DECLARE
+  total_apps BIGINT;
+  avg_salary NUMERIC;
+  median_salary NUMERIC;
+  min_salary NUMERIC;
+  max_salary NUMERIC;
+  cert_rate NUMERIC;
+  top_employers JSON;
+  status_breakdown JSON;
+BEGIN
+  IF p_employer_filter IS NULL AND p_status_filter IS NULL AND p_job_title_filter IS NULL
+     AND p_min_salary IS NULL AND p_max_salary IS NULL AND p_search_term IS NULL THEN
+    SELECT
+      t.applications,
+      ROUND(t.salary_sum / NULLIF(t.applications, 0), 0),
+      ROUND(t.median_salary, 0),
+      t.min_salary,
+      t.max_salary,
+      ROUND(t.certified * 100.0 / NULLIF(t.applications, 0), 2),
+      t.statuses::JSON
+    INTO total_apps, avg_salary, median_salary, min_salary, max_salary, cert_rate, status_breakdown
+    FROM h1b_stats_totals t;
+
+    SELECT JSON_AGG(JSON_BUILD_OBJECT('name', employer_name, 'count', paid_applications)
+                    ORDER BY paid_applications DESC, employer_name)
+    INTO top_employers
+    FROM (
+      SELECT employer_name, paid_applications
+      FROM h1b_stats_employers
+      WHERE paid_applications > 0
+      ORDER BY paid_applications DESC, employer_name
+      LIMIT 10
+    ) top_emp;
+  ELSE
+    WITH filtered_data AS (
+      SELECT
+        case_status,
+        employer_name,
+        COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0) AS salary
+      FROM h1b_applications
+      WHERE
+        (p_employer_filter IS NULL OR employer_name ILIKE '%' || p_employer_filter || '%')
+        AND (p_status_filter IS NULL OR case_status = p_status_filter)
+        AND (p_job_title_filter IS NULL OR job_title ILIKE '%' || p_job_title_filter || '%')
+        AND (p_min_salary IS NULL OR COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0) >= p_min_salary)
+        AND (p_max_salary IS NULL OR COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0) <= p_max_salary)
+        AND (p_search_term IS NULL OR
+             employer_name ILIKE '%' || p_search_term || '%' OR
+             job_title ILIKE '%' || p_search_term || '%' OR
+             case_status ILIKE '%' || p_search_term || '%')
+        AND COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0) > 0 -- Exclude zero salaries
+    )
+    SELECT
+      COUNT(*),
+      ROUND(AVG(salary), 0),
+      ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY salary)::NUMERIC, 0),
+      MIN(salary),
+      MAX(salary),
+      ROUND(COUNT(*) FILTER (WHERE case_status IN ('CERTIFIED', 'CERTIFIED-WITHDRAWN'))
+            * 100.0 / NULLIF(COUNT(*), 0), 2),
+      (SELECT JSON_AGG(JSON_BUILD_OBJECT('name', employer_name, 'count', employer_count)
+                       ORDER BY employer_count DESC, employer_name)
+       FROM (SELECT employer_name, COUNT(*) AS employer_count
+             FROM filtered_data
+             WHERE employer_name IS NOT NULL AND employer_name != ''
+             GROUP BY employer_name
+             ORDER BY COUNT(*) DESC, employer_name
+             LIMIT 10) top_emp),
+      (SELECT JSON_OBJECT_AGG(status, status_count)
+       FROM (SELECT COALESCE(case_status, 'UNKNOWN') AS status, COUNT(*) AS status_count
+             FROM filtered_data
+             GROUP BY COALESCE(case_status, 'UNKNOWN')) statuses)
+    INTO total_apps, avg_salary, median_salary, min_salary, max_salary, cert_rate,
+      top_employers, status_breakdown
+    FROM filtered_data;
+  END IF;
+
+  RETURN JSON_BUILD_OBJECT(
+    'totalApplications', COALESCE(total_apps, 0),
+    'averageSalary', COALESCE(avg_salary, 0),
+    'medianSalary', COALESCE(median_salary, 0),
+    'minSalary', COALESCE(min_salary, 0),
+    'maxSalary', COALESCE(max_salary, 0),
+    'certificationRate', COALESCE(cert_rate, 0),
+    'topEmployers', COALESCE(top_employers, '[]'::JSON),
+    'statusBreakdown', COALESCE(status_breakdown, '{}'::JSON)
+  );
+END;
+$function$;
+
+CREATE OR REPLACE FUNCTION get_top_h1b_employers(
+  p_limit INTEGER DEFAULT 50,
+  p_offset INTEGER DEFAULT 0,
+  p_search_term TEXT DEFAULT NULL
+)
+RETURNS JSON
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $function$
+DECLARE
+  result JSON;
+BEGIN
+  SELECT JSON_BUILD_OBJECT(
+    'data', JSON_AGG(
+      JSON_BUILD_OBJECT(
+        'name', employer_name,
+        'count', applications,
+        'averageSalary', ROUND(salary_sum / applications, 0),
+        'certificationRate', ROUND(certified * 100.0 / applications, 2)
+      ) ORDER BY applications DESC, employer_name
+    ),
+    'totalCount', (
+      SELECT COUNT(*)
+      FROM h1b_stats_employers
+      WHERE p_search_term IS NULL OR employer_name ILIKE '%' || p_search_term || '%'
+    )
+  )
+  INTO result
+  FROM (
+    SELECT employer_name, applications, certified, salary_sum
+    FROM h1b_stats_employers
+    WHERE p_search_term IS NULL OR employer_name ILIKE '%' || p_search_term || '%'
+    ORDER BY applications DESC, employer_name
+    LIMIT p_limit OFFSET p_offset
+  ) employer_stats;
+
+  RETURN result;
+END;
+$function$;
+
+CREATE OR REPLACE FUNCTION get_h1b_salary_by_job_title(
+  p_job_title TEXT DEFAULT NULL,
+  p_limit INTEGER DEFAULT 20
+)
+RETURNS JSON
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $function$
+DECLARE
+  result JSON;
+BEGIN
+  SELECT JSON_AGG(
+    JSON_BUILD_OBJECT(
+      'jobTitle', job_title,
+      'count', applications,
+      'averageSalary', ROUND(salary_sum / applications, 0),
+      'medianSalary', ROUND(median_salary, 0),
+      'minSalary', min_salary,
+      'maxSalary', max_salary
+    ) ORDER BY applications DESC, job_title
+  )
+  INTO result
+  FROM (
+    SELECT *
+    FROM h1b_stats_job_titles
+    WHERE applications >= 5  -- Only include job titles with at least 5 records
+      AND (p_job_title IS NULL OR job_title ILIKE '%' || p_job_title || '%')
+    ORDER BY applications DESC, job_title
+    LIMIT p_limit
+  ) job_stats;
+
+  RETURN result;
+END;
+$function$;
+
+-- Periods are built from UTC received days
+CREATE OR REPLACE FUNCTION get_h1b_trends(
+  p_start_date DATE DEFAULT NULL,
+  p_end_date DATE DEFAULT NULL,
+  p_group_by TEXT DEFAULT 'month' -- 'month', 'quarter', 'year'
+)
+RETURNS JSON
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $function$
+DECLARE
+  result JSON;
+  date_format TEXT;
+BEGIN
+  -- Set date format based on grouping
+  CASE p_group_by
+    WHEN 'year' THEN date_format := 'YYYY';
+    WHEN 'quarter' THEN date_format := 'YYYY-Q';
+    ELSE date_format := 'YYYY-MM';
+  END CASE;
+
+  SELECT JSON_AGG(
+    JSON_BUILD_OBJECT(
+      'period', period,
+      'totalApplications', total_apps,
+      'certifiedApplications', certified_apps,
+      'certificationRate', ROUND(certified_apps * 100.0 / total_apps, 2),
+      'averageSalary', ROUND(salary_sum / total_apps, 0)
+    ) ORDER BY period
+  )
+  INTO result
+  FROM (
+    SELECT
+      TO_CHAR(day, date_format) AS period,
+      SUM(applications) AS total_apps,
+      SUM(certified) AS certified_apps,
+      SUM(salary_sum) AS salary_sum
+    FROM h1b_stats_days
+    WHERE (p_start_date IS NULL OR day >= p_start_date)
+      AND (p_end_date IS NULL OR day <= p_end_date)
+    GROUP BY TO_CHAR(day, date_format)
+  ) trend_data;
+
+  RETURN result;
+END;
+$function$;
+
+CREATE OR REPLACE FUNCTION get_h1b_statistics_by_state()
+RETURNS JSON
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $function$
+DECLARE
+  result JSON;
+BEGIN
+  SELECT JSON_AGG(
+    JSON_BUILD_OBJECT(
+      'state', state,
+      'totalApplications', applications,
+      'averageSalary', ROUND(salary_sum / applications, 0),
+      'certificationRate', ROUND(certified * 100.0 / applications, 2),
+      'topEmployer', top_employer
+    ) ORDER BY applications DESC, state
+  )
+  INTO result
+  FROM h1b_stats_states
+  WHERE applications >= 10;  -- Only include states with at least 10 applications
+
+  RETURN result;
+END;
+$function$;
+
+-- ============================================================================
+-- INITIAL BUILD
+-- ============================================================================
+
+-- Installs the triggers and builds the rollups if the table exists; otherwise the
+-- first refresh_h1b_statistics() call after it is created does both.
+DO $$
+BEGIN
+  IF to_regclass('h1b_applications') IS NOT NULL THEN
+    PERFORM refresh_h1b_statistics(true);
+  END IF;
+END $$;
+
+-- ============================================================================
+-- PERMISSIONS
+-- ============================================================================
+
+-- Refreshing is for the ingest pipeline only; the statistics functions keep the
+-- grants from migration 20240125
+REVOKE EXECUTE ON FUNCTION refresh_h1b_statistics(BOOLEAN) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION refresh_h1b_statistics(BOOLEAN) TO service_role;
+REVOKE EXECUTE ON FUNCTION install_h1b_statistics_tracking() FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION h1b_stats_track_changes() FROM PUBLIC;
+
+-- ============================================================================
+-- ROLLBACK STATEMENTS (for reference)
+-- ============================================================================
+
+-- DROP TRIGGER IF EXISTS h1b_stats_track_insert ON h1b_applications;
+-- DROP TRIGGER IF EXISTS h1b_stats_track_update ON h1b_applications;
+-- DROP TRIGGER IF EXISTS h1b_stats_track_delete ON h1b_applications;
+-- DROP FUNCTION IF EXISTS refresh_h1b_statistics(BOOLEAN);
+-- DROP FUNCTION IF EXISTS install_h1b_statistics_tracking();
+-- DROP FUNCTION IF EXISTS h1b_stats_track_changes();
+-- DROP FUNCTION IF EXISTS h1b_stats_keys(TEXT, TEXT, TIMESTAMPTZ, NUMERIC);
+-- DROP TABLE IF EXISTS h1b_stats_employers, h1b_stats_job_titles, h1b_stats_state_employers,
+--   h1b_stats_states, h1b_stats_days, h1b_stats_salaries, h1b_stats_totals, h1b_stats_dirty;
+-- Then re-run 20240125_create_h1b_statistics_functions_updated.sql for the table-scanning
+-- statistics functions.
@@ -0,0 +1,404 @@
+-- Migration: Keyset pagination for filtered H1B applications
+-- Date: 2026-10-20
+-- Description: get_h1b_filtered_applications_keyset, a cursor-based variant of
+-- get_h1b_filtered_applications (migration 20240126) that seeks to the next page on
+-- (sort key, id) instead of OFFSET, and only counts matches when asked to, from the
+-- planner's estimate or from a count cache that any write to h1b_applications clears
+
+-- ============================================================================
+-- COUNT CACHE
+-- ============================================================================
+
+-- Exact match counts per filter combination (keyed by the md5 of the WHERE clause)
+CREATE TABLE IF NOT EXISTS h1b_filter_counts (
+  filter_key TEXT PRIMARY KEY,
+  total BIGINT NOT NULL,
+  counted_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Only reachable through the SECURITY DEFINER functions below
+ALTER TABLE h1b_filter_counts ENABLE ROW LEVEL SECURITY;
+
+-- Statement-level trigger: any insert, update, delete or truncate makes every
+-- cached count stale
+CREATE OR REPLACE FUNCTION h1b_filter_counts_invalidate()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $function$
+BEGIN
+  DELETE FROM h1b_filter_counts;
+  RETURN NULL;
+END;
+$function$;
+
+-- Same as migration 20261019, plus the count cache trigger and the (sort key, id)
+-- indexes the keyset pages seek on
+CREATE OR REPLACE FUNCTION install_h1b_statistics_tracking()
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $function$
+BEGIN
+  CREATE INDEX IF NOT EXISTS idx_h1b_applications_received_date
+    ON h1b_applications(received_date);
+  CREATE INDEX IF NOT EXISTS idx_h1b_applications_salary_amount
+    ON h1b_applications((COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0)));
+  CREATE INDEX IF NOT EXISTS idx_h1b_applications_received_date_id
+    ON h1b_applications((COALESCE(received_date, '-infinity'::TIMESTAMPTZ)), id);
+  CREATE INDEX IF NOT EXISTS idx_h1b_applications_salary_amount_id
+    ON h1b_applications((COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0)), id);
+
+  -- Transition tables need one trigger per event
+  DROP TRIGGER IF EXISTS h1b_stats_track_insert ON h1b_applications;
+  DROP TRIGGER IF EXISTS h1b_stats_track_update ON h1b_applications;
+  DROP TRIGGER IF EXISTS h1b_stats_track_delete ON h1b_applications;
+  CREATE TRIGGER h1b_stats_track_insert AFTER INSERT ON h1b_applications
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION h1b_stats_track_changes();
+  CREATE TRIGGER h1b_stats_track_update AFTER UPDATE ON h1b_applications
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION h1b_stats_track_changes();
+  CREATE TRIGGER h1b_stats_track_delete AFTER DELETE ON h1b_applications
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION h1b_stats_track_changes();
+
+  DROP TRIGGER IF EXISTS h1b_filter_counts_invalidate ON h1b_applications;
+  CREATE TRIGGER h1b_filter_counts_invalidate
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON h1b_applications
+    FOR EACH STATEMENT EXECUTE FUNCTION h1b_filter_counts_invalidate();
+END;
+$function$;
+
+-- ============================================================================
+-- FILTER CONDITIONS
+-- ============================================================================
+
+-- The WHERE clause get_h1b_filtered_applications builds from its filters, as
+-- text (TRUE when there are none). Values are quoted, so the result is safe to
+-- splice into dynamic SQL.
+CREATE OR REPLACE FUNCTION h1b_filter_conditions(
+  filter_employer TEXT,
+  filter_status TEXT,
+  filter_job_title TEXT,
+  filter_min_salary NUMERIC,
+  filter_max_salary NUMERIC,
+  filter_search_term TEXT
+)
+RETURNS TEXT
+LANGUAGE plpgsql
+IMMUTABLE
+AS $function$
+DECLARE
+  where_conditions TEXT[] := ARRAY[]::TEXT[];
+BEGIN
+  IF filter_employer IS NOT NULL THEN
+    where_conditions := array_append(where_conditions,
+      'employer_name ILIKE ' || quote_literal('%' || filter_employer || '%'));
+  END IF;
+
+  IF filter_status IS NOT NULL THEN
+    where_conditions := array_append(where_conditions,
+      'case_status = ' || quote_literal(filter_status));
+  END IF;
+
+  IF filter_job_title IS NOT NULL THEN
+    where_conditions := array_append(where_conditions,
+      'job_title ILIKE ' || quote_literal('%' || filter_job_title || '%'));
+  END IF;
+
+  IF filter_min_salary IS NOT NULL THEN
+    where_conditions := array_append(where_conditions,
+      'COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0) >= ' || filter_min_salary);
+  END IF;
+
+  IF filter_max_salary IS NOT NULL THEN
+    where_conditions := array_append(where_conditions,
+      'COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0) <= ' || filter_max_salary);
+  END IF;
+
+  IF filter_search_term IS NOT NULL THEN
+    where_conditions := array_append(where_conditions,
+      '(employer_name ILIKE ' || quote_literal('%' || filter_search_term || '%') ||
+      ' OR job_title ILIKE ' || quote_literal('%' || filter_search_term || '%') ||
+      ' OR case_number ILIKE ' || quote_literal('%' || filter_search_term || '%') || ')');
+  END IF;
+
+  IF array_length(where_conditions, 1) > 0 THEN
+    RETURN array_to_string(where_conditions, ' AND ');
+  END IF;
+  RETURN 'TRUE';
+END;
+$function$;
+
+-- ============================================================================
+-- KEYSET PAGINATION FUNCTION
+-- ============================================================================
+
+-- Takes the same filters as get_h1b_filtered_applications. Instead of a page
+-- number it takes the `cursor` returned as pagination.nextCursor by the previous
+-- page (NULL for the first page), and the page is found by seeking the
+-- (sort key, id) index past it, so page 5,000 costs what page 1 does. Clients
+-- that offer "previous" keep the cursors they have already used.
+--
+-- sort_by: 'id' (newest first by default, as get_h1b_filtered_applications
+-- orders), 'receivedDate' (no date sorts before every date) or 'salary'
+-- (COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0)); sort_order 'desc'
+-- or 'asc'.
+--
+-- count_mode:
+--   'none'      - no count (default); hasNextPage comes from fetching one extra row
+--   'estimated' - the planner's row estimate for the filters, no scan
+--   'exact'     - COUNT(*), cached per filter combination until the next write
+--                 to h1b_applications
+CREATE OR REPLACE FUNCTION get_h1b_filtered_applications_keyset(
+  filters JSON DEFAULT '{}',
+  page_size INTEGER DEFAULT 20,
+  cursor JSON DEFAULT NULL,
+  sort_by TEXT DEFAULT 'id',
+  sort_order TEXT DEFAULT 'desc',
+  count_mode TEXT DEFAULT 'none'
+)
+RETURNS JSON
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $function$
+DECLARE
+  result JSON;
+  has_next BOOLEAN;
+  last_key TEXT;
+  last_id BIGINT;
+  total_count BIGINT;
+  plan JSON;
+  where_clause TEXT;
+  sort_expr TEXT;
+  sort_type TEXT;
+  seek_condition TEXT := '';
+  order_clause TEXT;
+  query_text TEXT;
+
+  -- Filter variables
+  filter_employer TEXT;
+  filter_status TEXT;
+  filter_job_title TEXT;
+  filter_min_salary NUMERIC;
+  filter_max_salary NUMERIC;
+  filter_search_term TEXT;
+BEGIN
+  -- Input validation
+  IF page_size IS NULL OR page_size <= 0 THEN
+    page_size := 20;
+  END IF;
+
+  IF page_size > 100 THEN
+    page_size := 100;
+  END IF;
+
+  sort_order := LOWER(COALESCE(sort_order, 'desc'));
+  count_mode := COALESCE(count_mode, 'none');
+  CASE COALESCE(sort_by, 'id')
+    WHEN 'id' THEN
+      sort_expr := 'id';
+      sort_type := 'BIGINT';
+    WHEN 'receivedDate' THEN
+      sort_expr := 'COALESCE(received_date, ''-infinity''::TIMESTAMPTZ)';
+      sort_type := 'TIMESTAMPTZ';
+    WHEN 'salary' THEN
+      sort_expr := 'COALESCE(wage_rate_of_pay_from, wage_rate_of_pay_to, 0)';
+      sort_type := 'NUMERIC';
+    ELSE
+      RETURN JSON_BUILD_OBJECT(
+        'error', true,
+        'message', 'Unknown sort_by: ' || sort_by,
+        'code', 'INVALID_SORT'
+      );
+  END CASE;
+
+  IF sort_order NOT IN ('asc', 'desc') OR count_mode NOT IN ('none', 'estimated', 'exact') THEN
+    RETURN JSON_BUILD_OBJECT(
+      'error', true,
+      'message', 'sort_order must be asc or desc, count_mode none, estimated or exact',
+      'code', 'INVALID_PAGINATION'
+    );
+  END IF;
+
+  -- Extract filter values from JSON
+  BEGIN
+    filter_employer := NULLIF(TRIM(filters->>'employer'), '');
+    filter_status := NULLIF(TRIM(filters->>'status'), '');
+    filter_job_title := NULLIF(TRIM(filters->>'jobTitle'), '');
+    filter_search_term := NULLIF(TRIM(filters->>'searchTerm'), '');
+
+    IF (filters->>'minSalary') IS NOT NULL AND (filters->>'minSalary') != '' THEN
+      filter_min_salary := (filters->>'minSalary')::NUMERIC;
+    END IF;
+
+    IF (filters->>'maxSalary') IS NOT NULL AND (filters->>'maxSalary') != '' THEN
+      filter_max_salary := (filters->>'maxSalary')::NUMERIC;
+    END IF;
+
+  EXCEPTION
+    WHEN OTHERS THEN
+      RETURN JSON_BUILD_OBJECT(
+        'error', true,
+        'message', 'Invalid filter parameters',
+        'code', 'INVALID_FILTERS'
+      );
+  END;
+
+  -- Validate salary range
+  IF filter_min_salary IS NOT NULL AND filter_max_salary IS NOT NULL THEN
+    IF filter_min_salary > filter_max_salary THEN
+      RETURN JSON_BUILD_OBJECT(
+        'error', true,
+        'message', 'Minimum salary cannot be greater than maximum salary',
+        'code', 'INVALID_SALARY_RANGE'
+      );
+    END IF;
+  END IF;
+
+  where_clause := h1b_filter_conditions(filter_employer, filter_status, filter_job_title,
+                                        filter_min_salary, filter_max_salary, filter_search_term);
+
+  -- Seek past the cursor: a row comparison, which the (sort key, id) index serves
+  IF cursor IS NOT NULL THEN
+    BEGIN
+      last_id := (cursor->>'id')::BIGINT;
+      last_key := cursor->>'key';
+      IF last_id IS NULL OR (sort_expr != 'id' AND last_key IS NULL) THEN
+        RAISE EXCEPTION 'incomplete cursor';
+      END IF;
+      IF sort_expr = 'id' THEN
+        seek_condition := format(' AND id %s %s', CASE sort_order WHEN 'desc' THEN '<' ELSE '>' END,
+                                 last_id);
+      ELSE
+        seek_condition := format(' AND (%s, id) %s (%s::%s, %s)', sort_expr,
+                                 CASE sort_order WHEN 'desc' THEN '<' ELSE '>' END,
+                                 quote_literal(last_key), sort_type, last_id);
+        EXECUTE format('SELECT %s::%s', quote_literal(last_key), sort_type);
+      END IF;
+    EXCEPTION
+      WHEN OTHERS THEN
+        RETURN JSON_BUILD_OBJECT(
+          'error', true,
+          'message', 'Invalid cursor',
+          'code', 'INVALID_CURSOR'
+        );
+    END;
+  END IF;
+
+  order_clause := CASE sort_expr WHEN 'id' THEN 'id ' || sort_order
+                  ELSE sort_expr || ' ' || sort_order || ', id ' || sort_order END;
+
+  -- One row past the page tells whether there is a next page
+  query_text := '
+    SELECT
+      JSON_AGG(item ORDER BY ordinal) FILTER (WHERE ordinal <= ' || page_size || '),
+      COUNT(*) > ' || page_size || ',
+      MAX(sort_key) FILTER (WHERE ordinal = ' || page_size || '),
+      MAX(id) FILTER (WHERE ordinal = ' || page_size || ')
+    FROM (
+      SELECT
+        id,
+        ' || sort_expr || '::TEXT AS sort_key,
+        ROW_NUMBER() OVER (ORDER BY ' || order_clause || ') AS ordinal,
+        JSON_BUILD_OBJECT(
+          ''id'', id,
+          ''case_number'', case_number,
+          ''case_status'', case_status,
+          ''job_title'', job_title,
+          ''employer_name'', employer_name,
+          ''wage_rate_of_pay_from'', wage_rate_of_pay_from,
+          ''wage_rate_of_pay_to'', wage_rate_of_pay_to,
+          ''received_date'', received_date,
+          ''decision_date'', decision_date,
+          ''employer_city'', employer_city,
+          ''employer_state'', employer_state,
+          ''worksite_city'', worksite_city,
+          ''worksite_state'', worksite_state
+        ) AS item
+      FROM h1b_applications
+      WHERE ' || where_clause || seek_condition || '
+      ORDER BY ' || order_clause || '
+      LIMIT ' || (page_size + 1) || '
+    ) page_rows';
+
+  EXECUTE query_text INTO result, has_next, last_key, last_id;
+
+  IF count_mode = 'estimated' THEN
+    EXECUTE 'EXPLAIN (FORMAT JSON) SELECT 1 FROM h1b_applications WHERE ' || where_clause
+      INTO plan;
+    total_count := (plan->0->'Plan'->>'Plan Rows')::NUMERIC::BIGINT;
+  ELSIF count_mode = 'exact' THEN
+    SELECT c.total INTO total_count
+    FROM h1b_filter_counts c
+    WHERE c.filter_key = MD5(where_clause);
+    IF total_count IS NULL THEN
+      EXECUTE 'SELECT COUNT(*) FROM h1b_applications WHERE ' || where_clause INTO total_count;
+      INSERT INTO h1b_filter_counts (filter_key, total)
+      VALUES (MD5(where_clause), total_count)
+      ON CONFLICT (filter_key) DO UPDATE SET total = EXCLUDED.total, counted_at = NOW();
+    END IF;
+  END IF;
+
+  -- Build response
+  RETURN JSON_BUILD_OBJECT(
+    'data', COALESCE(result, '[]'::JSON),
+    'pagination', JSON_BUILD_OBJECT(
+      'pageSize', page_size,
+      'sortBy', COALESCE(sort_by, 'id'),
+      'sortOrder', sort_order,
+      'hasNextPage', has_next,
+      'hasPreviousPage', cursor IS NOT NULL,
+      'nextCursor', CASE WHEN has_next THEN
+        JSON_BUILD_OBJECT('key', CASE WHEN sort_expr != 'id' THEN last_key END, 'id', last_id)
+      END,
+      'totalRecords', total_count,
+      'totalIsEstimate', count_mode = 'estimated'
+    )
+  );
+
+EXCEPTION
+  WHEN OTHERS THEN
+    RETURN JSON_BUILD_OBJECT(
+      'error', true,
+      'message', 'Failed to retrieve filtered applications',
+      'code', 'FILTER_QUERY_ERROR',
+      'details', SQLERRM
+    );
+END;
+$function$;
+
+-- ============================================================================
+-- INSTALL
+-- ============================================================================
+
+-- Tables created after this migration get the trigger and indexes from the
+-- first refresh_h1b_statistics() call, as in migration 20261019
+DO $$
+BEGIN
+  IF to_regclass('h1b_applications') IS NOT NULL THEN
+    PERFORM install_h1b_statistics_tracking();
+  END IF;
+END $$;
+
+-- ============================================================================
+-- PERMISSIONS
+-- ============================================================================
+
+GRANT EXECUTE ON FUNCTION get_h1b_filtered_applications_keyset(JSON, INTEGER, JSON, TEXT, TEXT, TEXT)
+  TO authenticated;
+REVOKE EXECUTE ON FUNCTION h1b_filter_counts_invalidate() FROM PUBLIC;
+
+-- ============================================================================
+-- ROLLBACK STATEMENTS (for reference)
+-- ============================================================================
+
+-- DROP TRIGGER IF EXISTS h1b_filter_counts_invalidate ON h1b_applications;
+-- DROP FUNCTION IF EXISTS get_h1b_filtered_applications_keyset(JSON, INTEGER, JSON, TEXT, TEXT, TEXT);
+-- DROP FUNCTION IF EXISTS h1b_filter_conditions(TEXT, TEXT, TEXT, NUMERIC, NUMERIC, TEXT);
+-- DROP FUNCTION IF EXISTS h1b_filter_counts_invalidate();
+-- DROP TABLE IF EXISTS h1b_filter_counts;
+-- DROP INDEX IF EXISTS idx_h1b_applications_received_date_id;
+-- DROP INDEX IF EXISTS idx_h1b_applications_salary_amount_id;
+-- Then re-run install_h1b_statistics_tracking() from migration 20261019.
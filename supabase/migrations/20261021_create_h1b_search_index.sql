@@ -0,0 +1,189 @@
+-- Migration: Trigram search indexes for H1B employer, job title and free-text filters
+-- Date: 2026-10-21
+-- Description: pg_trgm GIN indexes on employer_name, job_title and case_number. The
+-- employer, jobTitle and searchTerm filters of get_h1b_filtered_applications and
+-- get_h1b_filtered_applications_keyset keep their ILIKE '%...%' semantics (text inside
+-- a word still matches: 'soft' finds Microsoft) and are served from these indexes
+-- instead of scanning the table
+
+-- ============================================================================
+-- EXTENSIONS
+-- ============================================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ============================================================================
+-- SEARCH INDEXES
+-- ============================================================================
+
+-- ILIKE '%term%' uses these for terms of three characters or more. searchTerm ORs
+-- the three columns, which Postgres answers with a BitmapOr over the three indexes.
+-- Building them reads the table once; it isn't rewritten.
+DO $$
+BEGIN
+  IF to_regclass('h1b_applications') IS NOT NULL THEN
+    CREATE INDEX IF NOT EXISTS idx_h1b_applications_employer_name_trgm
+      ON h1b_applications USING GIN (employer_name gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS idx_h1b_applications_job_title_trgm
+      ON h1b_applications USING GIN (job_title gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS idx_h1b_applications_case_number_trgm
+      ON h1b_applications USING GIN (case_number gin_trgm_ops);
+    ANALYZE h1b_applications;
+  END IF;
+END $$;
+
+-- ============================================================================
+-- COMPREHENSIVE FILTERING FUNCTION
+-- ============================================================================
+
+-- Migration 20240126's function, with its WHERE clause from h1b_filter_conditions
+-- (migration 20261020), so both filter functions match rows the same way
+CREATE OR REPLACE FUNCTION get_h1b_filtered_applications(
+  filters JSON DEFAULT '{}',
+  page_size INTEGER DEFAULT 20,
+  page_number INTEGER DEFAULT 1
+)
+RETURNS JSON
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $function$
+DECLARE
+  result JSON;
+  total_count INTEGER;
+  offset_count INTEGER;
+  where_clause TEXT;
+  query_text TEXT;
+
+  -- Filter variables
+  filter_employer TEXT;
+  filter_status TEXT;
+  filter_job_title TEXT;
+  filter_min_salary NUMERIC;
+  filter_max_salary NUMERIC;
+  filter_search_term TEXT;
+BEGIN
+  -- Input validation
+  IF page_size IS NULL OR page_size <= 0 THEN
+    page_size := 20;
+  END IF;
+
+  IF page_size > 100 THEN
+    page_size := 100;
+  END IF;
+
+  IF page_number IS NULL OR page_number <= 0 THEN
+    page_number := 1;
+  END IF;
+
+  -- Calculate offset
+  offset_count := (page_number - 1) * page_size;
+
+  -- Extract filter values from JSON
+  BEGIN
+    filter_employer := NULLIF(TRIM(filters->>'employer'), '');
+    filter_status := NULLIF(TRIM(filters->>'status'), '');
+    filter_job_title := NULLIF(TRIM(filters->>'jobTitle'), '');
+    filter_search_term := NULLIF(TRIM(filters->>'searchTerm'), '');
+
+    IF (filters->>'minSalary') IS NOT NULL AND (filters->>'minSalary') != '' THEN
+      filter_min_salary := (filters->>'minSalary')::NUMERIC;
+    END IF;
+
+    IF (filters->>'maxSalary') IS NOT NULL AND (filters->>'maxSalary') != '' THEN
+      filter_max_salary := (filters->>'maxSalary')::NUMERIC;
+    END IF;
+
+  EXCEPTION
+    WHEN OTHERS THEN
+      RETURN JSON_BUILD_OBJECT(
+        'error', true,
+        'message', 'Invalid filter parameters',
+        'code', 'INVALID_FILTERS'
+      );
+  END;
+
+  -- Validate salary range
+  IF filter_min_salary IS NOT NULL AND filter_max_salary IS NOT NULL THEN
+    IF filter_min_salary > filter_max_salary THEN
+      RETURN JSON_BUILD_OBJECT(
+        'error', true,
+        'message', 'Minimum salary cannot be greater than maximum salary',
+        'code', 'INVALID_SALARY_RANGE'
+      );
+    END IF;
+  END IF;
+
+  where_clause := 'WHERE ' || h1b_filter_conditions(filter_employer, filter_status, filter_job_title,
+                                                    filter_min_salary, filter_max_salary,
+                                                    filter_search_term);
+
+  -- Get total count
+  query_text := 'SELECT COUNT(*) FROM h1b_applications ' || where_clause;
+  EXECUTE query_text INTO total_count;
+
+  -- Get filtered data
+  query_text := '
+    SELECT JSON_AGG(
+      JSON_BUILD_OBJECT(
+        ''id'', id,
+        ''case_number'', case_number,
+        ''case_status'', case_status,
+        ''job_title'', job_title,
+        ''employer_name'', employer_name,
+        ''wage_rate_of_pay_from'', wage_rate_of_pay_from,
+        ''wage_rate_of_pay_to'', wage_rate_of_pay_to,
+        ''received_date'', received_date,
+        ''decision_date'', decision_date,
+        ''employer_city'', employer_city,
+        ''employer_state'', employer_state,
+        ''worksite_city'', worksite_city,
+        ''worksite_state'', worksite_state
+      ) ORDER BY id DESC
+    )
+    FROM (
+      SELECT *
+      FROM h1b_applications ' || where_clause || '
+      ORDER BY id DESC
+      LIMIT ' || page_size || ' OFFSET ' || offset_count || '
+    ) filtered_data';
+
+  EXECUTE query_text INTO result;
+
+  -- Build response
+  RETURN JSON_BUILD_OBJECT(
+    'data', COALESCE(result, '[]'::JSON),
+    'pagination', JSON_BUILD_OBJECT(
+      'totalRecords', total_count,
+      'totalPages', CEIL(total_count::NUMERIC / page_size),
+      'currentPage', page_number,
+      'pageSize', page_size,
+      'hasNextPage', (page_number * page_size) < total_count,
+      'hasPreviousPage', page_number > 1
+    )
+  );
+
+EXCEPTION
+  WHEN OTHERS THEN
+    RETURN JSON_BUILD_OBJECT(
+      'error', true,
+      'message', 'Failed to retrieve filtered applications',
+      'code', 'FILTER_QUERY_ERROR',
+      'details', SQLERRM
+    );
+END;
+$function$;
+
+-- ============================================================================
+-- PERMISSIONS
+-- ============================================================================
+
+GRANT EXECUTE ON FUNCTION get_h1b_filtered_applications(JSON, INTEGER, INTEGER) TO authenticated;
+
+-- ============================================================================
+-- ROLLBACK STATEMENTS (for reference)
+-- ============================================================================
+
+-- Re-run get_h1b_filtered_applications from migration 20240126, then:
+-- DROP INDEX IF EXISTS idx_h1b_applications_employer_name_trgm;
+-- DROP INDEX IF EXISTS idx_h1b_applications_job_title_trgm;
+-- DROP INDEX IF EXISTS idx_h1b_applications_case_number_trgm;
@@ -0,0 +1,868 @@
+-- Migration: Annualized H1B wages
+-- Date: 2026-10-22
+-- Description: annual_wage_from, annual_wage_to and annual_prevailing_wage, the wages
+-- converted to a yearly amount from their unit of pay (Hour, Week, Bi-Weekly, Month or
+-- Year). The uploaders compute them at ingest (annualize_wage in
+-- supabase/scripts/upload_to_supabase.py); existing rows are backfilled here. Salary
+-- filters, sorting and the statistics rollups move from COALESCE(wage_rate_of_pay_from,
+-- wage_rate_of_pay_to, 0), which mixed hourly and yearly amounts, to the indexed
+-- COALESCE(annual_wage_from, annual_wage_to, 0).
+
+-- ============================================================================
+-- ANNUALIZATION
+-- ============================================================================
+
+-- Same conversion as annualize_wage() in upload_to_supabase.py: DOL's 2080-hour
+-- year, NULL for an unknown unit
+CREATE OR REPLACE FUNCTION h1b_annualize_wage(wage NUMERIC, unit TEXT)
+RETURNS NUMERIC
+LANGUAGE sql
+IMMUTABLE
+AS $function$
+  SELECT ROUND(wage * CASE LOWER(TRIM(unit))
+    WHEN 'hour' THEN 2080
+    WHEN 'week' THEN 52
+    WHEN 'bi-weekly' THEN 26
+    WHEN 'month' THEN 12
+    WHEN 'year' THEN 1
+  END, 2);
+$function$;
+
+-- ============================================================================
+-- UPSERT FUNCTION
+-- ============================================================================
+
+-- Same as migration 20261017, also writing pw_unit_of_pay and the annual wages
+CREATE OR REPLACE FUNCTION upsert_h1b_applications(records JSONB, merge_policy TEXT DEFAULT 'skip')
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $function$
+DECLARE
+  inserted_count BIGINT := 0;
+  updated_count BIGINT := 0;
+  invalid_count BIGINT := 0;
+  duplicate_count BIGINT := 0;
+BEGIN
+  IF merge_policy IS NULL OR merge_policy NOT IN ('skip', 'overwrite', 'changed') THEN
+    RAISE EXCEPTION 'Unknown merge_policy: %', merge_policy;
+  END IF;
+
+  SELECT
+    COUNT(*) FILTER (WHERE r.case_number IS NULL),
+    COUNT(r.case_number) - COUNT(DISTINCT r.case_number)
+  INTO invalid_count, duplicate_count
+  FROM jsonb_to_recordset(records) AS r(case_number TEXT);
+
+  WITH incoming AS (
+    -- Last occurrence wins when a batch repeats a case number
+    SELECT DISTINCT ON (r.case_number) r.*
+    FROM jsonb_populate_recordset(NULL::h1b_applications, records) WITH ORDINALITY AS r
+    WHERE r.case_number IS NOT NULL
+    ORDER BY r.case_number, r.ordinality DESC
+  ),
+  merged AS (
+    INSERT INTO h1b_applications AS t (
+      case_number, case_status, received_date, decision_date, visa_class,
+      job_title, soc_code, soc_title, full_time_position, begin_date, end_date,
+      employer_name, employer_city, employer_state, employer_postal_code,
+      worksite_city, worksite_state, worksite_postal_code,
+      wage_rate_of_pay_from, wage_rate_of_pay_to, wage_unit_of_pay, prevailing_wage,
+      pw_unit_of_pay, annual_wage_from, annual_wage_to, annual_prevailing_wage
+    )
+    SELECT
+      case_number, case_status, received_date, decision_date, visa_class,
+      job_title, soc_code, soc_title, full_time_position, begin_date, end_date,
+      employer_name, employer_city, employer_state, employer_postal_code,
+      worksite_city, worksite_state, worksite_postal_code,
+      wage_rate_of_pay_from, wage_rate_of_pay_to, wage_unit_of_pay, prevailing_wage,
+      pw_unit_of_pay, annual_wage_from, annual_wage_to, annual_prevailing_wage
+    FROM incoming
+    ON CONFLICT (case_number) DO UPDATE SET
+      case_status = EXCLUDED.case_status,
+      received_date = EXCLUDED.received_date,
+      decision_date = EXCLUDED.decision_date,
+      visa_class = EXCLUDED.visa_class,
+      job_title = EXCLUDED.job_title,
+      soc_code = EXCLUDED.soc_code,
+      soc_title = EXCLUDED.soc_title,
+      full_time_position = EXCLUDED.full_time_position,
+      begin_date = EXCLUDED.begin_date,
+      end_date = EXCLUDED.end_date,
+      employer_name = EXCLUDED.employer_name,
+      employer_city = EXCLUDED.employer_city,
+      employer_state = EXCLUDED.employer_state,
+      employer_postal_code = EXCLUDED.employer_postal_code,
+      worksite_city = EXCLUDED.worksite_city,
+      worksite_state = EXCLUDED.worksite_state,
+      worksite_postal_code = EXCLUDED.worksite_postal_code,
+      wage_rate_of_pay_from = EXCLUDED.wage_rate_of_pay_from,
+      wage_rate_of_pay_to = EXCLUDED.wage_rate_of_pay_to,
+      wage_unit_of_pay = EXCLUDED.wage_unit_of_pay,
+      prevailing_wage = EXCLUDED.prevailing_wage,
+      pw_unit_of_pay = EXCLUDED.pw_unit_of_pay,
+      annual_wage_from = EXCLUDED.annual_wage_from,
+      annual_wage_to = EXCLUDED.annual_wage_to,
+      annual_prevailing_wage = EXCLUDED.annual_prevailing_wage,
+      updated_at = NOW()
+    WHERE merge_policy = 'overwrite'
+      OR (merge_policy = 'changed' AND (
+        t.case_status, t.received_date, t.decision_date, t.visa_class,
+        t.job_title, t.soc_code, t.soc_title, t.full_time_position, t.begin_date, t.end_date,
+        t.employer_name, t.employer_city, t.employer_state, t.employer_postal_code,
+        t.worksite_city, t.worksite_state, t.worksite_postal_code,
+        t.wage_rate_of_pay_from, t.wage_rate_of_pay_to, t.wage_unit_of_pay, t.prevailing_wage,
+        t.pw_unit_of_pay, t.annual_wage_from, t.annual_wage_to, t.annual_prevailing_wage
+      ) IS DISTINCT FROM (
+        EXCLUDED.case_status, EXCLUDED.received_date, EXCLUDED.decision_date, EXCLUDED.visa_class,
+        EXCLUDED.job_title, EXCLUDED.soc_code, EXCLUDED.soc_title, EXCLUDED.full_time_position,
+        EXCLUDED.begin_date, EXCLUDED.end_date,
+        EXCLUDED.employer_name, EXCLUDED.employer_city, EXCLUDED.employer_state,
+        EXCLUDED.employer_postal_code,
+        EXCLUDED.worksite_city, EXCLUDED.worksite_state, EXCLUDED.worksite_postal_code,
+        EXCLUDED.wage_rate_of_pay_from, EXCLUDED.wage_rate_of_pay_to, EXCLUDED.wage_unit_of_pay,
+        EXCLUDED.prevailing_wage, EXCLUDED.pw_unit_of_pay,
+        EXCLUDED.annual_wage_from, EXCLUDED.annual_wage_to, EXCLUDED.annual_prevailing_wage
+      ))
+    RETURNING (xmax = 0) AS inserted
+  )
+  SELECT
+    COUNT(*) FILTER (WHERE inserted),
+    COUNT(*) FILTER (WHERE NOT inserted)
+  INTO inserted_count, updated_count
+  FROM merged;
+
+  RETURN jsonb_build_object(
+    'inserted', inserted_count,
+    'updated', updated_count,
+    'unchanged', jsonb_array_length(records) - invalid_count - duplicate_count
+                 - inserted_count - updated_count,
+    'skipped_invalid', invalid_count,
+    'duplicates', duplicate_count
+  );
+END;
+$function$;
+
+-- ============================================================================
+-- CHANGE TRACKING
+-- ============================================================================
+
+-- Same as migration 20261019, keyed on the annualized salary
+CREATE OR REPLACE FUNCTION h1b_stats_track_changes()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $function$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO h1b_stats_dirty (dimension, key)
+    SELECT DISTINCT k.dimension, k.key
+    FROM new_rows r,
+      h1b_stats_keys(r.employer_name, r.job_title, r.received_date,
+                     COALESCE(r.annual_wage_from, r.annual_wage_to, 0)) k
+    ON CONFLICT DO NOTHING;
+  ELSIF TG_OP = 'DELETE' THEN
+    INSERT INTO h1b_stats_dirty (dimension, key)
+    SELECT DISTINCT k.dimension, k.key
+    FROM old_rows r,
+      h1b_stats_keys(r.employer_name, r.job_title, r.received_date,
+                     COALESCE(r.annual_wage_from, r.annual_wage_to, 0)) k
+    ON CONFLICT DO NOTHING;
+  ELSE
+    INSERT INTO h1b_stats_dirty (dimension, key)
+    SELECT DISTINCT k.dimension, k.key
+    FROM old_rows o
+    JOIN new_rows n ON n.id = o.id
+    CROSS JOIN LATERAL (VALUES
+      (o.employer_name, o.job_title, o.received_date,
+       COALESCE(o.annual_wage_from, o.annual_wage_to, 0)),
+      (n.employer_name, n.job_title, n.received_date,
+       COALESCE(n.annual_wage_from, n.annual_wage_to, 0))
+    ) AS r(employer_name, job_title, received_date, salary),
+      h1b_stats_keys(r.employer_name, r.job_title, r.received_date, r.salary) k
+    WHERE (o.case_status, o.employer_name, o.job_title, o.worksite_state, o.employer_state,
+           o.received_date, o.annual_wage_from, o.annual_wage_to)
+      IS DISTINCT FROM
+          (n.case_status, n.employer_name, n.job_title, n.worksite_state, n.employer_state,
+           n.received_date, n.annual_wage_from, n.annual_wage_to)
+    ON CONFLICT DO NOTHING;
+  END IF;
+  RETURN NULL;
+END;
+$function$;
+
+-- Same as migration 20261020, with the salary index on the annualized salary
+CREATE OR REPLACE FUNCTION install_h1b_statistics_tracking()
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $function$
+BEGIN
+  CREATE INDEX IF NOT EXISTS idx_h1b_applications_received_date
+    ON h1b_applications(received_date);
+  CREATE INDEX IF NOT EXISTS idx_h1b_applications_received_date_id
+    ON h1b_applications((COALESCE(received_date, '-infinity'::TIMESTAMPTZ)), id);
+  CREATE INDEX IF NOT EXISTS idx_h1b_applications_annual_salary_id
+    ON h1b_applications((COALESCE(annual_wage_from, annual_wage_to, 0)), id);
+
+  -- Transition tables need one trigger per event
+  DROP TRIGGER IF EXISTS h1b_stats_track_insert ON h1b_applications;
+  DROP TRIGGER IF EXISTS h1b_stats_track_update ON h1b_applications;
+  DROP TRIGGER IF EXISTS h1b_stats_track_delete ON h1b_applications;
+  CREATE TRIGGER h1b_stats_track_insert AFTER INSERT ON h1b_applications
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION h1b_stats_track_changes();
+  CREATE TRIGGER h1b_stats_track_update AFTER UPDATE ON h1b_applications
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION h1b_stats_track_changes();
+  CREATE TRIGGER h1b_stats_track_delete AFTER DELETE ON h1b_applications
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION h1b_stats_track_changes();
+
+  DROP TRIGGER IF EXISTS h1b_filter_counts_invalidate ON h1b_applications;
+  CREATE TRIGGER h1b_filter_counts_invalidate
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON h1b_applications
+    FOR EACH STATEMENT EXECUTE FUNCTION h1b_filter_counts_invalidate();
+END;
+$function$;
+
+-- ============================================================================
+-- REFRESH FUNCTION
+-- ============================================================================
+
+-- Same as migration 20261019; salary is now COALESCE(annual_wage_from,
+-- annual_wage_to, 0), so sums, medians and the salary histogram compare yearly
+-- amounts
+CREATE OR REPLACE FUNCTION refresh_h1b_statistics(rebuild BOOLEAN DEFAULT false)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $function$
+DECLARE
+  employers TEXT[];
+  null_employer BOOLEAN;
+  job_titles TEXT[];
+  days DATE[];
+  salaries NUMERIC[];
+  states TEXT[];
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('refresh_h1b_statistics'));
+
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_trigger
+    WHERE tgrelid = 'h1b_applications'::REGCLASS AND tgname = 'h1b_stats_track_insert'
+  ) THEN
+    PERFORM install_h1b_statistics_tracking();
+    rebuild := true;
+  END IF;
+
+  IF rebuild THEN
+    DELETE FROM h1b_stats_employers;
+    DELETE FROM h1b_stats_job_titles;
+    DELETE FROM h1b_stats_state_employers;
+    DELETE FROM h1b_stats_states;
+    DELETE FROM h1b_stats_days;
+    DELETE FROM h1b_stats_salaries;
+    DELETE FROM h1b_stats_totals;
+    INSERT INTO h1b_stats_dirty (dimension, key)
+    SELECT DISTINCT k.dimension, k.key
+    FROM h1b_applications a,
+      h1b_stats_keys(a.employer_name, a.job_title, a.received_date,
+                     COALESCE(a.annual_wage_from, a.annual_wage_to, 0)) k
+    ON CONFLICT DO NOTHING;
+  END IF;
+
+  WITH claimed AS (
+    DELETE FROM h1b_stats_dirty RETURNING dimension, key
+  )
+  SELECT
+    COALESCE(ARRAY_AGG(key) FILTER (WHERE dimension = 'employer' AND key IS NOT NULL), '{}'),
+    COALESCE(BOOL_OR(dimension = 'employer' AND key IS NULL), false),
+    COALESCE(ARRAY_AGG(key) FILTER (WHERE dimension = 'job_title'), '{}'),
+    COALESCE(ARRAY_AGG(key::DATE) FILTER (WHERE dimension = 'day'), '{}'),
+    COALESCE(ARRAY_AGG(key::NUMERIC) FILTER (WHERE dimension = 'salary'), '{}')
+  INTO employers, null_employer, job_titles, days, salaries
+  FROM claimed;
+
+  -- Employers
+  DELETE FROM h1b_stats_employers WHERE employer_name = ANY(employers);
+  INSERT INTO h1b_stats_employers
+  SELECT
+    employer_name,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE case_status IN ('CERTIFIED', 'CERTIFIED-WITHDRAWN')),
+    SUM(COALESCE(annual_wage_from, annual_wage_to, 0)),
+    COUNT(*) FILTER (WHERE COALESCE(annual_wage_from, annual_wage_to, 0) > 0)
+  FROM h1b_applications
+  WHERE employer_name = ANY(employers) AND employer_name != ''
+  GROUP BY employer_name;
+
+  -- States: the refreshed employers' states, before and after the refresh
+  states := ARRAY(
+    SELECT state FROM h1b_stats_state_employers
+    WHERE employer_name = ANY(employers) OR (null_employer AND employer_name IS NULL)
+  );
+  DELETE FROM h1b_stats_state_employers
+  WHERE employer_name = ANY(employers) OR (null_employer AND employer_name IS NULL);
+  INSERT INTO h1b_stats_state_employers
+  SELECT
+    COALESCE(worksite_state, employer_state),
+    employer_name,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE case_status IN ('CERTIFIED', 'CERTIFIED-WITHDRAWN')),
+    SUM(COALESCE(annual_wage_from, annual_wage_to, 0))
+  FROM h1b_applications
+  WHERE (employer_name = ANY(employers) OR (null_employer AND employer_name IS NULL))
+    AND COALESCE(worksite_state, employer_state) IS NOT NULL
+  GROUP BY COALESCE(worksite_state, employer_state), employer_name;
+  states := ARRAY(
+    SELECT state FROM h1b_stats_state_employers
+    WHERE employer_name = ANY(employers) OR (null_employer AND employer_name IS NULL)
+    UNION
+    SELECT UNNEST(states)
+  );
+
+  DELETE FROM h1b_stats_states WHERE state = ANY(states);
+  INSERT INTO h1b_stats_states
+  SELECT
+    state,
+    SUM(applications),
+    SUM(certified),
+    SUM(salary_sum),
+    (ARRAY_AGG(employer_name ORDER BY applications DESC, employer_name))[1]
+  FROM h1b_stats_state_employers
+  WHERE state = ANY(states)
+  GROUP BY state;
+
+  -- Job titles
+  DELETE FROM h1b_stats_job_titles WHERE job_title = ANY(job_titles);
+  INSERT INTO h1b_stats_job_titles
+  SELECT
+    job_title,
+    COUNT(*),
+    SUM(salary),
+    PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY salary)::NUMERIC,
+    MIN(salary),
+    MAX(salary)
+  FROM (
+    SELECT job_title, COALESCE(annual_wage_from, annual_wage_to, 0) AS salary
+    FROM h1b_applications
+    WHERE job_title = ANY(job_titles)
+  ) salary_data
+  WHERE salary > 0
+  GROUP BY job_title;
+
+  -- Days, each a range scan on idx_h1b_applications_received_date
+  DELETE FROM h1b_stats_days WHERE day = ANY(days);
+  INSERT INTO h1b_stats_days
+  SELECT
+    d.day,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE a.case_status IN ('CERTIFIED', 'CERTIFIED-WITHDRAWN')),
+    SUM(COALESCE(a.annual_wage_from, a.annual_wage_to, 0))
+  FROM UNNEST(days) AS d(day)
+  JOIN h1b_applications a
+    ON a.received_date >= d.day::TIMESTAMP AT TIME ZONE 'UTC'
+   AND a.received_date < (d.day + 1)::TIMESTAMP AT TIME ZONE 'UTC'
+  GROUP BY d.day;
+
+  -- Salaries, through idx_h1b_applications_annual_salary_id
+  DELETE FROM h1b_stats_salaries WHERE salary = ANY(salaries);
+  INSERT INTO h1b_stats_salaries
+  SELECT
+    COALESCE(annual_wage_from, annual_wage_to, 0),
+    COALESCE(case_status, 'UNKNOWN'),
+    COUNT(*)
+  FROM h1b_applications
+  WHERE COALESCE(annual_wage_from, annual_wage_to, 0) = ANY(salaries)
+  GROUP BY 1, 2;
+
+  -- Whole-table totals. PERCENTILE_CONT(0.5) averages the values at 0-based
+  -- positions (n - 1) / 2 and n / 2, found from the histogram's running counts.
+  IF CARDINALITY(salaries) > 0 OR rebuild THEN
+    DELETE FROM h1b_stats_totals;
+    WITH histogram AS (
+      SELECT salary, SUM(applications) AS applications
+      FROM h1b_stats_salaries
+      GROUP BY salary
+    ),
+    running AS (
+      SELECT salary, applications,
+        SUM(applications) OVER (ORDER BY salary) AS reached,
+        SUM(applications) OVER () AS total
+      FROM histogram
+    )
+    INSERT INTO h1b_stats_totals
+      (applications, certified, salary_sum, median_salary, min_salary, max_salary, statuses)
+    SELECT
+      COALESCE(MAX(total), 0),
+      (SELECT COALESCE(SUM(applications), 0) FROM h1b_stats_salaries
+       WHERE case_status IN ('CERTIFIED', 'CERTIFIED-WITHDRAWN')),
+      SUM(salary * applications),
+      (MIN(salary) FILTER (WHERE reached > FLOOR((total - 1) / 2))
+       + MIN(salary) FILTER (WHERE reached > FLOOR(total / 2))) / 2,
+      MIN(salary),
+      MAX(salary),
+      (SELECT COALESCE(JSONB_OBJECT_AGG(case_status, applications), '{}')
+       FROM (SELECT case_status, SUM(applications) AS applications
+             FROM h1b_stats_salaries GROUP BY case_status) statuses)
+    FROM running;
+  END IF;
+
+  RETURN jsonb_build_object(
+    'rebuild', rebuild,
+    'employers', CARDINALITY(employers) + null_employer::INT,
+    'jobTitles', CARDINALITY(job_titles),
+    'states', CARDINALITY(states),
+    'days', CARDINALITY(days),
+    'salaries', CARDINALITY(salaries)
+  );
+END;
+$function$;
+
+-- ============================================================================
+-- STATISTICS FUNCTIONS
+-- ============================================================================
+
+-- Same as migration 20261019, with p_min_salary / p_max_salary and the figures
+-- in yearly amounts. The other statistics functions read the rollups unchanged.
+CREATE OR REPLACE FUNCTION get_h1b_statistics(
+  p_employer_filter TEXT DEFAULT NULL,
+  p_status_filter TEXT DEFAULT NULL,
+  p_job_title_filter TEXT DEFAULT NULL,
+  p_min_salary NUMERIC DEFAULT NULL,
+  p_max_salary NUMERIC DEFAULT NULL,
+  p_search_term TEXT DEFAULT NULL
+)
+RETURNS JSON
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $function$
+DECLARE
+  total_apps BIGINT;
+  avg_salary NUMERIC;
+  median_salary NUMERIC;
+  min_salary NUMERIC;
+  max_salary NUMERIC;
+  cert_rate NUMERIC;
+  top_employers JSON;
+  status_breakdown JSON;
+BEGIN
+  IF p_employer_filter IS NULL AND p_status_filter IS NULL AND p_job_title_filter IS NULL
+     AND p_min_salary IS NULL AND p_max_salary IS NULL AND p_search_term IS NULL THEN
+    SELECT
+      t.applications,
+      ROUND(t.salary_sum / NULLIF(t.applications, 0), 0),
+      ROUND(t.median_salary, 0),
+      t.min_salary,
+      t.max_salary,
+      ROUND(t.certified * 100.0 / NULLIF(t.applications, 0), 2),
+      t.statuses::JSON
+    INTO total_apps, avg_salary, median_salary, min_salary, max_salary, cert_rate, status_breakdown
+    FROM h1b_stats_totals t;
+
+    SELECT JSON_AGG(JSON_BUILD_OBJECT('name', employer_name, 'count', paid_applications)
+                    ORDER BY paid_applications DESC, employer_name)
+    INTO top_employers
+    FROM (
+      SELECT employer_name, paid_applications
+      FROM h1b_stats_employers
+      WHERE paid_applications > 0
+      ORDER BY paid_applications DESC, employer_name
+      LIMIT 10
+    ) top_emp;
+  ELSE
+    WITH filtered_data AS (
+      SELECT
+        case_status,
+        employer_name,
+        COALESCE(annual_wage_from, annual_wage_to, 0) AS salary
+      FROM h1b_applications
+      WHERE
+        (p_employer_filter IS NULL OR employer_name ILIKE '%' || p_employer_filter || '%')
+        AND (p_status_filter IS NULL OR case_status = p_status_filter)
+        AND (p_job_title_filter IS NULL OR job_title ILIKE '%' || p_job_title_filter || '%')
+        AND (p_min_salary IS NULL OR COALESCE(annual_wage_from, annual_wage_to, 0) >= p_min_salary)
+        AND (p_max_salary IS NULL OR COALESCE(annual_wage_from, annual_wage_to, 0) <= p_max_salary)
+        AND (p_search_term IS NULL OR
+             employer_name ILIKE '%' || p_search_term || '%' OR
+             job_title ILIKE '%' || p_search_term || '%' OR
+             case_status ILIKE '%' || p_search_term || '%')
+        AND COALESCE(annual_wage_from, annual_wage_to, 0) > 0 -- Exclude zero salaries
+    )
+    SELECT
+      COUNT(*),
+      ROUND(AVG(salary), 0),
+      ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY salary)::NUMERIC, 0),
+      MIN(salary),
+      MAX(salary),
+      ROUND(COUNT(*) FILTER (WHERE case_status IN ('CERTIFIED', 'CERTIFIED-WITHDRAWN'))
+            * 100.0 / NULLIF(COUNT(*), 0), 2),
+      (SELECT JSON_AGG(JSON_BUILD_OBJECT('name', employer_name, 'count', employer_count)
+                       ORDER BY employer_count DESC, employer_name)
+       FROM (SELECT employer_name, COUNT(*) AS employer_count
+             FROM filtered_data
+             WHERE employer_name IS NOT NULL AND employer_name != ''
+             GROUP BY employer_name
+             ORDER BY COUNT(*) DESC, employer_name
+             LIMIT 10) top_emp),
+      (SELECT JSON_OBJECT_AGG(status, status_count)
+       FROM (SELECT COALESCE(case_status, 'UNKNOWN') AS status, COUNT(*) AS status_count
+             FROM filtered_data
+             GROUP BY COALESCE(case_status, 'UNKNOWN')) statuses)
+    INTO total_apps, avg_salary, median_salary, min_salary, max_salary, cert_rate,
+      top_employers, status_breakdown
+    FROM filtered_data;
+  END IF;
+
+  RETURN JSON_BUILD_OBJECT(
+    'totalApplications', COALESCE(total_apps, 0),
+    'averageSalary', COALESCE(avg_salary, 0),
+    'medianSalary', COALESCE(median_salary, 0),
+    'minSalary', COALESCE(min_salary, 0),
+    'maxSalary', COALESCE(max_salary, 0),
+    'certificationRate', COALESCE(cert_rate, 0),
+    'topEmployers', COALESCE(top_employers, '[]'::JSON),
+    'statusBreakdown', COALESCE(status_breakdown, '{}'::JSON)
+  );
+END;
+$function$;
+
+-- ============================================================================
+-- FILTERING FUNCTIONS
+-- ============================================================================
+
+-- Same as migration 20261020, with minSalary / maxSalary compared to the
+-- annualized salary (idx_h1b_applications_annual_salary_id)
+CREATE OR REPLACE FUNCTION h1b_filter_conditions(
+  filter_employer TEXT,
+  filter_status TEXT,
+  filter_job_title TEXT,
+  filter_min_salary NUMERIC,
+  filter_max_salary NUMERIC,
+  filter_search_term TEXT
+)
+RETURNS TEXT
+LANGUAGE plpgsql
+IMMUTABLE
+AS $function$
+DECLARE
+  where_conditions TEXT[] := ARRAY[]::TEXT[];
+BEGIN
+  IF filter_employer IS NOT NULL THEN
+    where_conditions := array_append(where_conditions,
+      'employer_name ILIKE ' || quote_literal('%' || filter_employer || '%'));
+  END IF;
+
+  IF filter_status IS NOT NULL THEN
+    where_conditions := array_append(where_conditions,
+      'case_status = ' || quote_literal(filter_status));
+  END IF;
+
+  IF filter_job_title IS NOT NULL THEN
+    where_conditions := array_append(where_conditions,
+      'job_title ILIKE ' || quote_literal('%' || filter_job_title || '%'));
+  END IF;
+
+  IF filter_min_salary IS NOT NULL THEN
+    where_conditions := array_append(where_conditions,
+      'COALESCE(annual_wage_from, annual_wage_to, 0) >= ' || filter_min_salary);
+  END IF;
+
+  IF filter_max_salary IS NOT NULL THEN
+    where_conditions := array_append(where_conditions,
+      'COALESCE(annual_wage_from, annual_wage_to, 0) <= ' || filter_max_salary);
+  END IF;
+
+  IF filter_search_term IS NOT NULL THEN
+    where_conditions := array_append(where_conditions,
+      '(employer_name ILIKE ' || quote_literal('%' || filter_search_term || '%') ||
+      ' OR job_title ILIKE ' || quote_literal('%' || filter_search_term || '%') ||
+      ' OR case_number ILIKE ' || quote_literal('%' || filter_search_term || '%') || ')');
+  END IF;
+
+  IF array_length(where_conditions, 1) > 0 THEN
+    RETURN array_to_string(where_conditions, ' AND ');
+  END IF;
+  RETURN 'TRUE';
+END;
+$function$;
+
+-- Same as migration 20261020; sort_by => 'salary' orders by the annualized
+-- salary, and each row also carries its unit of pay and annual wages
+CREATE OR REPLACE FUNCTION get_h1b_filtered_applications_keyset(
+  filters JSON DEFAULT '{}',
+  page_size INTEGER DEFAULT 20,
+  cursor JSON DEFAULT NULL,
+  sort_by TEXT DEFAULT 'id',
+  sort_order TEXT DEFAULT 'desc',
+  count_mode TEXT DEFAULT 'none'
+)
+RETURNS JSON
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $function$
+DECLARE
+  result JSON;
+  has_next BOOLEAN;
+  last_key TEXT;
+  last_id BIGINT;
+  total_count BIGINT;
+  plan JSON;
+  where_clause TEXT;
+  sort_expr TEXT;
+  sort_type TEXT;
+  seek_condition TEXT := '';
+  order_clause TEXT;
+  query_text TEXT;
+
+  -- Filter variables
+  filter_employer TEXT;
+  filter_status TEXT;
+  filter_job_title TEXT;
+  filter_min_salary NUMERIC;
+  filter_max_salary NUMERIC;
+  filter_search_term TEXT;
+BEGIN
+  -- Input validation
+  IF page_size IS NULL OR page_size <= 0 THEN
+    page_size := 20;
+  END IF;
+
+  IF page_size > 100 THEN
+    page_size := 100;
+  END IF;
+
+  sort_order := LOWER(COALESCE(sort_order, 'desc'));
+  count_mode := COALESCE(count_mode, 'none');
+  CASE COALESCE(sort_by, 'id')
+    WHEN 'id' THEN
+      sort_expr := 'id';
+      sort_type := 'BIGINT';
+    WHEN 'receivedDate' THEN
+      sort_expr := 'COALESCE(received_date, ''-infinity''::TIMESTAMPTZ)';
+      sort_type := 'TIMESTAMPTZ';
+    WHEN 'salary' THEN
+      sort_expr := 'COALESCE(annual_wage_from, annual_wage_to, 0)';
+      sort_type := 'NUMERIC';
+    ELSE
+      RETURN JSON_BUILD_OBJECT(
+        'error', true,
+        'message', 'Unknown sort_by: ' || sort_by,
+        'code', 'INVALID_SORT'
+      );
+  END CASE;
+
+  IF sort_order NOT IN ('asc', 'desc') OR count_mode NOT IN ('none', 'estimated', 'exact') THEN
+    RETURN JSON_BUILD_OBJECT(
+      'error', true,
+      'message', 'sort_order must be asc or desc, count_mode none, estimated or exact',
+      'code', 'INVALID_PAGINATION'
+    );
+  END IF;
+
+  -- Extract filter values from JSON
+  BEGIN
+    filter_employer := NULLIF(TRIM(filters->>'employer'), '');
+    filter_status := NULLIF(TRIM(filters->>'status'), '');
+    filter_job_title := NULLIF(TRIM(filters->>'jobTitle'), '');
+    filter_search_term := NULLIF(TRIM(filters->>'searchTerm'), '');
+
+    IF (filters->>'minSalary') IS NOT NULL AND (filters->>'minSalary') != '' THEN
+      filter_min_salary := (filters->>'minSalary')::NUMERIC;
+    END IF;
+
+    IF (filters->>'maxSalary') IS NOT NULL AND (filters->>'maxSalary') != '' THEN
+      filter_max_salary := (filters->>'maxSalary')::NUMERIC;
+    END IF;
+
+  EXCEPTION
+    WHEN OTHERS THEN
+      RETURN JSON_BUILD_OBJECT(
+        'error', true,
+        'message', 'Invalid filter parameters',
+        'code', 'INVALID_FILTERS'
+      );
+  END;
+
+  -- Validate salary range
+  IF filter_min_salary IS NOT NULL AND filter_max_salary IS NOT NULL THEN
+    IF filter_min_salary > filter_max_salary THEN
+      RETURN JSON_BUILD_OBJECT(
+        'error', true,
+        'message', 'Minimum salary cannot be greater than maximum salary',
+        'code', 'INVALID_SALARY_RANGE'
+      );
+    END IF;
+  END IF;
+
+  where_clause := h1b_filter_conditions(filter_employer, filter_status, filter_job_title,
+                                        filter_min_salary, filter_max_salary, filter_search_term);
+
+  -- Seek past the cursor: a row comparison, which the (sort key, id) index serves
+  IF cursor IS NOT NULL THEN
+    BEGIN
+      last_id := (cursor->>'id')::BIGINT;
+      last_key := cursor->>'key';
+      IF last_id IS NULL OR (sort_expr != 'id' AND last_key IS NULL) THEN
+        RAISE EXCEPTION 'incomplete cursor';
+      END IF;
+      IF sort_expr = 'id' THEN
+        seek_condition := format(' AND id %s %s', CASE sort_order WHEN 'desc' THEN '<' ELSE '>' END,
+                                 last_id);
+      ELSE
+        seek_condition := format(' AND (%s, id) %s (%s::%s, %s)', sort_expr,
+                                 CASE sort_order WHEN 'desc' THEN '<' ELSE '>' END,
+                                 quote_literal(last_key), sort_type, last_id);
+        EXECUTE format('SELECT %s::%s', quote_literal(last_key), sort_type);
+      END IF;
+    EXCEPTION
+      WHEN OTHERS THEN
+        RETURN JSON_BUILD_OBJECT(
+          'error', true,
+          'message', 'Invalid cursor',
+          'code', 'INVALID_CURSOR'
+        );
+    END;
+  END IF;
+
+  order_clause := CASE sort_expr WHEN 'id' THEN 'id ' || sort_order
+                  ELSE sort_expr || ' ' || sort_order || ', id ' || sort_order END;
+
+  -- One row past the page tells whether there is a next page
+  query_text := '
+    SELECT
+      JSON_AGG(item ORDER BY ordinal) FILTER (WHERE ordinal <= ' || page_size || '),
+      COUNT(*) > ' || page_size || ',
+      MAX(sort_key) FILTER (WHERE ordinal = ' || page_size || '),
+      MAX(id) FILTER (WHERE ordinal = ' || page_size || ')
+    FROM (
+      SELECT
+        id,
+        ' || sort_expr || '::TEXT AS sort_key,
+        ROW_NUMBER() OVER (ORDER BY ' || order_clause || ') AS ordinal,
+        JSON_BUILD_OBJECT(
+          ''id'', id,
+          ''case_number'', case_number,
+          ''case_status'', case_status,
+          ''job_title'', job_title,
+          ''employer_name'', employer_name,
+          ''wage_rate_of_pay_from'', wage_rate_of_pay_from,
+          ''wage_rate_of_pay_to'', wage_rate_of_pay_to,
+          ''wage_unit_of_pay'', wage_unit_of_pay,
+          ''annual_wage_from'', annual_wage_from,
+          ''annual_wage_to'', annual_wage_to,
+          ''received_date'', received_date,
+          ''decision_date'', decision_date,
+          ''employer_city'', employer_city,
+          ''employer_state'', employer_state,
+          ''worksite_city'', worksite_city,
+          ''worksite_state'', worksite_state
+        ) AS item
+      FROM h1b_applications
+      WHERE ' || where_clause || seek_condition || '
+      ORDER BY ' || order_clause || '
+      LIMIT ' || (page_size + 1) || '
+    ) page_rows';
+
+  EXECUTE query_text INTO result, has_next, last_key, last_id;
+
+  IF count_mode = 'estimated' THEN
+    EXECUTE 'EXPLAIN (FORMAT JSON) SELECT 1 FROM h1b_applications WHERE ' || where_clause
+      INTO plan;
+    total_count := (plan->0->'Plan'->>'Plan Rows')::NUMERIC::BIGINT;
+  ELSIF count_mode = 'exact' THEN
+    SELECT c.total INTO total_count
+    FROM h1b_filter_counts c
+    WHERE c.filter_key = MD5(where_clause);
+    IF total_count IS NULL THEN
+      EXECUTE 'SELECT COUNT(*) FROM h1b_applications WHERE ' || where_clause INTO total_count;
+      INSERT INTO h1b_filter_counts (filter_key, total)
+      VALUES (MD5(where_clause), total_count)
+      ON CONFLICT (filter_key) DO UPDATE SET total = EXCLUDED.total, counted_at = NOW();
+    END IF;
+  END IF;
+
+  -- Build response
+  RETURN JSON_BUILD_OBJECT(
+    'data', COALESCE(result, '[]'::JSON),
+    'pagination', JSON_BUILD_OBJECT(
+      'pageSize', page_size,
+      'sortBy', COALESCE(sort_by, 'id'),
+      'sortOrder', sort_order,
+      'hasNextPage', has_next,
+      'hasPreviousPage', cursor IS NOT NULL,
+      'nextCursor', CASE WHEN has_next THEN
+        JSON_BUILD_OBJECT('key', CASE WHEN sort_expr != 'id' THEN last_key END, 'id', last_id)
+      END,
+      'totalRecords', total_count,
+      'totalIsEstimate', count_mode = 'estimated'
+    )
+  );
+
+EXCEPTION
+  WHEN OTHERS THEN
+    RETURN JSON_BUILD_OBJECT(
+      'error', true,
+      'message', 'Failed to retrieve filtered applications',
+      'code', 'FILTER_QUERY_ERROR',
+      'details', SQLERRM
+    );
+END;
+$function$;
+
+-- ============================================================================
+-- BACKFILL
+-- ============================================================================
+
+-- Adds the columns, annualizes the existing rows (prevailing wages in the wage's
+-- unit, since pw_unit_of_pay wasn't loaded before), swaps the salary indexes and
+-- rebuilds the rollups. The statistics update trigger is dropped for the backfill
+-- and reinstalled by install_h1b_statistics_tracking(), as the rebuild recomputes
+-- everything anyway.
+DO $$
+BEGIN
+  IF to_regclass('h1b_applications') IS NOT NULL THEN
+    ALTER TABLE h1b_applications
+      ADD COLUMN IF NOT EXISTS pw_unit_of_pay TEXT,
+      ADD COLUMN IF NOT EXISTS annual_wage_from NUMERIC,
+      ADD COLUMN IF NOT EXISTS annual_wage_to NUMERIC,
+      ADD COLUMN IF NOT EXISTS annual_prevailing_wage NUMERIC;
+
+    DROP TRIGGER IF EXISTS h1b_stats_track_update ON h1b_applications;
+    UPDATE h1b_applications SET
+      annual_wage_from = h1b_annualize_wage(wage_rate_of_pay_from, wage_unit_of_pay),
+      annual_wage_to = h1b_annualize_wage(wage_rate_of_pay_to, wage_unit_of_pay),
+      annual_prevailing_wage = h1b_annualize_wage(prevailing_wage,
+                                                  COALESCE(pw_unit_of_pay, wage_unit_of_pay))
+    WHERE annual_wage_from IS NULL AND annual_wage_to IS NULL AND annual_prevailing_wage IS NULL
+      AND (wage_rate_of_pay_from IS NOT NULL OR wage_rate_of_pay_to IS NOT NULL
+           OR prevailing_wage IS NOT NULL);
+
+    DROP INDEX IF EXISTS idx_h1b_applications_salary_amount;
+    DROP INDEX IF EXISTS idx_h1b_applications_salary_amount_id;
+    PERFORM install_h1b_statistics_tracking();
+    ANALYZE h1b_applications;
+    PERFORM refresh_h1b_statistics(true);
+  END IF;
+END $$;
+
+-- ============================================================================
+-- PERMISSIONS
+-- ============================================================================
+
+-- CREATE OR REPLACE keeps the grants of the migrations these functions come from
+REVOKE EXECUTE ON FUNCTION h1b_stats_track_changes() FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION install_h1b_statistics_tracking() FROM PUBLIC;
+
+-- ============================================================================
+-- ROLLBACK STATEMENTS (for reference)
+-- ============================================================================
+
+-- Re-run the functions from migrations 20261017, 20261019 and 20261020,
+-- then:
+-- DROP INDEX IF EXISTS idx_h1b_applications_annual_salary_id;
+-- DROP FUNCTION IF EXISTS h1b_annualize_wage(NUMERIC, TEXT);
+-- ALTER TABLE h1b_applications DROP COLUMN IF EXISTS annual_prevailing_wage,
+--   DROP COLUMN IF EXISTS annual_wage_to, DROP COLUMN IF EXISTS annual_wage_from,
+--   DROP COLUMN IF EXISTS pw_unit_of_pay;
+-- SELECT refresh_h1b_statistics(true);
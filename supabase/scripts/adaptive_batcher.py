@@ -0,0 +1,185 @@
+"""
+Adaptive batch sizing for the H1B uploaders.
+
+A fixed row count is a poor batch size: rows with long job titles or employer
+names make some batches exceed the request body limit, while short rows leave
+most of each request's round trip unused. Batches are therefore cut by an
+estimated serialized (JSON) byte budget, and the budget tunes itself from what
+the server reports back:
+
+    - fast, successful requests grow the budget (up to max_bytes)
+    - requests slower than target_latency shrink it proportionally
+    - failures halve it, and a "payload too large" response also lowers the
+      ceiling so the budget never climbs back over the limit
+    - while the recent error rate is above max_error_rate it never grows
+
+Every attempt is recorded in `stats` (rows, bytes, latency, error, budget at
+the time) so the sweet spot can be inspected after a run, e.g. with
+`upload_to_supabase.py --batch-stats stats.json`.
+"""
+import json
+import re
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+DEFAULT_START_BYTES = 256 * 1024
+DEFAULT_MIN_BYTES = 16 * 1024
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+DEFAULT_MAX_ROWS = 5000
+DEFAULT_TARGET_LATENCY = 2.0
+DEFAULT_MAX_ERROR_RATE = 0.1
+ERROR_WINDOW = 20
+
+GROWTH_FACTOR = 1.5
+FAILURE_FACTOR = 0.5
+
+PAYLOAD_TOO_LARGE_PATTERN = re.compile(
+    r"\b413\b|payload too large|request entity too large|body (?:is )?too large", re.IGNORECASE)
+
+# Per-row JSON overhead besides the key/value pairs: braces and the separator
+ROW_OVERHEAD = 2
+
+
+def is_payload_too_large(error: Exception) -> bool:
+    """Return True if the server rejected a request for its body size"""
+    return PAYLOAD_TOO_LARGE_PATTERN.search(str(error)) is not None
+
+
+def row_byte_sizes(db_table) -> np.ndarray:
+    """Estimate each row's serialized JSON size from the Arrow columns
+
+    Strings count their UTF-8 length plus quotes, numbers their text length and
+    nulls 4 bytes ("null"). Escapes are not counted, which the budget's
+    headroom below the real body limit absorbs.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    sizes = np.full(db_table.num_rows, ROW_OVERHEAD, dtype=np.int64)
+    for name, column in zip(db_table.column_names, db_table.columns):
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            lengths = pc.add(pc.binary_length(column), 2)
+        else:
+            lengths = pc.utf8_length(pc.cast(column, pa.string()))
+        lengths = pc.fill_null(lengths, 4).to_numpy(zero_copy_only=False)
+        sizes += lengths.astype(np.int64) + len(name) + 6
+    return sizes
+
+
+class AdaptiveBatcher:
+    """Cut an Arrow table into batches by byte budget and tune the budget from feedback
+
+    observe() may be called from worker threads; the budget used for the next
+    batch is whatever the feedback so far has produced.
+    """
+
+    def __init__(self, start_bytes: int = DEFAULT_START_BYTES, min_bytes: int = DEFAULT_MIN_BYTES,
+                 max_bytes: int = DEFAULT_MAX_BYTES, max_rows: int = DEFAULT_MAX_ROWS,
+                 target_latency: float = DEFAULT_TARGET_LATENCY,
+                 max_error_rate: float = DEFAULT_MAX_ERROR_RATE, fixed_rows: int = None):
+        self.min_bytes = min_bytes
+        self.max_bytes = max(max_bytes, min_bytes)
+        self.target_bytes = min(max(start_bytes, min_bytes), self.max_bytes)
+        self.max_rows = max_rows
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+        self.fixed_rows = fixed_rows
+        self.recent_errors = deque(maxlen=ERROR_WINDOW)
+        self.stats = []
+        self._lock = threading.Lock()
+
+    def error_rate(self) -> float:
+        """Share of failed attempts among the most recent ones"""
+        return sum(self.recent_errors) / len(self.recent_errors) if self.recent_errors else 0.0
+
+    def iter_ranges(self, db_table, skip_ranges: list = ()):
+        """Yield (start, end, estimated_bytes), skipping rows covered by skip_ranges
+
+        skip_ranges are already-committed (start, end) ranges, e.g. from the
+        checkpoint ledger; batches never straddle them.
+        """
+        num_rows = db_table.num_rows
+        skip_ranges = sorted(skip_ranges)
+        cumulative = np.cumsum(row_byte_sizes(db_table))
+
+        start = 0
+        while start < num_rows:
+            covering = [end for s, end in skip_ranges if s <= start < end]
+            if covering:
+                start = max(covering)
+                continue
+
+            base = int(cumulative[start - 1]) if start else 0
+            if self.fixed_rows:
+                end = start + self.fixed_rows
+            else:
+                end = int(np.searchsorted(cumulative, base + self.target_bytes, side='right'))
+                end = min(max(end, start + 1), start + self.max_rows)
+
+            next_skip = min((s for s, _ in skip_ranges if s > start), default=num_rows)
+            end = min(end, next_skip, num_rows)
+            yield start, end, int(cumulative[end - 1]) - base
+            start = end
+
+    def observe(self, rows: int, nbytes: int, latency: float, error: Exception = None):
+        """Record one request attempt and retune the byte budget"""
+        with self._lock:
+            self.recent_errors.append(error is not None)
+            self.stats.append({
+                'attempt': len(self.stats) + 1,
+                'rows': rows,
+                'bytes': nbytes,
+                'latency': round(latency, 4),
+                'rows_per_sec': round(rows / latency, 1) if latency > 0 else None,
+                'error': str(error) if error is not None else None,
+                'target_bytes': self.target_bytes,
+            })
+            if self.fixed_rows:
+                return
+
+            if error is not None:
+                if is_payload_too_large(error):
+                    self.max_bytes = max(self.min_bytes, int(nbytes * 0.8))
+                target = self.target_bytes * FAILURE_FACTOR
+            elif latency > self.target_latency:
+                target = self.target_bytes * max(FAILURE_FACTOR, self.target_latency / latency)
+            elif latency < self.target_latency / 2 and self.error_rate() <= self.max_error_rate:
+                target = self.target_bytes * GROWTH_FACTOR
+            else:
+                target = self.target_bytes
+            self.target_bytes = int(min(max(target, self.min_bytes), self.max_bytes))
+
+    def timed(self, send_batch):
+        """Wrap send_batch(records) as send(records, nbytes), observing every attempt"""
+        def send(records, nbytes):
+            started = time.perf_counter()
+            try:
+                result = send_batch(records)
+            except Exception as e:
+                self.observe(len(records), nbytes, time.perf_counter() - started, e)
+                raise
+            self.observe(len(records), nbytes, time.perf_counter() - started)
+            return result
+        return send
+
+    def summary(self) -> dict:
+        """Aggregate the recorded attempts"""
+        succeeded = [s for s in self.stats if s['error'] is None]
+        if not succeeded:
+            return {'attempts': len(self.stats), 'errors': len(self.stats)}
+        return {
+            'attempts': len(self.stats),
+            'errors': len(self.stats) - len(succeeded),
+            'mean_rows': round(float(np.mean([s['rows'] for s in succeeded])), 1),
+            'mean_bytes': int(np.mean([s['bytes'] for s in succeeded])),
+            'mean_latency': round(float(np.mean([s['latency'] for s in succeeded])), 3),
+            'final_target_bytes': self.target_bytes,
+        }
+
+    def write_stats(self, path: str):
+        """Write per-attempt stats and the summary as JSON"""
+        with open(path, 'w') as file:
+            json.dump({'summary': self.summary(), 'batches': self.stats}, file, indent=4)
@@ -0,0 +1,134 @@
+"""
+Benchmark the vectorized H1B record conversion against the per-record path.
+
+Usage:
+    python benchmark_convert.py [--rows N] [--repeat N]
+
+Generates synthetic LCA records (including blanks, whitespace, missing wages,
+hourly to yearly pay units, wages ending in half a cent and integer postal
+codes), checks that convert_table_for_db produces exactly the same records as
+convert_record_for_db, then reports rows/sec for the
+per-record function, the batch path from JSON records and the batch path from
+a typed table as read back from parser.py's Parquet output.
+"""
+import argparse
+import random
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from upload_to_supabase import (
+    FIELD_MAPPING,
+    convert_record_for_db,
+    convert_table_for_db,
+    records_to_table,
+)
+
+STATUSES = ['Certified', 'Certified - Withdrawn', 'Denied', 'Withdrawn']
+STATES = ['CA', 'NY', 'NJ', 'TX', 'WA', 'DE', 'IL', 'MA']
+TITLES = ['Software Engineer', 'Data Scientist', 'Vice President', 'Analyst', '   ', '']
+UNITS = ['Year', 'Hour', 'Month', 'Week', 'Bi-Weekly']
+
+
+def make_records(count: int, seed: int = 42) -> list:
+    """Build count synthetic parsed-LCA records"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        wage = rng.choice([rng.randint(60000, 250000), None, '', str(rng.randint(20, 90)),
+                           round(rng.uniform(20, 90), 2), rng.randint(20000, 90000) / 1000])
+        records.append({
+            'CASE_NUMBER': f'I-200-{25000 + i // 1000}-{i:06d}',
+            'CASE_STATUS': rng.choice(STATUSES),
+            'RECEIVED_DATE': f'2025-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}T00:00:00.000',
+            'DECISION_DATE': rng.choice([None, '2025-06-27T00:00:00.000']),
+            'VISA_CLASS': 'H-1B',
+            'JOB_TITLE': rng.choice(TITLES),
+            'SOC_CODE': '15-1252',
+            'SOC_TITLE': 'Software Developers',
+            'FULL_TIME_POSITION': rng.choice(['Y', 'N']),
+            'BEGIN_DATE': '2025-07-01T00:00:00.000',
+            'END_DATE': '2028-06-30T00:00:00.000',
+            'EMPLOYER_NAME': f'Employer {rng.randint(1, 5000)}',
+            'EMPLOYER_CITY': 'New York',
+            'EMPLOYER_STATE': rng.choice(STATES),
+            'EMPLOYER_POSTAL_CODE': rng.choice([10019, '07981', None]),
+            'WORKSITE_CITY': rng.choice(['Whippany', 'San Francisco', ' ']),
+            'WORKSITE_STATE': rng.choice(STATES),
+            'WORKSITE_POSTAL_CODE': rng.choice([7981, 94111, '']),
+            'WAGE_RATE_OF_PAY_FROM': wage,
+            'WAGE_RATE_OF_PAY_TO': rng.choice([None, wage]),
+            'WAGE_UNIT_OF_PAY': rng.choice(UNITS),
+            'PREVAILING_WAGE': rng.choice([104976, 111966.5, 48.27, None]),
+            'PW_UNIT_OF_PAY': rng.choice(UNITS + [None, ' ']),
+        })
+    return records
+
+
+def make_typed_table(records: list):
+    """Mimic the Parquet read path: timestamps and dictionary-encoded columns"""
+    table = records_to_table(records)
+    for i, name in enumerate(FIELD_MAPPING):
+        column = table.column(i)
+        if name.endswith('_DATE'):
+            column = pc.strptime(column, format='%Y-%m-%dT%H:%M:%S.000', unit='ms')
+        elif name in ('CASE_STATUS', 'VISA_CLASS', 'EMPLOYER_STATE', 'WORKSITE_STATE',
+                      'WAGE_UNIT_OF_PAY', 'PW_UNIT_OF_PAY'):
+            column = column.dictionary_encode()
+        table = table.set_column(i, pa.field(name, column.type), column)
+    return table
+
+
+def time_per_record(records: list) -> float:
+    start = time.perf_counter()
+    [convert_record_for_db(record) for record in records]
+    return time.perf_counter() - start
+
+
+def time_from_records(records: list) -> float:
+    start = time.perf_counter()
+    convert_table_for_db(records_to_table(records))
+    return time.perf_counter() - start
+
+
+def time_from_table(table) -> float:
+    start = time.perf_counter()
+    convert_table_for_db(table)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark H1B record conversion.")
+    parser.add_argument("--rows", type=int, default=200000, help="Synthetic rows (default: 200000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs, best is reported")
+    args = parser.parse_args()
+
+    records = make_records(args.rows)
+
+    # Correctness first: both batch paths must agree with the per-record function
+    sample = records[:5000]
+    expected = [convert_record_for_db(record) for record in sample]
+    for label, table in (("JSON records", records_to_table(sample)),
+                         ("typed table", make_typed_table(sample))):
+        actual = convert_table_for_db(table).to_pylist()
+        if expected != actual:
+            mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+            raise SystemExit(f"❌ {label}: output differs on {mismatches} of {len(sample)} records")
+    print(f"✅ Outputs match on {len(sample)} records")
+
+    typed_table = make_typed_table(records)
+    per_record = min(time_per_record(records) for _ in range(args.repeat))
+    from_records = min(time_from_records(records) for _ in range(args.repeat))
+    from_table = min(time_from_table(typed_table) for _ in range(args.repeat))
+
+    print(f"\n📊 Conversion of {args.rows} rows (best of {args.repeat}):")
+    print(f"  convert_record_for_db          : {args.rows / per_record:12,.0f} rows/sec")
+    print(f"  convert_table_for_db (JSON)    : {args.rows / from_records:12,.0f} rows/sec"
+          f"  ({per_record / from_records:.1f}x)")
+    print(f"  convert_table_for_db (Parquet) : {args.rows / from_table:12,.0f} rows/sec"
+          f"  ({per_record / from_table:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Benchmark keyset pagination against OFFSET pagination of the filtered H1B applications.
+
+Usage:
+    python benchmark_pagination.py --dsn postgresql://localhost/h1b [--rows N] [--pages 1,100,5000]
+
+Needs a database with h1b_applications and migrations 20240126, 20261020 and
+20261022 applied. h1b_applications is first topped up to --rows rows with synthetic
+LCA rows. Then, for each filter and page number, page N is fetched with
+get_h1b_filtered_applications (LIMIT/OFFSET plus an exact count on every call)
+and with get_h1b_filtered_applications_keyset (seeking past the last row of
+page N-1). Every keyset page is checked against the same page read with
+OFFSET. OFFSET latency grows with N; keyset latency stays flat. The count
+modes are timed last. Everything runs in one transaction that is rolled back,
+so the database is left as it was.
+"""
+import argparse
+import json
+import time
+
+from copy_loader import get_db_connection
+
+PAGE_SIZE = 20
+
+# (label, filters)
+FILTERS = [
+    ("no filters", {}),
+    ("status", {"status": "Certified"}),
+    ("salary range", {"minSalary": 80000, "maxSalary": 150000}),
+]
+
+# sort_by -> ORDER BY key, as the keyset function sorts
+SORT_KEYS = {
+    "id": "id",
+    "receivedDate": "COALESCE(received_date, '-infinity'::TIMESTAMPTZ)",
+    "salary": "COALESCE(annual_wage_from, annual_wage_to, 0)",
+}
+
+EMPLOYERS = ["Google", "Amazon", "Microsoft", "Meta Platforms", "Apple", "Infosys", "Tata Consultancy",
+             "Cognizant Technology", "Deloitte Consulting", "Accenture", "Oracle America", "Intel",
+             "Salesforce", "IBM", "Capgemini America", "Wipro", "JPMorgan Chase", "Goldman Sachs",
+             "Walmart Associates", "Qualcomm"]
+SUFFIXES = ["Inc", "LLC", "Corporation", "Services", "Solutions", "Technologies", "Labs", "Group"]
+TITLES = ["Software Engineer", "Senior Software Engineer", "Data Scientist", "Data Engineer",
+          "Software Developer", "Systems Analyst", "Business Analyst", "Machine Learning Engineer",
+          "Product Manager", "DevOps Engineer", "Financial Analyst", "Mechanical Engineer",
+          "Research Scientist", "Database Administrator", "Quality Assurance Analyst",
+          "Network Engineer", "Accountant", "Physician", "Civil Engineer", "Marketing Manager"]
+SOC_TITLES = ["Software Developers", "Data Scientists", "Computer Systems Analysts",
+              "Management Analysts", "Financial and Investment Analysts", "Mechanical Engineers",
+              "Computer Network Architects", "Database Administrators", "Accountants and Auditors",
+              "Software Quality Assurance Analysts and Testers"]
+STATUSES = ["Certified", "Certified", "Certified", "Certified", "Certified - Withdrawn", "Denied",
+            "Withdrawn"]
+# Worksites: CITIES[i] is in STATES[i]
+CITIES = ["New York", "San Francisco", "Seattle", "Austin", "Chicago", "Boston", "Atlanta", "Newark",
+          "Redmond", "Mountain View"]
+STATES = ["NY", "CA", "WA", "TX", "IL", "MA", "GA", "NJ", "WA", "CA"]
+
+
+def sql_array(values) -> str:
+    """A TEXT[] literal for values"""
+    return "ARRAY[" + ", ".join("'" + value.replace("'", "''") + "'" for value in values) + "]"
+
+
+def pick(values, seed: str) -> str:
+    """SQL picking one of values from a (seeded) random number"""
+    return f"({sql_array(values)})[1 + FLOOR({seed} * {len(values)})::INT]"
+
+
+def add_synthetic_rows(cursor, rows: int):
+    """Insert rows synthetic LCA applications into h1b_applications (deterministic per database)"""
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM h1b_applications")
+    start = cursor.fetchone()[0]
+    cursor.execute("SELECT setseed(0.42)")
+    cursor.execute(f"""
+        INSERT INTO h1b_applications (
+          case_number, case_status, received_date, decision_date, visa_class, job_title, soc_code,
+          soc_title, full_time_position, employer_name, employer_city, employer_state,
+          worksite_city, worksite_state, wage_rate_of_pay_from, wage_rate_of_pay_to,
+          wage_unit_of_pay, prevailing_wage, pw_unit_of_pay, annual_wage_from, annual_wage_to,
+          annual_prevailing_wage)
+        SELECT *, 'Year', wage_from, wage_to, wage FROM (
+        SELECT 'I-SYN-' || LPAD((%s + n)::TEXT, 9, '0'), {pick(STATUSES, 'r[1]')},
+               received, received + (1 + FLOOR(r[2] * 60)::INT) * INTERVAL '1 day', 'H-1B',
+               {pick(TITLES, 'r[3]')}, '15-' || (1000 + FLOOR(r[4] * 300)::INT),
+               {pick(SOC_TITLES, 'r[4]')}, 'Y',
+               {pick(EMPLOYERS, 'r[5]')} || ' ' || {pick(SUFFIXES, 'r[6]')}
+                 || CASE WHEN r[7] < 0.5 THEN '' ELSE ' ' || FLOOR(r[7] * 20000)::INT END,
+               {pick(CITIES, 'r[10]')}, {pick(STATES, 'r[10]')},
+               {pick(CITIES, 'r[10]')}, {pick(STATES, 'r[10]')},
+               CASE WHEN r[8] < 0.05 THEN NULL ELSE ROUND((50000 + r[8] * 200000)::NUMERIC, 2) END AS wage_from,
+               CASE WHEN r[8] < 0.5 THEN NULL ELSE ROUND((100000 + r[8] * 200000)::NUMERIC, 2) END AS wage_to,
+               'Year', ROUND((45000 + r[8] * 150000)::NUMERIC, 2) AS wage
+        FROM (SELECT n, r, TIMESTAMPTZ '2024-10-01' + FLOOR(r[9] * 365)::INT * INTERVAL '1 day' AS received
+              FROM (SELECT n, ARRAY(SELECT random() FROM generate_series(1, 10) WHERE n > 0) AS r
+                    FROM generate_series(1, %s) n) randoms) synthetic) yearly""", (start, rows))
+
+
+def best_time(cursor, sql: str, params, repeat: int):
+    """Run sql repeat times; returns (best seconds, first result)"""
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        value = cursor.fetchone()[0]
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        result = value if result is None else result
+    return best, result
+
+
+def offset_page_ids(cursor, where: str, sort_by: str, page: int) -> tuple:
+    """Ids of page N read with OFFSET, plus the cursor that ends page N-1 (None for page 1)"""
+    order = f"{SORT_KEYS[sort_by]} DESC, id DESC"
+    cursor.execute(f"SELECT id, {SORT_KEYS[sort_by]}::TEXT AS sort_key FROM h1b_applications WHERE {where} "
+                   f"ORDER BY {order} OFFSET %s LIMIT %s",
+                   (max((page - 1) * PAGE_SIZE - 1, 0), PAGE_SIZE + 1))
+    rows = cursor.fetchall()
+    if page == 1:
+        return [row[0] for row in rows[:PAGE_SIZE]], None
+    last_id, last_key = rows[0]
+    page_cursor = {"id": last_id, "key": None if sort_by == "id" else last_key}
+    return [row[0] for row in rows[1:]], page_cursor
+
+
+def where_clause(cursor, filters: dict) -> str:
+    """The WHERE clause both functions build for filters"""
+    cursor.execute("SELECT h1b_filter_conditions(%s, %s, %s, %s, %s, %s)",
+                   (filters.get("employer"), filters.get("status"), filters.get("jobTitle"),
+                    filters.get("minSalary"), filters.get("maxSalary"), filters.get("searchTerm")))
+    return cursor.fetchone()[0]
+
+
+def measure(cursor, pages, repeat: int):
+    """Time page N with OFFSET and keyset for every filter, checking the keyset pages"""
+    keyset_sql = ("SELECT get_h1b_filtered_applications_keyset(%s, %s, %s, %s, 'desc', 'none')")
+    for label, filters in FILTERS:
+        where = where_clause(cursor, filters)
+        print(f"\n🔍 {label} ({json.dumps(filters)}), best of {repeat}:")
+        for page in pages:
+            offset_time, offset_result = best_time(
+                cursor, "SELECT get_h1b_filtered_applications(%s, %s, %s)",
+                (json.dumps(filters), PAGE_SIZE, page), repeat)
+            if offset_result.get("error"):
+                raise SystemExit(f"❌ get_h1b_filtered_applications: {offset_result}")
+            if page > offset_result["pagination"]["totalPages"]:
+                print(f"  page {page:>6}: past the last page ({offset_result['pagination']['totalPages']})")
+                continue
+
+            timings = []
+            for sort_by in SORT_KEYS:
+                expected, page_cursor = offset_page_ids(cursor, where, sort_by, page)
+                keyset_time, keyset_result = best_time(
+                    cursor, keyset_sql,
+                    (json.dumps(filters), PAGE_SIZE, json.dumps(page_cursor) if page_cursor else None,
+                     sort_by), repeat)
+                actual = [row["id"] for row in keyset_result.get("data", [])]
+                if actual != expected:
+                    raise SystemExit(f"❌ {label}, sort {sort_by}, page {page}: keyset page differs "
+                                     f"from OFFSET\n  offset: {expected}\n  keyset: {keyset_result}")
+                if sort_by == "id" and actual != [row["id"] for row in offset_result["data"]]:
+                    raise SystemExit(f"❌ {label}, page {page}: keyset page differs from "
+                                     f"get_h1b_filtered_applications")
+                timings.append(f"{sort_by} {keyset_time * 1000:6.1f} ms")
+            print(f"  page {page:>6}: offset {offset_time * 1000:8.1f} ms | keyset " + ", ".join(timings))
+
+
+def measure_counts(cursor, repeat: int):
+    """Time the keyset function's count modes on the first page"""
+    print(f"\n🔢 Count modes, first page (best of {repeat}; 'exact' cached after its first call):")
+    for label, filters in FILTERS:
+        timings = []
+        for count_mode in ("none", "estimated", "exact"):
+            cursor.execute("DELETE FROM h1b_filter_counts")
+            started = time.perf_counter()
+            cursor.execute("SELECT get_h1b_filtered_applications_keyset(%s, %s, NULL, 'id', 'desc', %s)",
+                           (json.dumps(filters), PAGE_SIZE, count_mode))
+            first = time.perf_counter() - started
+            total = cursor.fetchone()[0]["pagination"]["totalRecords"]
+            seconds, _ = best_time(
+                cursor, "SELECT get_h1b_filtered_applications_keyset(%s, %s, NULL, 'id', 'desc', %s)",
+                (json.dumps(filters), PAGE_SIZE, count_mode), repeat)
+            detail = "" if total is None else f" = {total:,}"
+            if count_mode == "exact":
+                timings.append(f"exact{detail} {first * 1000:.1f} ms, cached {seconds * 1000:.1f} ms")
+            else:
+                timings.append(f"{count_mode}{detail} {seconds * 1000:.1f} ms")
+        print(f"  {label:12}: " + " | ".join(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark keyset pagination against OFFSET.")
+    parser.add_argument("--dsn", help="Postgres connection string (default: POSTGRES_URL_NON_POOLING)")
+    parser.add_argument("--rows", type=int, default=500000,
+                        help="Top h1b_applications up to this many rows with synthetic ones "
+                             "(default: 500000)")
+    parser.add_argument("--pages", default="1,10,100,1000,5000",
+                        help="Comma-separated page numbers to fetch (default: 1,10,100,1000,5000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs, best is reported")
+    args = parser.parse_args()
+    pages = [int(page) for page in args.pages.split(",")]
+
+    conn = get_db_connection(args.dsn)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM h1b_applications")
+            existing = cursor.fetchone()[0]
+            if existing < args.rows:
+                started = time.perf_counter()
+                add_synthetic_rows(cursor, args.rows - existing)
+                cursor.execute("ANALYZE h1b_applications")
+                print(f"✅ Added {args.rows - existing:,} synthetic rows to {existing:,} "
+                      f"({time.perf_counter() - started:.1f}s)")
+            cursor.execute("SELECT COUNT(*) FROM h1b_applications")
+            print(f"📊 {cursor.fetchone()[0]:,} rows, {PAGE_SIZE} per page")
+
+            measure(cursor, pages, args.repeat)
+            measure_counts(cursor, args.repeat)
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
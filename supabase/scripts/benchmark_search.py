@@ -0,0 +1,128 @@
+"""
+Benchmark the trigram-indexed employer, job title and free-text filters against ILIKE scans.
+
+Usage:
+    python benchmark_search.py --dsn postgresql://localhost/h1b [--rows N] [--repeat N]
+
+Needs a database with h1b_applications and migrations 20240126 and 20261020
+to 20261022 applied. h1b_applications is first topped up to --rows rows with the
+synthetic LCA rows of benchmark_pagination.py. For each filter, the first page
+plus total count is fetched with the ILIKE '%...%' filters while the trigram
+indexes are switched off (enable_bitmapscan), then with the indexes through
+get_h1b_filtered_applications and get_h1b_filtered_applications_keyset. Both
+must find the same rows. Everything runs in one transaction that is rolled
+back, so the database is left as it was.
+"""
+import argparse
+import json
+import time
+
+from benchmark_pagination import PAGE_SIZE, add_synthetic_rows, best_time
+from copy_loader import get_db_connection
+
+# (label, filters)
+SEARCHES = [
+    ("common employer", {"employer": "Google"}),
+    ("rare employer", {"employer": "Qualcomm Labs 1234"}),
+    ("inside a word", {"employer": "soft"}),
+    ("employer + status", {"employer": "Amazon", "status": "Denied"}),
+    ("job title", {"jobTitle": "Machine Learning"}),
+    ("job title prefix", {"jobTitle": "Data Sci"}),
+    ("search term", {"searchTerm": "deloitte"}),
+    ("case number", {"searchTerm": "I-SYN-00100"}),
+]
+
+
+def ilike_conditions(filters: dict) -> tuple:
+    """WHERE clause and parameters of h1b_filter_conditions' text filters"""
+    conditions, params = [], []
+    if filters.get("employer"):
+        conditions.append("employer_name ILIKE %s")
+        params.append(f"%{filters['employer']}%")
+    if filters.get("status"):
+        conditions.append("case_status = %s")
+        params.append(filters["status"])
+    if filters.get("jobTitle"):
+        conditions.append("job_title ILIKE %s")
+        params.append(f"%{filters['jobTitle']}%")
+    if filters.get("searchTerm"):
+        conditions.append("(employer_name ILIKE %s OR job_title ILIKE %s OR case_number ILIKE %s)")
+        params.extend([f"%{filters['searchTerm']}%"] * 3)
+    return " AND ".join(conditions) or "TRUE", params
+
+
+def ilike_page(cursor, filters: dict) -> tuple:
+    """Count and first page with ILIKE, scanning the table instead of the trigram indexes"""
+    where, params = ilike_conditions(filters)
+    cursor.execute("SET LOCAL enable_bitmapscan = off")
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM h1b_applications WHERE {where}", params)
+        total = cursor.fetchone()[0]
+        cursor.execute(f"SELECT id FROM h1b_applications WHERE {where} ORDER BY id DESC LIMIT %s",
+                       params + [PAGE_SIZE])
+        return total, [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.execute("SET LOCAL enable_bitmapscan = on")
+
+
+def time_ilike(cursor, filters: dict, repeat: int) -> tuple:
+    """Best time of ilike_page; returns (seconds, total)"""
+    best, total = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        total, _ = ilike_page(cursor, filters)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the trigram indexes against ILIKE scans.")
+    parser.add_argument("--dsn", help="Postgres connection string (default: POSTGRES_URL_NON_POOLING)")
+    parser.add_argument("--rows", type=int, default=1000000,
+                        help="Top h1b_applications up to this many rows with synthetic ones "
+                             "(default: 1000000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs, best is reported")
+    args = parser.parse_args()
+
+    conn = get_db_connection(args.dsn)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM h1b_applications")
+            existing = cursor.fetchone()[0]
+            if existing < args.rows:
+                started = time.perf_counter()
+                add_synthetic_rows(cursor, args.rows - existing)
+                cursor.execute("ANALYZE h1b_applications")
+                print(f"✅ Added {args.rows - existing:,} synthetic rows to {existing:,} "
+                      f"({time.perf_counter() - started:.1f}s)")
+            cursor.execute("SELECT COUNT(*) FROM h1b_applications")
+            print(f"📊 {cursor.fetchone()[0]:,} rows; first page of {PAGE_SIZE} with its total count, "
+                  f"best of {args.repeat}:\n")
+            print(f"  {'filter':18} {'ILIKE scan':>20} {'indexed':>20} {'keyset, no count':>17}")
+
+            for label, filters in SEARCHES:
+                scan_time, scan_total = time_ilike(cursor, filters, args.repeat)
+                index_time, result = best_time(
+                    cursor, "SELECT get_h1b_filtered_applications(%s, %s, 1)",
+                    (json.dumps(filters), PAGE_SIZE), args.repeat)
+                if result.get("error"):
+                    raise SystemExit(f"❌ {label}: {result}")
+                keyset_time, keyset_result = best_time(
+                    cursor, "SELECT get_h1b_filtered_applications_keyset(%s, %s)",
+                    (json.dumps(filters), PAGE_SIZE), args.repeat)
+                if [row["id"] for row in keyset_result["data"]] != [row["id"] for row in result["data"]]:
+                    raise SystemExit(f"❌ {label}: keyset and OFFSET first pages differ")
+                index_total = result["pagination"]["totalRecords"]
+                if index_total != scan_total:
+                    raise SystemExit(f"❌ {label}: {index_total:,} indexed matches, {scan_total:,} scanned")
+                print(f"  {label:18} {scan_time * 1000:8.1f} ms {scan_total:>9,} "
+                      f"{index_time * 1000:8.1f} ms {index_total:>9,} {keyset_time * 1000:13.1f} ms"
+                      f"  ({scan_time / index_time:.0f}x)")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
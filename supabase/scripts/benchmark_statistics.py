@@ -0,0 +1,188 @@
+"""
+Benchmark the rollup-backed statistics RPCs against table scans.
+
+Usage:
+    python benchmark_statistics.py --dsn postgresql://localhost/h1b [--doublings N] [--repeat N]
+
+Needs a database with h1b_applications and migrations 20261019 and 20261022
+applied. For each RPC the same answer is computed by scanning h1b_applications
+(the original 20240125 queries, with their errors fixed, ties broken by name
+and salaries annualized), checked against the rollup result, and both are
+timed. The table is then
+doubled --doublings times with copies of its rows under new case numbers,
+refreshing the rollups after each step, to show the scans growing with the
+table while the rollup reads stay flat; finally a small status update shows
+the cost of an incremental refresh. Everything runs in one transaction that is
+rolled back, so the database is left as it was.
+"""
+import argparse
+import json
+import time
+
+from copy_loader import get_db_connection
+
+SALARY = "COALESCE(annual_wage_from, annual_wage_to, 0)"
+CERTIFIED = "case_status IN ('CERTIFIED', 'CERTIFIED-WITHDRAWN')"
+
+# (label, rollup-backed call, equivalent table scan)
+CASES = [
+    ("get_h1b_statistics",
+     "SELECT get_h1b_statistics()",
+     # Any filter takes the scanning branch; salary >= 0 keeps every paid row
+     "SELECT get_h1b_statistics(p_min_salary => 0)"),
+    ("get_top_h1b_employers",
+     "SELECT get_top_h1b_employers(50, 0)",
+     f"""SELECT JSON_BUILD_OBJECT(
+           'data', JSON_AGG(JSON_BUILD_OBJECT('name', employer_name, 'count', application_count,
+                                              'averageSalary', avg_salary,
+                                              'certificationRate', cert_rate)
+                            ORDER BY application_count DESC, employer_name),
+           'totalCount', (SELECT COUNT(DISTINCT employer_name) FROM h1b_applications
+                          WHERE employer_name IS NOT NULL AND employer_name != ''))
+         FROM (SELECT employer_name, COUNT(*) AS application_count,
+                      ROUND(AVG({SALARY}), 0) AS avg_salary,
+                      ROUND(COUNT(*) FILTER (WHERE {CERTIFIED}) * 100.0 / COUNT(*), 2) AS cert_rate
+               FROM h1b_applications
+               WHERE employer_name IS NOT NULL AND employer_name != ''
+               GROUP BY employer_name
+               ORDER BY COUNT(*) DESC, employer_name
+               LIMIT 50) employer_stats"""),
+    ("get_h1b_salary_by_job_title",
+     "SELECT get_h1b_salary_by_job_title(NULL, 20)",
+     f"""SELECT JSON_AGG(JSON_BUILD_OBJECT('jobTitle', job_title, 'count', job_count,
+                                           'averageSalary', avg_salary, 'medianSalary', median_salary,
+                                           'minSalary', min_salary, 'maxSalary', max_salary)
+                         ORDER BY job_count DESC, job_title)
+         FROM (SELECT job_title, COUNT(*) AS job_count, ROUND(AVG(salary), 0) AS avg_salary,
+                      ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY salary)::NUMERIC, 0)
+                        AS median_salary,
+                      MIN(salary) AS min_salary, MAX(salary) AS max_salary
+               FROM (SELECT job_title, {SALARY} AS salary FROM h1b_applications
+                     WHERE job_title IS NOT NULL AND job_title != '' AND {SALARY} > 0) salary_data
+               GROUP BY job_title
+               HAVING COUNT(*) >= 5
+               ORDER BY COUNT(*) DESC, job_title
+               LIMIT 20) job_stats"""),
+    ("get_h1b_trends",
+     "SELECT get_h1b_trends(NULL, NULL, 'month')",
+     f"""SELECT JSON_AGG(JSON_BUILD_OBJECT('period', period, 'totalApplications', total_apps,
+                                           'certifiedApplications', certified_apps,
+                                           'certificationRate', cert_rate,
+                                           'averageSalary', avg_salary) ORDER BY period)
+         FROM (SELECT TO_CHAR((received_date AT TIME ZONE 'UTC')::DATE, 'YYYY-MM') AS period,
+                      COUNT(*) AS total_apps,
+                      COUNT(*) FILTER (WHERE {CERTIFIED}) AS certified_apps,
+                      ROUND(COUNT(*) FILTER (WHERE {CERTIFIED}) * 100.0 / COUNT(*), 2) AS cert_rate,
+                      ROUND(AVG({SALARY}), 0) AS avg_salary
+               FROM h1b_applications
+               WHERE received_date IS NOT NULL
+               GROUP BY 1) trend_data"""),
+    ("get_h1b_statistics_by_state",
+     "SELECT get_h1b_statistics_by_state()",
+     f"""SELECT JSON_AGG(JSON_BUILD_OBJECT('state', state, 'totalApplications', total_apps,
+                                           'averageSalary', avg_salary, 'certificationRate', cert_rate,
+                                           'topEmployer', top_employer)
+                         ORDER BY total_apps DESC, state)
+         FROM (SELECT s.state, s.total_apps, s.avg_salary, s.cert_rate,
+                      (SELECT employer_name FROM h1b_applications h2
+                       WHERE COALESCE(h2.worksite_state, h2.employer_state) = s.state
+                       GROUP BY employer_name
+                       ORDER BY COUNT(*) DESC, employer_name
+                       LIMIT 1) AS top_employer
+               FROM (SELECT COALESCE(worksite_state, employer_state) AS state, COUNT(*) AS total_apps,
+                            ROUND(AVG({SALARY}), 0) AS avg_salary,
+                            ROUND(COUNT(*) FILTER (WHERE {CERTIFIED}) * 100.0 / COUNT(*), 2)
+                              AS cert_rate
+                     FROM h1b_applications
+                     WHERE COALESCE(worksite_state, employer_state) IS NOT NULL
+                     GROUP BY 1
+                     HAVING COUNT(*) >= 10) s) state_stats"""),
+]
+
+COLUMNS = ("case_status, received_date, decision_date, visa_class, job_title, soc_code, soc_title, "
+           "full_time_position, begin_date, end_date, employer_name, employer_city, employer_state, "
+           "employer_postal_code, worksite_city, worksite_state, worksite_postal_code, "
+           "wage_rate_of_pay_from, wage_rate_of_pay_to, wage_unit_of_pay, prevailing_wage, pw_unit_of_pay, "
+           "annual_wage_from, annual_wage_to, annual_prevailing_wage")
+
+
+def best_time(cursor, sql: str, repeat: int):
+    """Run sql repeat times; returns (best seconds, first result)"""
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cursor.execute(sql)
+        value = cursor.fetchone()[0]
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        result = value if result is None else result
+    return best, result
+
+
+def refresh(cursor) -> tuple:
+    """refresh_h1b_statistics(); returns (seconds, counts)"""
+    started = time.perf_counter()
+    cursor.execute("SELECT refresh_h1b_statistics()")
+    return time.perf_counter() - started, cursor.fetchone()[0]
+
+
+def measure(cursor, repeat: int):
+    """Check every rollup-backed RPC against its scan and print both timings"""
+    cursor.execute("SELECT COUNT(*) FROM h1b_applications")
+    rows = cursor.fetchone()[0]
+    print(f"\n📊 {rows:,} rows (best of {repeat}):")
+    for label, rollup_sql, scan_sql in CASES:
+        scan_time, expected = best_time(cursor, scan_sql, repeat)
+        rollup_time, actual = best_time(cursor, rollup_sql, repeat)
+        if json.dumps(expected, sort_keys=True) != json.dumps(actual, sort_keys=True):
+            raise SystemExit(f"❌ {label}: rollup result differs from the table scan\n"
+                             f"  scan:   {json.dumps(expected)[:400]}\n"
+                             f"  rollup: {json.dumps(actual)[:400]}")
+        print(f"  {label:28}: scan {scan_time * 1000:8.1f} ms, rollups {rollup_time * 1000:7.1f} ms"
+              f"  ({scan_time / rollup_time:.0f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the statistics rollups against table scans.")
+    parser.add_argument("--dsn", help="Postgres connection string (default: POSTGRES_URL_NON_POOLING)")
+    parser.add_argument("--doublings", type=int, default=2,
+                        help="Times to double the table after the first measurement (default: 2)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs, best is reported")
+    parser.add_argument("--updates", type=int, default=1000,
+                        help="Rows whose status changes in the incremental refresh test (default: 1000)")
+    args = parser.parse_args()
+
+    conn = get_db_connection(args.dsn)
+    try:
+        with conn.cursor() as cursor:
+            # Start from rollups that match the table
+            seconds, counts = refresh(cursor)
+            print(f"✅ Rollups refreshed ({seconds:.2f}s, {counts['employers']} employers queued)")
+            measure(cursor, args.repeat)
+
+            for step in range(1, args.doublings + 1):
+                cursor.execute(f"INSERT INTO h1b_applications (case_number, {COLUMNS}) "
+                               f"SELECT case_number || '-x{step}', {COLUMNS} FROM h1b_applications")
+                seconds, counts = refresh(cursor)
+                print(f"\n🔄 Doubled the table; refresh of {counts['employers']} employers, "
+                      f"{counts['jobTitles']} job titles, {counts['days']} days and "
+                      f"{counts['salaries']} salaries took {seconds:.2f}s")
+                cursor.execute("ANALYZE h1b_applications")
+                measure(cursor, args.repeat)
+
+            # A small delta: flip the status of a few rows, as an overwrite upload would
+            cursor.execute("UPDATE h1b_applications SET case_status = 'WITHDRAWN' "
+                           "WHERE id IN (SELECT id FROM h1b_applications ORDER BY id LIMIT %s)",
+                           (args.updates,))
+            seconds, counts = refresh(cursor)
+            print(f"\n🔄 Incremental refresh after updating {args.updates} rows: {seconds:.3f}s "
+                  f"({counts['employers']} employers, {counts['days']} days, "
+                  f"{counts['salaries']} salaries)")
+            measure(cursor, 1)
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
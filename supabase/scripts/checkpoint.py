@@ -0,0 +1,77 @@
+"""
+SQLite ledger of committed upload batches, for resumable H1B uploads.
+
+Every batch that the database confirms is recorded as a committed row range
+(plus its first/last case_number) under the SHA-256 of the input file and the
+merge policy it was uploaded with. After a crash, `upload_to_supabase.py --resume`
+skips every range already committed for the same file and merge policy and
+continues with the first uncommitted batch; a range committed under 'skip' left
+existing rows untouched, so it doesn't count for an 'overwrite' rerun. Batches that are
+re-sent anyway (e.g. after changing --batch-size) are harmless because uploads
+are idempotent upserts.
+"""
+import hashlib
+import sqlite3
+from datetime import datetime, timezone
+
+DEFAULT_LEDGER_PATH = 'data/output/upload_ledger.sqlite'
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Hash a file in chunks so large inputs are never held in memory"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def open_ledger(ledger_path: str = DEFAULT_LEDGER_PATH) -> sqlite3.Connection:
+    """Open (and create if needed) the checkpoint ledger"""
+    conn = sqlite3.connect(ledger_path)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(committed_batches)")]
+    if columns and 'merge_policy' not in columns:
+        # Ledgers from before merge policies were recorded can't tell what a batch did
+        conn.execute("DROP TABLE committed_batches")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS committed_batches (
+            file_hash TEXT NOT NULL,
+            merge_policy TEXT NOT NULL,
+            start_row INTEGER NOT NULL,
+            end_row INTEGER NOT NULL,
+            first_case_number TEXT,
+            last_case_number TEXT,
+            committed_at TEXT NOT NULL,
+            PRIMARY KEY (file_hash, merge_policy, start_row, end_row)
+        )
+    """)
+    conn.commit()
+    return conn
+
+
+def reset_file(conn: sqlite3.Connection, file_hash: str, merge_policy: str):
+    """Forget every committed batch recorded for a file and merge policy"""
+    conn.execute("DELETE FROM committed_batches WHERE file_hash = ? AND merge_policy = ?",
+                 (file_hash, merge_policy))
+    conn.commit()
+
+
+def committed_ranges(conn: sqlite3.Connection, file_hash: str, merge_policy: str) -> list:
+    """Return the committed (start_row, end_row) ranges for a file and merge policy, sorted"""
+    rows = conn.execute(
+        "SELECT start_row, end_row FROM committed_batches "
+        "WHERE file_hash = ? AND merge_policy = ? ORDER BY start_row",
+        (file_hash, merge_policy),
+    )
+    return [(start, end) for start, end in rows]
+
+
+def mark_committed(conn: sqlite3.Connection, file_hash: str, merge_policy: str, start_row: int,
+                   end_row: int, first_case_number: str = None, last_case_number: str = None):
+    """Record a batch the database has confirmed"""
+    conn.execute(
+        "INSERT OR REPLACE INTO committed_batches VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (file_hash, merge_policy, start_row, end_row, first_case_number, last_case_number,
+         datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")),
+    )
+    conn.commit()
@@ -0,0 +1,153 @@
+"""
+Bulk loader that streams converted H1B records into Postgres with COPY.
+
+Instead of thousands of PostgREST insert requests, the converted Arrow table is
+written as CSV and streamed with COPY FROM STDIN into a temporary staging
+table, then merged into h1b_applications in a single transaction using the
+same merge policies as the upsert_h1b_applications RPC (skip, overwrite or
+changed).
+
+The connection string comes from --dsn or POSTGRES_URL_NON_POOLING (COPY needs
+a session connection, not the transaction pooler). Any Postgres with the
+h1b_applications table works, including a local one for testing:
+
+    python upload_to_supabase.py --method copy --dsn postgresql://localhost/h1b
+"""
+import io
+import os
+
+import psycopg2
+
+from upload_to_supabase import DB_COLUMNS, MERGE_POLICIES
+
+TARGET_TABLE = 'h1b_applications'
+STAGING_TABLE = 'h1b_applications_staging'
+
+# Rows per COPY chunk; bounds the size of each CSV buffer
+COPY_CHUNK_ROWS = 50000
+
+
+def get_db_connection(dsn: str = None):
+    """Open a psycopg2 connection from --dsn or the environment"""
+    dsn = dsn or os.getenv('POSTGRES_URL_NON_POOLING') or os.getenv('POSTGRES_URL')
+    if not dsn:
+        raise ValueError("Missing database connection string (POSTGRES_URL_NON_POOLING)")
+    return psycopg2.connect(dsn)
+
+
+def create_staging_table(cursor):
+    """Create a temp table with the loaded columns, typed like h1b_applications"""
+    columns = ', '.join(DB_COLUMNS)
+    cursor.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} ON COMMIT DROP AS
+        SELECT {columns} FROM {TARGET_TABLE} WITH NO DATA
+    """)
+
+
+def table_to_csv(db_table) -> io.BytesIO:
+    """Serialize an Arrow table of db columns as headerless CSV for COPY"""
+    import pyarrow.csv as pcsv
+
+    buffer = io.BytesIO()
+    pcsv.write_csv(db_table.select(DB_COLUMNS), buffer,
+                   write_options=pcsv.WriteOptions(include_header=False))
+    buffer.seek(0)
+    return buffer
+
+
+def copy_into_staging(cursor, db_table, chunk_rows: int = COPY_CHUNK_ROWS) -> int:
+    """Stream the converted table into the staging table chunk by chunk"""
+    copy_sql = (f"COPY {STAGING_TABLE} ({', '.join(DB_COLUMNS)}) "
+                "FROM STDIN WITH (FORMAT csv)")
+    staged = 0
+    for start in range(0, db_table.num_rows, chunk_rows):
+        chunk = db_table.slice(start, chunk_rows)
+        cursor.copy_expert(copy_sql, table_to_csv(chunk))
+        staged += chunk.num_rows
+        print(f"  ✓ {staged}/{db_table.num_rows} rows staged...")
+    return staged
+
+
+def merge_sql(merge_policy: str = 'skip') -> str:
+    """Build the staging -> h1b_applications merge for a merge policy
+
+    Mirrors upsert_h1b_applications: 'skip' leaves existing case numbers alone,
+    'overwrite' rewrites them and 'changed' rewrites only rows whose values differ.
+    """
+    if merge_policy not in MERGE_POLICIES:
+        raise ValueError(f"Unknown merge policy: {merge_policy}")
+
+    columns = ', '.join(DB_COLUMNS)
+    data_columns = [column for column in DB_COLUMNS if column != 'case_number']
+
+    if merge_policy == 'skip':
+        on_conflict = "DO NOTHING"
+    else:
+        assignments = ', '.join(f"{column} = EXCLUDED.{column}" for column in data_columns)
+        on_conflict = f"DO UPDATE SET {assignments}, updated_at = NOW()"
+        if merge_policy == 'changed':
+            current = ', '.join(f"t.{column}" for column in data_columns)
+            incoming = ', '.join(f"EXCLUDED.{column}" for column in data_columns)
+            on_conflict += f" WHERE ({current}) IS DISTINCT FROM ({incoming})"
+
+    # Staging rows are in file order, so the last occurrence of a case number wins
+    return f"""
+        WITH incoming AS (
+            SELECT DISTINCT ON (case_number) {columns}
+            FROM {STAGING_TABLE}
+            WHERE case_number IS NOT NULL
+            ORDER BY case_number, ctid DESC
+        ),
+        merged AS (
+            INSERT INTO {TARGET_TABLE} AS t ({columns})
+            SELECT {columns} FROM incoming
+            ON CONFLICT (case_number) {on_conflict}
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted)
+        FROM merged
+    """
+
+
+def merge_staging(cursor, merge_policy: str = 'skip'):
+    """Merge staged rows into h1b_applications; returns (inserted, updated)"""
+    cursor.execute(merge_sql(merge_policy))
+    inserted, updated = cursor.fetchone()
+    return inserted, updated
+
+
+def count_left_out(cursor):
+    """Staged rows the merge never writes: (without a case number, repeats of a case number)"""
+    cursor.execute(f"SELECT COUNT(*) FILTER (WHERE case_number IS NULL), "
+                   f"COUNT(case_number) - COUNT(DISTINCT case_number) FROM {STAGING_TABLE}")
+    invalid, duplicates = cursor.fetchone()
+    return invalid, duplicates
+
+
+def delete_case_numbers(cursor, case_numbers: list) -> int:
+    """Delete the given case numbers (e.g. missing from a release); returns rows deleted"""
+    cursor.execute(f"DELETE FROM {TARGET_TABLE} WHERE case_number = ANY(%s)", (list(case_numbers),))
+    return cursor.rowcount
+
+
+def copy_h1b_data(conn, db_table, merge_policy: str = 'skip',
+                  chunk_rows: int = COPY_CHUNK_ROWS, delete: list = None) -> dict:
+    """Load a converted Arrow table into h1b_applications in one transaction
+
+    Returns the same counts as upsert_h1b_applications, plus 'deleted'.
+    Case numbers in `delete` are deleted in the same transaction.
+    """
+    try:
+        with conn.cursor() as cursor:
+            create_staging_table(cursor)
+            staged = copy_into_staging(cursor, db_table, chunk_rows)
+            invalid, duplicates = count_left_out(cursor)
+            inserted, updated = merge_staging(cursor, merge_policy)
+            deleted = delete_case_numbers(cursor, delete) if delete else 0
+        conn.commit()
+        return {'inserted': inserted, 'updated': updated,
+                'unchanged': staged - invalid - duplicates - inserted - updated,
+                'skipped_invalid': invalid, 'duplicates': duplicates, 'deleted': deleted}
+    except Exception:
+        conn.rollback()
+        raise
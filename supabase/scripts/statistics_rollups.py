@@ -0,0 +1,63 @@
+"""
+Refresh the H1B dashboard statistics rollups after a load.
+
+The statistics RPCs (get_h1b_statistics, get_top_h1b_employers,
+get_h1b_salary_by_job_title, get_h1b_trends, get_h1b_statistics_by_state) read
+pre-aggregated rollup tables instead of scanning h1b_applications (migration
+20261019). Triggers on h1b_applications queue the employers, job titles,
+received days and salaries each write touches; refresh_h1b_statistics()
+recomputes just those keys, so a load is reflected at a cost proportional to
+what it changed. The uploaders call refresh_statistics() after every load.
+
+To rebuild every rollup from scratch (e.g. after a TRUNCATE, which the
+triggers don't see):
+
+    python statistics_rollups.py --rebuild --dsn postgresql://localhost/h1b
+"""
+import argparse
+import sys
+import time
+
+
+def refresh_statistics(rpc, rebuild: bool = False):
+    """Run refresh_h1b_statistics through rpc (rest_rpc or sql_rpc)
+
+    Prints and returns the refreshed key counts, or None if the refresh failed;
+    the load itself is kept either way and the keys stay queued for the next run.
+    """
+    started = time.perf_counter()
+    try:
+        counts = rpc('refresh_h1b_statistics', {'rebuild': rebuild})
+    except Exception as e:
+        print(f"⚠️  Could not refresh statistics rollups: {str(e)}")
+        return None
+    elapsed = time.perf_counter() - started
+    action = "Rebuilt" if counts['rebuild'] else "Refreshed"
+    print(f"📊 {action} statistics rollups in {elapsed:.2f}s: {counts['employers']} employers, "
+          f"{counts['jobTitles']} job titles, {counts['states']} states, {counts['days']} days, "
+          f"{counts['salaries']} salaries")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the H1B statistics rollups.")
+    parser.add_argument("--dsn", help="Postgres connection string (default: POSTGRES_URL_NON_POOLING)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Recompute every rollup instead of only the keys changed since the "
+                             "last refresh")
+    args = parser.parse_args()
+
+    from copy_loader import get_db_connection
+    from upload_verification import sql_rpc
+
+    conn = get_db_connection(args.dsn)
+    try:
+        counts = refresh_statistics(sql_rpc(conn), args.rebuild)
+    finally:
+        conn.close()
+    if counts is None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
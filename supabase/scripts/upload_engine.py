@@ -0,0 +1,117 @@
+"""
+Concurrent batch upload engine for the H1B uploaders.
+
+Batches are sent from a thread pool with a bounded number of batches in flight:
+the batch iterator is only advanced when a slot frees up, so memory stays at a
+few batches and a slow server naturally throttles the reader (backpressure).
+Transient failures (rate limits, 5xx, timeouts, dropped connections) are
+retried with exponential backoff and jitter. Results are reported in batch
+order, regardless of which worker finishes first.
+
+Retrying is safe because every batch is an idempotent upsert on case_number.
+"""
+import random
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 30.0
+
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+# Error text that indicates the server is pushing back or the network hiccupped,
+# for errors that don't carry their HTTP status. Status codes only count after
+# "HTTP" or "status", not anywhere in the message (row counts, case numbers).
+TRANSIENT_ERROR_PATTERN = re.compile(
+    r"\b(?:http(?:/[\d.]+)?|status(?: code)?)[\s:=]*(?:429|50[0234])\b|"
+    r"too many requests|rate limit|timeout|timed out|bad gateway|service unavailable|gateway time-?out|"
+    r"connection (?:reset|aborted|refused)|server disconnected|temporarily unavailable",
+    re.IGNORECASE,
+)
+
+
+def error_status(error: Exception):
+    """HTTP status of a failed request, or None when the error doesn't carry one
+
+    Read from the response (httpx.HTTPStatusError) or the error itself
+    (status_code, or postgrest's APIError code, which is the status when the
+    response body wasn't a PostgREST error).
+    """
+    response = getattr(error, 'response', None)
+    for status in (getattr(response, 'status_code', None), getattr(error, 'status_code', None),
+                   getattr(error, 'code', None)):
+        if isinstance(status, int) and 100 <= status <= 599:
+            return status
+    return None
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Return True if an upload error is worth retrying"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    status = error_status(error)
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    return TRANSIENT_ERROR_PATTERN.search(str(error)) is not None
+
+
+def backoff_delay(attempt: int, base_delay: float = DEFAULT_BASE_DELAY,
+                  max_delay: float = DEFAULT_MAX_DELAY) -> float:
+    """Exponential backoff with full jitter for the given retry attempt (1-based)"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+
+def send_with_retries(send_batch, batch, max_retries: int = DEFAULT_MAX_RETRIES,
+                      base_delay: float = DEFAULT_BASE_DELAY, sleep=time.sleep):
+    """Call send_batch(batch), retrying transient errors with exponential backoff
+
+    Returns (result, attempts). Non-transient errors, or a transient error on
+    the last attempt, are raised to the caller with an `attempts` attribute.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return send_batch(batch), attempt
+        except Exception as e:
+            if attempt > max_retries or not is_transient_error(e):
+                e.attempts = attempt
+                raise
+            sleep(backoff_delay(attempt, base_delay))
+
+
+def upload_batches(send_batch, batches, workers: int = DEFAULT_WORKERS, max_in_flight: int = None,
+                   max_retries: int = DEFAULT_MAX_RETRIES, base_delay: float = DEFAULT_BASE_DELAY):
+    """Send batches concurrently and yield outcomes in batch order
+
+    send_batch is called from worker threads with one batch at a time.
+    At most max_in_flight batches (default: 2 x workers) are submitted but not
+    yet reported. Yields (batch_num, batch, result, error, attempts) where
+    exactly one of result/error is set.
+    """
+    max_in_flight = max_in_flight or workers * 2
+    pending = deque()
+
+    def report(item):
+        batch_num, batch, future = item
+        try:
+            result, attempts = future.result()
+            return batch_num, batch, result, None, attempts
+        except Exception as e:
+            return batch_num, batch, None, e, getattr(e, 'attempts', 1)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch_num, batch in enumerate(batches, start=1):
+            # Backpressure: don't read the next batch until a slot frees up
+            while len(pending) >= max_in_flight:
+                yield report(pending.popleft())
+
+            future = executor.submit(send_with_retries, send_batch, batch, max_retries, base_delay)
+            pending.append((batch_num, batch, future))
+
+        while pending:
+            yield report(pending.popleft())
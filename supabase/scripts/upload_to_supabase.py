@@ -2,12 +2,15 @@
 Script to upload H1B data to Supabase database.
 This script creates the necessary table and uploads the parsed H1B data.
 """
+import argparse
 import os
 import json
 import sys
 from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
 from dotenv import load_dotenv
 from supabase import create_client, Client
+import numpy as np
 import pandas as pd
 
 # Load environment variables from .env file
@@ -76,6 +79,10 @@ CREATE TABLE IF NOT EXISTS h1b_applications (
     wage_rate_of_pay_to NUMERIC,
     wage_unit_of_pay TEXT,
     prevailing_wage NUMERIC,
+    pw_unit_of_pay TEXT,
+    annual_wage_from NUMERIC,
+    annual_wage_to NUMERIC,
+    annual_prevailing_wage NUMERIC,
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
@@ -86,6 +93,15 @@ CREATE INDEX IF NOT EXISTS idx_h1b_case_status ON h1b_applications(case_status);
 CREATE INDEX IF NOT EXISTS idx_h1b_job_title ON h1b_applications(job_title);
 CREATE INDEX IF NOT EXISTS idx_h1b_decision_date ON h1b_applications(decision_date);
 CREATE INDEX IF NOT EXISTS idx_h1b_wage_rate ON h1b_applications(wage_rate_of_pay_from);
+CREATE INDEX IF NOT EXISTS idx_h1b_applications_annual_salary_id ON h1b_applications
+    ((COALESCE(annual_wage_from, annual_wage_to, 0)), id);
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_h1b_applications_employer_name_trgm ON h1b_applications
+    USING GIN (employer_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_h1b_applications_job_title_trgm ON h1b_applications
+    USING GIN (job_title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_h1b_applications_case_number_trgm ON h1b_applications
+    USING GIN (case_number gin_trgm_ops);
 
 -- Enable Row Level Security (RLS)
 ALTER TABLE h1b_applications ENABLE ROW LEVEL SECURITY;
@@ -114,36 +130,100 @@ CREATE POLICY IF NOT EXISTS "Allow public read access" ON h1b_applications
         return False
 
 
+# Parsed JSON column -> h1b_applications column
+FIELD_MAPPING = {
+    'CASE_NUMBER': 'case_number',
+    'CASE_STATUS': 'case_status',
+    'RECEIVED_DATE': 'received_date',
+    'DECISION_DATE': 'decision_date',
+    'VISA_CLASS': 'visa_class',
+    'JOB_TITLE': 'job_title',
+    'SOC_CODE': 'soc_code',
+    'SOC_TITLE': 'soc_title',
+    'FULL_TIME_POSITION': 'full_time_position',
+    'BEGIN_DATE': 'begin_date',
+    'END_DATE': 'end_date',
+    'EMPLOYER_NAME': 'employer_name',
+    'EMPLOYER_CITY': 'employer_city',
+    'EMPLOYER_STATE': 'employer_state',
+    'EMPLOYER_POSTAL_CODE': 'employer_postal_code',
+    'WORKSITE_CITY': 'worksite_city',
+    'WORKSITE_STATE': 'worksite_state',
+    'WORKSITE_POSTAL_CODE': 'worksite_postal_code',
+    'WAGE_RATE_OF_PAY_FROM': 'wage_rate_of_pay_from',
+    'WAGE_RATE_OF_PAY_TO': 'wage_rate_of_pay_to',
+    'WAGE_UNIT_OF_PAY': 'wage_unit_of_pay',
+    'PREVAILING_WAGE': 'prevailing_wage',
+    'PW_UNIT_OF_PAY': 'pw_unit_of_pay'
+}
+
+NUMERIC_FIELDS = ['WAGE_RATE_OF_PAY_FROM', 'WAGE_RATE_OF_PAY_TO', 'PREVAILING_WAGE']
+POSTAL_CODE_FIELDS = ['EMPLOYER_POSTAL_CODE', 'WORKSITE_POSTAL_CODE']
+
+# Pay periods per year for each unit of pay (lowercased), on DOL's 2080-hour year
+ANNUAL_PAY_PERIODS = {'hour': 2080, 'week': 52, 'bi-weekly': 26, 'month': 12, 'year': 1}
+
+# Annualized column -> (wage column, unit column). A missing pw_unit_of_pay falls
+# back to wage_unit_of_pay.
+ANNUAL_WAGE_COLUMNS = {
+    'annual_wage_from': ('wage_rate_of_pay_from', 'wage_unit_of_pay'),
+    'annual_wage_to': ('wage_rate_of_pay_to', 'wage_unit_of_pay'),
+    'annual_prevailing_wage': ('prevailing_wage', 'pw_unit_of_pay'),
+}
+
+CENT = Decimal('0.01')
+
+# Every h1b_applications column the uploaders write
+DB_COLUMNS = list(FIELD_MAPPING.values()) + list(ANNUAL_WAGE_COLUMNS)
+
+
+def round_cents(wage, periods):
+    """wage * periods rounded to cents, half away from zero
+
+    Same as ROUND(wage * periods, 2) on the NUMERIC wage in h1b_annualize_wage
+    (migration 20261022): the wage is taken at the decimal value it is uploaded as.
+    """
+    product = Decimal(str(float(wage))) * int(periods)
+    return float(product.quantize(CENT, rounding=ROUND_HALF_UP))
+
+
+def annualize_wage(wage, unit):
+    """Annual equivalent of a wage paid per unit, rounded to cents
+
+    None when the wage is missing or the unit isn't one of ANNUAL_PAY_PERIODS.
+    """
+    periods = ANNUAL_PAY_PERIODS.get(unit.strip().lower()) if isinstance(unit, str) else None
+    if wage is None or periods is None:
+        return None
+    return round_cents(wage, periods)
+
+
+def annualize_wages(wages, units):
+    """Vectorized annualize_wage over Arrow columns of float64 wages and text units"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    keys = pc.utf8_lower(pc.utf8_trim_whitespace(units))
+    periods = pc.take(pa.array(list(ANNUAL_PAY_PERIODS.values()), type=pa.float64()),
+                      pc.index_in(keys, value_set=pa.array(list(ANNUAL_PAY_PERIODS))))
+    wages = wages.to_numpy(zero_copy_only=False)
+    periods = periods.to_numpy(zero_copy_only=False)
+    annual = wages * periods
+    rounded = np.round(annual, 2)
+    # np.round rounds the binary product half to even; within float error of half a
+    # cent that can differ from round_cents, so those few rows are redone exactly
+    cents = np.abs(annual) * 100
+    near_half = np.abs(cents - np.floor(cents) - 0.5) < 1e-9 * np.maximum(cents, 1)
+    for i in np.flatnonzero(near_half):
+        rounded[i] = round_cents(wages[i], periods[i])
+    return pa.array(rounded, type=pa.float64(), from_pandas=True)
+
+
 def convert_record_for_db(record):
     """Convert a JSON record to database format"""
     # Focus on essential fields that match our simplified table schema
     db_record = {}
-
-    # Essential fields mapping
-    field_mapping = {
-        'CASE_NUMBER': 'case_number',
-        'CASE_STATUS': 'case_status',
-        'RECEIVED_DATE': 'received_date',
-        'DECISION_DATE': 'decision_date',
-        'VISA_CLASS': 'visa_class',
-        'JOB_TITLE': 'job_title',
-        'SOC_CODE': 'soc_code',
-        'SOC_TITLE': 'soc_title',
-        'FULL_TIME_POSITION': 'full_time_position',
-        'BEGIN_DATE': 'begin_date',
-        'END_DATE': 'end_date',
-        'EMPLOYER_NAME': 'employer_name',
-        'EMPLOYER_CITY': 'employer_city',
-        'EMPLOYER_STATE': 'employer_state',
-        'EMPLOYER_POSTAL_CODE': 'employer_postal_code',
-        'WORKSITE_CITY': 'worksite_city',
-        'WORKSITE_STATE': 'worksite_state',
-        'WORKSITE_POSTAL_CODE': 'worksite_postal_code',
-        'WAGE_RATE_OF_PAY_FROM': 'wage_rate_of_pay_from',
-        'WAGE_RATE_OF_PAY_TO': 'wage_rate_of_pay_to',
-        'WAGE_UNIT_OF_PAY': 'wage_unit_of_pay',
-        'PREVAILING_WAGE': 'prevailing_wage'
-    }
+    field_mapping = FIELD_MAPPING
 
     for json_key, db_key in field_mapping.items():
         value = record.get(json_key)
@@ -159,116 +239,362 @@ def convert_record_for_db(record):
             except:
                 db_record[db_key] = None
         # Handle numeric fields
-        elif json_key in ['WAGE_RATE_OF_PAY_FROM', 'WAGE_RATE_OF_PAY_TO', 'PREVAILING_WAGE']:
+        elif json_key in NUMERIC_FIELDS:
             try:
                 db_record[db_key] = float(value) if value is not None else None
             except:
                 db_record[db_key] = None
         # Handle postal codes as text
-        elif json_key in ['EMPLOYER_POSTAL_CODE', 'WORKSITE_POSTAL_CODE']:
+        elif json_key in POSTAL_CODE_FIELDS:
             db_record[db_key] = str(value) if value is not None else None
         else:
             # Default: convert to string
             db_record[db_key] = str(value) if value is not None else None
 
+    for db_key, (wage_key, unit_key) in ANNUAL_WAGE_COLUMNS.items():
+        unit = db_record[unit_key] or db_record['wage_unit_of_pay']
+        db_record[db_key] = annualize_wage(db_record[wage_key], unit)
+
     return db_record
 
 
-def upload_h1b_data(supabase: Client, json_file_path: str, batch_size: int = 100):
-    """Upload H1B data from JSON file to Supabase"""
+def column_to_arrow(values):
+    """Build an Arrow array from one column of parsed values
+
+    Mixed-type columns (e.g. postal codes that are ints in some rows and text
+    in others) are stringified value by value, like str(value) in
+    convert_record_for_db.
+    """
+    import pyarrow as pa
+
+    try:
+        return pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([None if value is None else str(value) for value in values],
+                        type=pa.string())
+
+
+def records_to_table(records: list):
+    """Build an Arrow table of the mapped columns from JSON records"""
+    import pyarrow as pa
+
+    columns = {
+        json_key: column_to_arrow([record.get(json_key) for record in records])
+        for json_key in FIELD_MAPPING
+    }
+    return pa.table(columns)
+
+
+def blank_to_null(column):
+    """Replace empty and whitespace-only strings with nulls"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    is_blank = pc.equal(pc.utf8_trim_whitespace(column), '')
+    return pc.if_else(is_blank, pa.scalar(None, type=column.type), column)
+
+
+def convert_table_for_db(table):
+    """Convert a whole Arrow table of parsed records to database columns at once
+
+    Vectorized equivalent of convert_record_for_db: blank/whitespace values
+    become null, wages are coerced to float64, dates become ISO strings (or
+    null when they are not text/timestamps) and every other column, postal
+    codes included, is cast to text; the annual_* wages are then derived from
+    the wages and their units. Returns an Arrow table keyed by the
+    h1b_applications column names (DB_COLUMNS).
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    arrays = []
+    for json_key in FIELD_MAPPING:
+        if json_key not in table.column_names:
+            arrays.append(pa.nulls(table.num_rows, type=pa.float64() if json_key in NUMERIC_FIELDS
+                                   else pa.string()))
+            continue
+
+        column = table.column(json_key)
+        if pa.types.is_dictionary(column.type):
+            column = column.cast(column.type.value_type)
+        if pa.types.is_large_string(column.type):
+            column = column.cast(pa.string())
+
+        if json_key in NUMERIC_FIELDS:
+            if pa.types.is_string(column.type):
+                column = blank_to_null(column)
+                try:
+                    column = column.cast(pa.float64())
+                except pa.ArrowInvalid:
+                    # Unparseable wages become null, like float() failing per record
+                    column = pa.array(pd.to_numeric(column.to_pandas(), errors='coerce'),
+                                      type=pa.float64(), from_pandas=True)
+            elif pa.types.is_null(column.type) or pa.types.is_integer(column.type) \
+                    or pa.types.is_floating(column.type):
+                column = column.cast(pa.float64())
+            else:
+                column = pa.nulls(len(column), type=pa.float64())
+        elif json_key.endswith('_DATE'):
+            if pa.types.is_timestamp(column.type):
+                # Same text as the JSON output, e.g. 2025-06-20T00:00:00.000
+                column = column.cast(pa.timestamp('ms')).cast(pa.string())
+                column = pc.replace_substring(column, ' ', 'T', max_replacements=1)
+            elif pa.types.is_string(column.type):
+                column = blank_to_null(column)
+            else:
+                column = pa.nulls(len(column), type=pa.string())
+        else:
+            column = blank_to_null(column.cast(pa.string()))
+        arrays.append(column)
+
+    columns = dict(zip(FIELD_MAPPING.values(), arrays))
+    for db_key, (wage_key, unit_key) in ANNUAL_WAGE_COLUMNS.items():
+        units = pc.coalesce(columns[unit_key], columns['wage_unit_of_pay'])
+        columns[db_key] = annualize_wages(columns[wage_key], units)
+    return pa.table(columns)
+
+
+def load_table(file_path: str):
+    """Load a parsed output file as an Arrow table ready for convert_table_for_db"""
+    if file_path.endswith('.parquet'):
+        table = read_parquet_table(file_path)
+        return table.select([name for name in FIELD_MAPPING if name in table.column_names])
+    return records_to_table(load_records(file_path))
+
+
+def read_parquet_table(file_path: str):
+    """Memory-map a Parquet file written by parser.py and return it as an Arrow table"""
+    import pyarrow.parquet as pq
+
+    return pq.read_table(file_path, memory_map=True)
+
+
+def load_records(file_path: str) -> list:
+    """Load parsed H1B records from a JSON array or NDJSON file"""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        if file_path.endswith('.ndjson'):
+            return [json.loads(line) for line in file if line.strip()]
+        return json.load(file)
+
+
+MERGE_POLICIES = ('skip', 'overwrite', 'changed')
+
+# Counts upsert_h1b_applications and copy_h1b_data report. Rows without a case
+# number and earlier occurrences of a repeated case number are never written.
+UPSERT_COUNTS = ('inserted', 'updated', 'unchanged', 'skipped_invalid', 'duplicates')
+
+
+def print_upsert_counts(counts: dict):
+    """Print the UPSERT_COUNTS lines of an upload summary"""
+    print(f"Inserted: {counts['inserted']}")
+    print(f"Updated: {counts['updated']}")
+    print(f"Unchanged: {counts['unchanged']}")
+    print(f"Skipped (no case number): {counts['skipped_invalid']}")
+    print(f"Duplicates (repeated case number, last kept): {counts['duplicates']}")
+
+
+def upsert_batch(supabase: Client, batch: list, merge_policy: str = 'skip') -> dict:
+    """Upsert one batch keyed on case_number through the upsert_h1b_applications RPC
+
+    Returns the UPSERT_COUNTS reported by the database.
+    """
+    result = supabase.rpc('upsert_h1b_applications', {
+        'records': batch,
+        'merge_policy': merge_policy,
+    }).execute()
+    return result.data
+
+
+def upload_h1b_data(supabase: Client, json_file_path: str, batch_size: int = None,
+                    merge_policy: str = 'skip', workers: int = 4, max_in_flight: int = None,
+                    resume: bool = False, ledger_path: str = None, max_batch_bytes: int = None,
+                    target_latency: float = None, stats_path: str = None, summary: dict = None,
+                    delete: list = None):
+    """Upload H1B data from JSON file to Supabase
+
+    Each batch is upserted on case_number, so re-running a file that is mostly
+    loaded costs one request per batch instead of one per duplicate row.
+    merge_policy chooses what happens to existing case numbers: 'skip',
+    'overwrite' or 'changed' (rewrite only rows whose values differ).
+
+    Batches are cut by serialized size and the size adapts to request latency
+    and errors (see adaptive_batcher.py); pass batch_size for a fixed row
+    count instead. A batch rejected as too large is split in half and resent.
+    Per-attempt batch stats are written to stats_path if given.
+
+    Batches are sent by `workers` threads with at most `max_in_flight` batches
+    outstanding (see upload_engine.py); transient errors are retried with
+    exponential backoff and progress is printed in batch order.
+
+    Committed batches are recorded in a checkpoint ledger (see checkpoint.py).
+    With resume=True, rows already committed for the same input file and
+    merge policy are skipped; otherwise those checkpoints are cleared and it
+    starts over.
+
+    If a summary dict is passed it is filled with the converted rows'
+    local_summary() for verify_upload, less the case numbers in `delete`,
+    which the caller deletes afterwards.
+
+    Returns True when every batch was committed.
+    """
+    from adaptive_batcher import (DEFAULT_MAX_BYTES, DEFAULT_TARGET_LATENCY, AdaptiveBatcher,
+                                  is_payload_too_large)
+    from checkpoint import (DEFAULT_LEDGER_PATH, committed_ranges, file_sha256, mark_committed,
+                            open_ledger, reset_file)
+    from upload_engine import upload_batches
+
     print(f"Loading H1B data from {json_file_path}...")
 
     try:
-        with open(json_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
+        table = load_table(json_file_path)
 
-        print(f"Loaded {len(data)} records from JSON file")
+        print(f"Loaded {table.num_rows} records from {json_file_path}")
 
-        # Convert records for database
+        # Convert all records for the database in one vectorized pass
         print("Converting records for database...")
-        db_records = []
-        for i, record in enumerate(data):
-            try:
-                db_record = convert_record_for_db(record)
-                db_records.append(db_record)
-            except Exception as e:
-                print(f"Warning: Error converting record {i}: {str(e)}")
-                continue
+        db_table = convert_table_for_db(table)
+
+        print(f"Successfully converted {db_table.num_rows} records")
+        if summary is not None:
+            from upload_verification import local_summary
+            summary.update(local_summary(db_table, delete, merge_policy))
+
+        # Checkpoint ledger for --resume
+        ledger = open_ledger(ledger_path or DEFAULT_LEDGER_PATH)
+        file_hash = file_sha256(json_file_path)
+        if resume:
+            done = committed_ranges(ledger, file_hash, merge_policy)
+        else:
+            reset_file(ledger, file_hash, merge_policy)
+            done = []
 
-        print(f"Successfully converted {len(db_records)} records")
+        batcher = AdaptiveBatcher(max_bytes=max_batch_bytes or DEFAULT_MAX_BYTES,
+                                  target_latency=target_latency or DEFAULT_TARGET_LATENCY,
+                                  fixed_rows=batch_size)
+        timed_upsert = batcher.timed(lambda records: upsert_batch(supabase, records, merge_policy))
 
         # Upload in batches
-        total_uploaded = 0
+        totals = dict.fromkeys(UPSERT_COUNTS, 0)
         total_errors = 0
+        total_skipped = sum(end - start for start, end in done)
+        total_sent = 0
 
-        for i in range(0, len(db_records), batch_size):
-            batch = db_records[i:i + batch_size]
-            batch_num = (i // batch_size) + 1
-            total_batches = (len(db_records) + batch_size - 1) // batch_size
-
-            print(
-                f"Uploading batch {batch_num}/{total_batches} ({len(batch)} records)...")
+        def pending_batches():
+            """Yield ((start, end, nbytes), records) for rows not yet committed"""
+            for start, end, nbytes in batcher.iter_ranges(db_table, done):
+                yield (start, end, nbytes), db_table.slice(start, end - start).to_pylist()
 
+        def send_split(records, nbytes):
+            """Upsert records, halving the batch while the server says it is too large"""
             try:
-                # Insert batch
-                result = supabase.table(
-                    'h1b_applications').insert(batch).execute()
-
-                if result.data:
-                    uploaded_count = len(result.data)
-                    total_uploaded += uploaded_count
-                    print(
-                        f"✅ Successfully uploaded {uploaded_count} records in batch {batch_num}")
-                else:
-                    print(f"⚠️ No data returned for batch {batch_num}")
-
+                return timed_upsert(records, nbytes)
             except Exception as e:
-                error_msg = str(e)
-                print(f"❌ Error uploading batch {batch_num}: {error_msg}")
-                total_errors += len(batch)
-
-                # If it's a duplicate key error, try individual inserts
-                if 'duplicate key' in error_msg.lower() or 'unique constraint' in error_msg.lower():
-                    print(
-                        f"Attempting individual inserts for batch {batch_num} due to duplicates...")
-                    for j, record in enumerate(batch):
-                        try:
-                            result = supabase.table(
-                                'h1b_applications').insert(record).execute()
-                            if result.data:
-                                total_uploaded += 1
-                                total_errors -= 1  # Subtract from error count since this succeeded
-                        except Exception as individual_error:
-                            if 'duplicate key' not in str(individual_error).lower():
-                                print(
-                                    f"Error inserting individual record {j}: {str(individual_error)}")
-                            # Skip duplicates silently
-                            pass
+                if not is_payload_too_large(e) or len(records) < 2:
+                    raise
+                half = len(records) // 2
+                left = send_split(records[:half], nbytes // 2)
+                right = send_split(records[half:], nbytes - nbytes // 2)
+                return {key: left.get(key, 0) + right.get(key, 0) for key in totals}
+
+        def send_batch(item):
+            (_, _, nbytes), batch = item
+            return send_split(batch, nbytes)
+
+        if done:
+            print(f"Resuming: {total_skipped} rows already committed for this file")
+        sizing = f"{batch_size} rows" if batch_size else "adaptive"
+        print(f"Upserting with {workers} workers (policy: {merge_policy}, batch size: {sizing})...")
+
+        outcomes = upload_batches(send_batch, pending_batches(),
+                                  workers=workers, max_in_flight=max_in_flight)
+        try:
+            for batch_num, ((start, end, nbytes), batch), counts, error, attempts in outcomes:
+                total_sent += len(batch)
+                progress = f"{total_skipped + total_sent}/{db_table.num_rows}"
+                retry_note = f" after {attempts} attempts" if attempts > 1 else ""
+                if error is not None:
+                    print(f"❌ Error uploading batch {batch_num} ({progress}){retry_note}: {str(error)}")
+                    total_errors += len(batch)
+                    continue
+
+                mark_committed(ledger, file_hash, merge_policy, start, end,
+                               batch[0]['case_number'], batch[-1]['case_number'])
+                for key in totals:
+                    totals[key] += counts.get(key, 0)
+                print(
+                    f"✅ Batch {batch_num} ({progress}, {len(batch)} rows, {nbytes // 1024} KB): "
+                    f"{counts.get('inserted', 0)} inserted, {counts.get('updated', 0)} updated, "
+                    f"{counts.get('unchanged', 0)} unchanged{retry_note}")
+        finally:
+            ledger.close()
+
+        batch_stats = batcher.summary()
+        if 'mean_rows' in batch_stats:
+            print(f"\n📊 Batch sizing: {batch_stats['attempts']} requests, "
+                  f"{batch_stats['errors']} failed, avg {batch_stats['mean_rows']:.0f} rows / "
+                  f"{batch_stats['mean_bytes'] // 1024} KB in {batch_stats['mean_latency']:.2f}s, "
+                  f"final budget {batch_stats['final_target_bytes'] // 1024} KB")
+        if stats_path:
+            batcher.write_stats(stats_path)
+            print(f"Batch stats saved to {stats_path}")
 
         print(f"\n📊 Upload Summary:")
-        print(f"Total records processed: {len(db_records)}")
-        print(f"Successfully uploaded: {total_uploaded}")
-        print(f"Errors/Duplicates: {total_errors}")
-        print(f"Success rate: {(total_uploaded / len(db_records) * 100):.1f}%")
+        print(f"Total records processed: {db_table.num_rows}")
+        print(f"Skipped (already committed): {total_skipped}")
+        print_upsert_counts(totals)
+        print(f"Errors: {total_errors}")
 
-        return total_uploaded > 0
+        # An empty delta (nothing changed since the last release) is a success too
+        return total_errors == 0
 
     except Exception as e:
         print(f"❌ Error loading or uploading data: {str(e)}")
         return False
 
 
-def verify_upload(supabase: Client):
-    """Verify the uploaded data"""
+def is_delta_file(file_path: str) -> bool:
+    """Return True for parser.py --delta output (*.delta.ndjson / *.delta.parquet)"""
+    return '.delta.' in os.path.basename(file_path)
+
+
+def missing_file_for(file_path: str):
+    """Return the missing case list parser.py wrote alongside a delta file, if any"""
+    if not is_delta_file(file_path):
+        return None
+    missing_path = file_path[:file_path.rindex('.delta.')] + '.missing.json'
+    return missing_path if os.path.exists(missing_path) else None
+
+
+def load_case_numbers(path: str) -> list:
+    """Load a JSON array of case numbers"""
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def delete_cases(supabase: Client, case_numbers: list, batch_size: int = 100) -> int:
+    """Delete case numbers in batches; returns rows deleted"""
+    deleted = 0
+    for i in range(0, len(case_numbers), batch_size):
+        batch = case_numbers[i:i + batch_size]
+        result = supabase.table('h1b_applications').delete().in_('case_number', batch).execute()
+        deleted += len(result.data or [])
+    print(f"🗑️  Deleted {deleted} missing cases ({len(case_numbers)} listed)")
+    return deleted
+
+
+def verify_upload(supabase: Client, expected: dict = None):
+    """Verify the uploaded data with server-side aggregates (see upload_verification.py)
+
+    expected is the local_summary() of the uploaded rows; without it only the
+    whole-table totals are printed. Returns False if verification fails.
+    """
+    from upload_verification import print_table_totals, rest_rpc, verify_summary
+
     print("\nVerifying uploaded data...")
 
     try:
-        # Get total count
-        result = supabase.table('h1b_applications').select(
-            'id', count='exact').execute()
-        total_count = result.count if hasattr(
-            result, 'count') else len(result.data)
-        print(f"Total records in database: {total_count}")
+        rpc = rest_rpc(supabase)
+        print_table_totals(rpc)
 
         # Get sample records
         sample_result = supabase.table(
@@ -279,31 +605,142 @@ def verify_upload(supabase: Client):
                 print(
                     f"  {i+1}. Case: {record.get('case_number')}, Employer: {record.get('employer_name')}, Status: {record.get('case_status')}")
 
-        # Get statistics
-        stats_result = supabase.table(
-            'h1b_applications').select('case_status').execute()
-        if stats_result.data:
-            status_counts = {}
-            for record in stats_result.data:
-                status = record.get('case_status', 'Unknown')
-                status_counts[status] = status_counts.get(status, 0) + 1
-
-            print(f"\nStatus breakdown:")
-            for status, count in sorted(status_counts.items()):
-                print(f"  {status}: {count}")
-
-        return True
+        return verify_summary(rpc, expected) if expected else True
 
     except Exception as e:
         print(f"❌ Error verifying data: {str(e)}")
         return False
 
 
+DATA_FILES = [
+    'data/output/LCA_Disclosure_Data_FY2025_Q3.parquet',
+    'data/output/LCA_Disclosure_Data_FY2025_Q3.ndjson',
+    'data/output/LCA_Disclosure_Data_FY2025_Q3.json',
+    'data/output/sample.json'
+]
+
+
+def find_data_file():
+    """Return the first parsed data file that exists, or None"""
+    for file_path in DATA_FILES:
+        if os.path.exists(file_path):
+            return file_path
+    return None
+
+
+def copy_upload(json_file_path: str, dsn: str = None, merge_policy: str = 'skip',
+                delete: list = None):
+    """Bulk-load H1B data with COPY over a direct Postgres connection, refresh statistics, verify"""
+    from copy_loader import copy_h1b_data, get_db_connection
+    from statistics_rollups import refresh_statistics
+    from upload_verification import local_summary, print_table_totals, sql_rpc, verify_summary
+
+    print(f"Loading H1B data from {json_file_path}...")
+    table = load_table(json_file_path)
+    db_table = convert_table_for_db(table)
+    print(f"Converted {db_table.num_rows} records")
+
+    print("🔌 Connecting to Postgres...")
+    conn = get_db_connection(dsn)
+    try:
+        counts = copy_h1b_data(conn, db_table, merge_policy, delete=delete)
+        rpc = sql_rpc(conn)
+        refresh_statistics(rpc)
+
+        print("\nVerifying uploaded data...")
+        try:
+            print_table_totals(rpc)
+            verified = verify_summary(rpc, local_summary(db_table, delete, merge_policy))
+        except Exception as e:
+            print(f"❌ Error verifying data: {str(e)}")
+            verified = False
+    finally:
+        conn.close()
+
+    print(f"\n📊 Upload Summary:")
+    print(f"Total records processed: {db_table.num_rows}")
+    print_upsert_counts(counts)
+    if delete is not None:
+        print(f"Deleted (missing): {counts['deleted']}")
+    return verified
+
+
 def main():
     """Main function to upload H1B data to Supabase"""
+    parser = argparse.ArgumentParser(description="Upload parsed H1B data to Supabase.")
+    parser.add_argument("--file", help="Parsed data file (default: first one found in data/output/)")
+    parser.add_argument("--method", choices=["rest", "copy"], default="rest",
+                        help="rest: PostgREST inserts (default); copy: COPY over a direct "
+                             "Postgres connection")
+    parser.add_argument("--dsn", help="Postgres connection string for --method copy "
+                                      "(default: POSTGRES_URL_NON_POOLING)")
+    parser.add_argument("--merge-policy", choices=MERGE_POLICIES,
+                        help="What to do with case numbers already in the table: skip, "
+                             "overwrite, or changed (update only rows whose values differ). "
+                             "Default: overwrite for parser.py --delta files, otherwise skip")
+    parser.add_argument("--delete-missing", action="store_true",
+                        help="Delete the case numbers the previous release listed but this one "
+                             "doesn't (off by default: a release needn't repeat earlier cases)")
+    parser.add_argument("--missing", help="JSON array of case numbers for --delete-missing "
+                                          "(default: the *.missing.json next to a delta file)")
+    parser.add_argument("--batch-size", type=int,
+                        help="Fixed records per upsert request for --method rest "
+                             "(default: adaptive, sized by bytes and latency)")
+    parser.add_argument("--max-batch-bytes", type=int,
+                        help="Upper bound on an adaptive batch's JSON size (default: 2 MiB)")
+    parser.add_argument("--target-latency", type=float,
+                        help="Request latency adaptive batches aim for, in seconds (default: 2)")
+    parser.add_argument("--batch-stats", help="Write per-batch size/latency stats to this JSON file")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip batches already committed for this file by an earlier run "
+                             "(--method rest)")
+    parser.add_argument("--ledger", help="Checkpoint ledger path "
+                                         "(default: data/output/upload_ledger.sqlite)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Concurrent upload threads for --method rest (default: 4)")
+    parser.add_argument("--max-in-flight", type=int,
+                        help="Maximum batches sent but not yet confirmed (default: 2 x workers)")
+    args = parser.parse_args()
+
     print("🚀 H1B Data Upload to Supabase")
     print("=" * 40)
 
+    # Determine which data file to upload
+    json_file = args.file or find_data_file()
+    if not json_file or not os.path.exists(json_file):
+        print("❌ No data file found. Please run the parser first.")
+        print("Available files should be in:")
+        for file_path in DATA_FILES:
+            print(f"  - {file_path}")
+        return
+
+    print(f"📁 Using data file: {json_file}")
+
+    # Delta files only hold new and changed cases, so changed rows must be rewritten
+    merge_policy = args.merge_policy or ('overwrite' if is_delta_file(json_file) else 'skip')
+    missing_path = args.missing or missing_file_for(json_file)
+    delete = None
+    if args.delete_missing:
+        if not missing_path:
+            print("❌ --delete-missing needs a delta file with its *.missing.json, or --missing PATH")
+            sys.exit(1)
+        delete = load_case_numbers(missing_path)
+        print(f"📁 Deleting missing cases: {missing_path} ({len(delete)} cases)")
+    elif missing_path:
+        print(f"ℹ️  {len(load_case_numbers(missing_path))} cases in {missing_path} are kept "
+              f"(pass --delete-missing to delete them)")
+
+    if args.method == "copy":
+        try:
+            if copy_upload(json_file, args.dsn, merge_policy, delete):
+                print("\n🎉 H1B data successfully loaded with COPY!")
+            else:
+                print("\n⚠️  H1B data loaded with COPY, but verification did not pass")
+        except Exception as e:
+            print(f"❌ COPY upload failed: {str(e)}")
+            sys.exit(1)
+        return
+
     # Check environment variables
     supabase_url = os.getenv('VITE_SUPABASE_URL')
     supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv(
@@ -331,33 +768,26 @@ def main():
             print("❌ Failed to create table. Please create it manually and try again.")
             return
 
-        # Determine which JSON file to upload
-        json_files = [
-            'data/output/LCA_Disclosure_Data_FY2025_Q3.json',
-            'data/output/sample.json'
-        ]
-
-        json_file = None
-        for file_path in json_files:
-            if os.path.exists(file_path):
-                json_file = file_path
-                break
-
-        if not json_file:
-            print("❌ No JSON data file found. Please run the parser first.")
-            print("Available files should be in:")
-            for file_path in json_files:
-                print(f"  - {file_path}")
-            return
-
-        print(f"📁 Using data file: {json_file}")
-
         # Upload data
-        if upload_h1b_data(supabase, json_file):
+        summary = {}
+        if upload_h1b_data(supabase, json_file, batch_size=args.batch_size,
+                           merge_policy=merge_policy, workers=args.workers,
+                           max_in_flight=args.max_in_flight, resume=args.resume,
+                           ledger_path=args.ledger, max_batch_bytes=args.max_batch_bytes,
+                           target_latency=args.target_latency, stats_path=args.batch_stats,
+                           summary=summary, delete=delete):
             print("✅ Data upload completed!")
 
+            if delete:
+                delete_cases(supabase, delete, args.batch_size or 100)
+
+            # Bring the dashboard statistics up to date with this load
+            from statistics_rollups import refresh_statistics
+            from upload_verification import rest_rpc
+            refresh_statistics(rest_rpc(supabase))
+
             # Verify upload
-            verify_upload(supabase)
+            verify_upload(supabase, summary)
 
             print("\n🎉 H1B data successfully uploaded to Supabase!")
             print("\nYou can now:")
@@ -0,0 +1,190 @@
+"""
+Post-upload verification for the H1B uploaders.
+
+Counting rows by downloading them (select('case_status') plus a dict) pulls the
+whole table over the wire, and PostgREST silently caps the response at its row
+limit, so the counts were wrong too. Instead a small summary is computed twice
+and compared:
+
+    - locally, from the converted Arrow table, with the same rules the upsert
+      applies (rows without a case number are dropped, the last occurrence of a
+      repeated case number wins, --delete-missing cases are deleted afterwards)
+    - server-side, by get_h1b_verification_stats_for_cases (migration 20261018)
+
+Per case_status the summary holds the row count, the sums of
+wage_rate_of_pay_from, wage_rate_of_pay_to and prevailing_wage, and a checksum
+of the case numbers (the sum of the first 60 bits of each MD5, so row order
+doesn't matter). The server side covers exactly the uploaded and deleted case
+numbers, so rows the upload didn't touch (everything outside a parser --delta
+file) stay out of the comparison. With merge policy 'skip', rows that were
+already in the table keep their earlier values, so only the presence of the
+case numbers (row count and checksum) is checked. Whole-table totals are
+printed from get_h1b_stats_lightweight and get_case_statuses_fast.
+
+The case numbers are sent VERIFY_BATCH_SIZE at a time and the per-status
+results added up, each chunk one indexed aggregate query. The RPCs are reached
+through PostgREST (rest_rpc) or a direct connection (sql_rpc), so the REST and
+COPY upload paths verify the same way.
+"""
+import hashlib
+import math
+
+WAGE_COLUMNS = ['wage_rate_of_pay_from', 'wage_rate_of_pay_to', 'prevailing_wage']
+SUM_FIELDS = {'wage_rate_of_pay_from': 'wage_from_sum', 'wage_rate_of_pay_to': 'wage_to_sum',
+              'prevailing_wage': 'prevailing_wage_sum'}
+
+# Local sums are float64, server sums exact NUMERIC
+WAGE_SUM_TOLERANCE = 0.01
+
+# Case numbers per get_h1b_verification_stats_for_cases call
+VERIFY_BATCH_SIZE = 10000
+
+
+def case_checksum(case_number: str) -> int:
+    """First 60 bits of the case number's MD5, as the server computes it"""
+    return int(hashlib.md5(case_number.encode()).hexdigest()[:15], 16)
+
+
+def rest_rpc(supabase):
+    """Call RPCs through PostgREST: rpc(name, params) -> JSON result"""
+    def rpc(name: str, params: dict = None):
+        return supabase.rpc(name, params or {}).execute().data
+    return rpc
+
+
+def sql_rpc(conn):
+    """Call the same functions over a psycopg2 connection: rpc(name, params) -> rows or scalar
+
+    Set-returning functions come back as a list of dicts, scalar ones as the
+    value, matching what PostgREST returns. Each call is committed, like a
+    PostgREST request, so functions that write (refresh_h1b_statistics) stick.
+    """
+    from psycopg2.extras import Json
+
+    def rpc(name: str, params: dict = None):
+        params = {key: Json(value) if isinstance(value, dict) else value
+                  for key, value in (params or {}).items()}
+        arguments = ', '.join(f"{key} => %({key})s" for key in params)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT * FROM {name}({arguments})", params)
+                columns = [column.name for column in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+        if columns == [name] and len(rows) == 1:
+            return rows[0][name]
+        return rows
+    return rpc
+
+
+def local_summary(db_table, deleted: list = None, merge_policy: str = 'overwrite') -> dict:
+    """Summarize a converted Arrow table as the rows it leaves in h1b_applications
+
+    Returns {'case_numbers': every uploaded or deleted case number, 'statuses':
+    {status: {count, sums, checksum}}, 'presence_only': True for merge policy
+    'skip', where existing rows keep their earlier values}.
+    """
+    frame = db_table.select(['case_number', 'case_status'] + WAGE_COLUMNS).to_pandas()
+    frame = frame[frame['case_number'].notna()].drop_duplicates('case_number', keep='last')
+    case_numbers = set(frame['case_number'])
+    if deleted:
+        case_numbers.update(deleted)
+        frame = frame[~frame['case_number'].isin(set(deleted))]
+
+    statuses = {}
+    for status, group in frame.groupby(frame['case_status'].fillna(''), sort=True):
+        statuses[status] = {
+            'count': len(group),
+            **{SUM_FIELDS[column]: float(group[column].sum()) for column in WAGE_COLUMNS},
+            # Python ints: 60-bit values overflow an int64 sum after a few rows
+            'case_checksum': sum(map(case_checksum, group['case_number'])),
+        }
+    return {'case_numbers': sorted(case_numbers), 'statuses': statuses,
+            'presence_only': merge_policy == 'skip'}
+
+
+def add_summary(total: dict, status: str, part: dict):
+    """Add one per-status summary into total (counts, sums and checksums are additive)"""
+    if status not in total:
+        total[status] = dict(part)
+        return
+    for field, value in part.items():
+        total[status][field] += value
+
+
+def server_summary(rpc, case_numbers: list) -> dict:
+    """get_h1b_verification_stats_for_cases over case_numbers, VERIFY_BATCH_SIZE at a time"""
+    statuses = {}
+    for i in range(0, len(case_numbers), VERIFY_BATCH_SIZE):
+        rows = rpc('get_h1b_verification_stats_for_cases',
+                   {'case_numbers': case_numbers[i:i + VERIFY_BATCH_SIZE]})
+        for row in rows:
+            add_summary(statuses, row['status'], {
+                'count': int(row['count']),
+                **{field: float(row[field]) for field in SUM_FIELDS.values()},
+                'case_checksum': int(row['case_checksum'] or 0),
+            })
+    return statuses
+
+
+def presence(statuses: dict) -> dict:
+    """Collapse per-status summaries into one row count and case number checksum"""
+    return {'(all statuses)': {
+        'count': sum(summary['count'] for summary in statuses.values()),
+        'case_checksum': sum(summary['case_checksum'] for summary in statuses.values()),
+    }}
+
+
+def compare_summaries(local: dict, server: dict) -> list:
+    """Describe every difference between the local and server per-status summaries"""
+    problems = []
+    for status in sorted(set(local) | set(server)):
+        label = status or '(no status)'
+        expected, actual = local.get(status), server.get(status)
+        if expected is None or actual is None:
+            count = (expected or actual)['count']
+            problems.append(f"{label}: {count} rows only {'on the server' if expected is None else 'locally'}")
+            continue
+        if expected['count'] != actual['count']:
+            problems.append(f"{label}: {actual['count']} rows on the server, {expected['count']} expected")
+        for field in [field for field in SUM_FIELDS.values() if field in expected]:
+            if not math.isclose(expected[field], actual[field], rel_tol=1e-12, abs_tol=WAGE_SUM_TOLERANCE):
+                problems.append(f"{label}: {field} is {actual[field]:,.2f} on the server, "
+                                f"{expected[field]:,.2f} expected")
+        if expected['case_checksum'] != actual['case_checksum']:
+            problems.append(f"{label}: case number checksum differs")
+    return problems
+
+
+def print_table_totals(rpc):
+    """Whole-table row count and status breakdown from the lightweight statistics RPCs"""
+    stats = rpc('get_h1b_stats_lightweight', {'filters': {}})
+    print(f"Total records in database: {stats['totalApplications']}")
+    print(f"\nStatus breakdown:")
+    for row in rpc('get_case_statuses_fast'):
+        print(f"  {row['status']}: {row['count']}")
+
+
+def verify_summary(rpc, expected: dict) -> bool:
+    """Compare a local_summary() with the server; prints the outcome, returns True if they match"""
+    local = expected['statuses']
+    print(f"\nVerifying {sum(s['count'] for s in local.values())} uploaded rows by case number...")
+    server = server_summary(rpc, expected['case_numbers'])
+    if expected['presence_only']:
+        print("  (merge policy 'skip': existing rows keep their earlier values, "
+              "so only the case numbers are checked)")
+        local, server = presence(local), presence(server)
+    problems = compare_summaries(local, server)
+    if problems:
+        print(f"⚠️  Verification found {len(problems)} difference(s):")
+        for problem in problems:
+            print(f"  - {problem}")
+        return False
+    if expected['presence_only']:
+        print("✅ Row count and case number checksum match")
+    else:
+        print("✅ Counts, wage sums and case number checksums match")
+    return True